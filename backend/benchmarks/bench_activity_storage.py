@@ -0,0 +1,85 @@
+"""
+Benchmark: bytes per stored activity, Evidence vs ActivityRecord.
+
+Parses seeded activity payloads the way the API does (Evidence.model_validate
+on decoded JSON) and measures with tracemalloc the memory retained by a list
+of pydantic Evidence instances, then by the same activities converted to
+ActivityRecords (the Evidence instances are dropped as they are converted).
+
+    cd backend && python benchmarks/bench_activity_storage.py [--items 1000000]
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from src.portfolio.constants import LENS_LIST, ROLE_WEIGHT
+from src.portfolio.models import Evidence
+from src.portfolio.records import ActivityRecord
+
+TYPES = ("Club", "Competition", "Research", "Project", "Volunteering", "Work")
+TAGS = ("robotics", "ai", "music", "debate", "biology", "service", "finance", "art")
+AWARDS = ("school", "regional", "national", "international")
+
+
+def payloads(n: int, seed: int):
+    """JSON documents like the ones posted to /profile/{id}/activities"""
+    rng = random.Random(seed)
+    for i in range(n):
+        doc = {
+            "id": f"act-{i}", "title": f"{rng.choice(TAGS).title()} activity {i}",
+            "lens": rng.choice(LENS_LIST), "type": rng.choice(TYPES), "role_level": rng.choice(list(ROLE_WEIGHT)),
+            "area_of_activity": rng.choice(TAGS), "theme_tags": rng.sample(TAGS, rng.randint(1, 3)),
+            "start_date": f"202{rng.randint(1, 4)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            "hours_per_week": rng.randint(1, 12), "people_impacted": rng.randint(0, 500)
+        }
+        if rng.random() < 0.3:
+            doc["awards"] = [{"level": rng.choice(AWARDS)}]
+        if rng.random() < 0.2:
+            doc["artifact_links"] = [f"https://example.org/{i}"]
+        yield json.dumps(doc)
+
+
+def measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    items = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return items, retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=1_000_000, help="activities to store")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    docs = list(payloads(args.items, args.seed))
+    evidence, evidence_bytes, evidence_s = measure(lambda: [Evidence.model_validate_json(d) for d in docs])
+    sample = evidence[:1000]
+    del evidence
+    records, record_bytes, record_s = measure(
+        lambda: [ActivityRecord.from_evidence(Evidence.model_validate_json(d)) for d in docs]
+    )
+    if any(r.to_evidence() != ev for r, ev in zip(records, sample)):
+        sys.exit("records do not round-trip to the original Evidence")
+
+    print(f"{args.items} activities")
+    print(f"{'storage':<16} {'bytes/item':>11} {'total MB':>10} {'build s':>9}")
+    print(f"{'Evidence':<16} {evidence_bytes / args.items:>11.0f} {evidence_bytes / 2**20:>10.1f} {evidence_s:>9.2f}")
+    print(f"{'ActivityRecord':<16} {record_bytes / args.items:>11.0f} {record_bytes / 2**20:>10.1f} {record_s:>9.2f}")
+    print(f"reduction: {evidence_bytes / record_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
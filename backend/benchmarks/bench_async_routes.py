@@ -0,0 +1,136 @@
+"""
+Benchmark: requests per second and p99 latency of the LLM-backed routes under load.
+
+Starts the API under uvicorn with the local LLM backend (a fixed latency per
+completion, response cache off, limiter sized for the load) and drives it with
+--clients concurrent clients, each alternating POST /portfolio/analyze (a
+distinct student per request, so nothing coalesces) and POST
+/portfolio/regenerate-tasks (from a cached context token). Point --app-dir at
+a checkout of an older revision to measure it with the same load.
+
+    cd backend && python benchmarks/bench_async_routes.py [--clients 200] [--duration 20] [--llm-latency 0.5] [--app-dir DIR]
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import time
+import httpx
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app_dir: Path, port: int, llm_latency: float, clients: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        LLM_BACKEND="local",
+        LOCAL_LLM_LATENCY=f"fixed:{llm_latency}",
+        LLM_CACHE_ENABLED="0",
+        LLM_MAX_CONCURRENCY=str(clients),
+        LLM_TOKENS_PER_MINUTE="1000000000",
+        PERCENTILE_DISK="0"
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--timeout-keep-alive", "120"],
+        cwd=app_dir, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit("server did not start")
+
+
+async def load(base_url: str, clients: int, duration: float) -> dict:
+    students = itertools.count()
+    latencies = {"analyze": [], "regenerate": []}
+    errors = [0]
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        res = await client.post("/portfolio/analyze", json=PAYLOAD)
+        res.raise_for_status()
+        token = res.json()["context_token"]
+
+        async def analyze():
+            profile = dict(PAYLOAD["student_profile"], student_id=f"load-{next(students)}")
+            return await client.post("/portfolio/analyze", json=dict(PAYLOAD, student_profile=profile))
+
+        async def regenerate():
+            return await client.post("/portfolio/regenerate-tasks", json={
+                "context_token": token, "section_type": "diversity_spike", "exclude_task_titles": [f"t{next(students)}"]
+            })
+
+        async def worker(offset: int):
+            calls = [("analyze", analyze), ("regenerate", regenerate)]
+            for i in itertools.count(offset):
+                if time.monotonic() >= stop:
+                    return
+                name, call = calls[i % 2]
+                started = time.perf_counter()
+                try:
+                    res = await call()
+                except httpx.TransportError:
+                    errors[0] += 1
+                    continue
+                if res.status_code != 200:
+                    errors[0] += 1
+                latencies[name].append(time.perf_counter() - started)
+
+        stop = time.monotonic() + duration
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.monotonic() - started
+    return {"latencies": latencies, "errors": errors[0], "elapsed": elapsed}
+
+
+def p99(values: list) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per local LLM completion")
+    parser.add_argument("--app-dir", type=Path, default=Path(__file__).resolve().parents[1], help="backend directory to serve")
+    args = parser.parse_args()
+
+    port = free_port()
+    server = start_server(args.app_dir, port, args.llm_latency, args.clients)
+    try:
+        result = asyncio.run(load(f"http://127.0.0.1:{port}", args.clients, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies, elapsed = result["latencies"], result["elapsed"]
+    every = latencies["analyze"] + latencies["regenerate"]
+    print(f"{args.app_dir}: {args.clients} clients, {elapsed:.1f}s, LLM latency {args.llm_latency}s, {result['errors']} errors")
+    print(f"{'route':<12} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, values in (*latencies.items(), ("all", every)):
+        p50 = sorted(values)[len(values) // 2] if values else 0.0
+        print(f"{name:<12} {len(values):>9} {len(values) / elapsed:>8.1f} {p50 * 1000:>8.0f} {p99(values) * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
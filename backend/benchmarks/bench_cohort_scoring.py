@@ -0,0 +1,110 @@
+"""
+Benchmark: scalar vs vectorized cohort scoring.
+
+Scores seeded synthetic cohorts with the per-student functions in
+service.py and with the NumPy engine in cohort.py, checks the outputs are
+identical, and reports students per second for each path.
+
+    cd backend && python benchmarks/bench_cohort_scoring.py [--sizes 1000 10000 100000] [--seed 7]
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from src.portfolio import service
+from src.portfolio.cohort import load_cohort, score_arrays
+from src.portfolio.constants import LENS_LIST, ROLE_WEIGHT
+from src.portfolio.models import Evidence
+
+TODAY = date(2026, 6, 1)
+TYPES = ["Club", "Competition", "Research", "Startup", "Work", "Volunteering", "Project", "Certificate", "Award"]
+THEMES = ["Robotics", "AI", "Debate", "Music", "Biology", "Entrepreneurship", "Community", "Math"]
+AWARD_LEVELS = ["none", "school", "regional", "national", "international"]
+
+
+def synthetic_portfolio(rng: random.Random, student: int) -> list:
+    portfolio = []
+    for i in range(rng.randint(0, 12)):
+        start = TODAY - timedelta(days=rng.randint(30, 900)) if rng.random() < 0.7 else None
+        end = start + timedelta(days=rng.randint(7, 400)) if start and rng.random() < 0.5 else None
+        portfolio.append(Evidence(
+            id=f"s{student}-e{i}",
+            title=f"Activity {i}",
+            lens=rng.choice(LENS_LIST),
+            type=rng.choice(TYPES),
+            role_level=rng.choice(list(ROLE_WEIGHT)),
+            theme_tags=[rng.choice(THEMES)] if rng.random() < 0.8 else [],
+            start_date=start,
+            end_date=end,
+            hours_total=rng.randint(0, 400) if rng.random() < 0.4 else None,
+            hours_per_week=round(rng.uniform(0, 15), 1) if rng.random() < 0.8 else None,
+            people_impacted=rng.randint(0, 5000) if rng.random() < 0.7 else None,
+            awards=[{"level": rng.choice(AWARD_LEVELS)}] if rng.random() < 0.3 else []
+        ))
+    return portfolio
+
+
+def score_scalar(portfolios: list) -> list:
+    out = []
+    for portfolio in portfolios:
+        raw = {ev.id: service.compute_impact(ev, None) for ev in portfolio}
+        impacts_norm = service.normalize_impacts(raw) if raw else {}
+        lens_s = service.lens_scores(portfolio, impacts_norm) if impacts_norm else {k: 0.0 for k in LENS_LIST}
+        coverage = service.coverage_index(lens_s) if sum(lens_s.values()) > 0 else 0.0
+        out.append((impacts_norm, lens_s, coverage, service.detect_spike(portfolio, impacts_norm)))
+    return out
+
+
+def run_size(n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    portfolios = [synthetic_portfolio(rng, s) for s in range(n)]
+
+    started = time.perf_counter()
+    expected = score_scalar(portfolios)
+    scalar_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    arrays = load_cohort(portfolios)
+    load_s = time.perf_counter() - started
+    started = time.perf_counter()
+    scores = score_arrays(arrays)
+    score_s = time.perf_counter() - started
+
+    for s, (impacts_norm, lens_s, coverage, spike) in enumerate(expected):
+        actual = (scores.impacts_for(s), scores.lens_scores_for(s), float(scores.coverage[s]), scores.spike_for(s))
+        if actual != (impacts_norm, lens_s, coverage, spike):
+            sys.exit(f"mismatch for student {s} at n={n}: {actual} != {(impacts_norm, lens_s, coverage, spike)}")
+
+    return {
+        "students": n,
+        "items": len(arrays.evidence_ids),
+        "scalar_s": scalar_s,
+        "load_s": load_s,
+        "score_s": score_s,
+        "scalar_rate": n / scalar_s,
+        "vector_rate": n / score_s,
+        "end_to_end_rate": n / (load_s + score_s)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="cohort sizes")
+    parser.add_argument("--seed", type=int, default=7, help="seed for the synthetic cohorts")
+    args = parser.parse_args()
+
+    print(f"{'students':>9} {'items':>8} {'scalar/s':>10} {'vector/s':>11} {'load+vec/s':>11} {'speedup':>8}")
+    for n in args.sizes:
+        r = run_size(n, args.seed)
+        print(f"{r['students']:>9} {r['items']:>8} {r['scalar_rate']:>10.0f} {r['vector_rate']:>11.0f} "
+              f"{r['end_to_end_rate']:>11.0f} {r['vector_rate'] / r['scalar_rate']:>7.1f}x")
+    print("outputs identical to the scalar path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: serialization cost per /portfolio/analyze response.
+
+Builds one full analysis with the local LLM backend, then times turning it
+into response bytes two ways:
+- legacy: section models dumped to a dict, jsonable_encoder over the dict,
+  validation against PortfolioAnalyzeResponse and a JSON-mode dump (what
+  FastAPI does for response_model), then json.dumps as JSONResponse does,
+- single pass: model_dump_json on the typed response.
+
+    cd backend && python benchmarks/bench_response_serialization.py [--repeat 2000]
+"""
+
+import os
+os.environ["LLM_BACKEND"] = "local"
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["PERCENTILES_ENABLED"] = "0"
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from src.portfolio.models import PortfolioAnalyzeRequest, PortfolioAnalyzeResponse
+from src.portfolio.service import analysis_dict, analyze_portfolio_response
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def legacy(response: PortfolioAnalyzeResponse) -> bytes:
+    encoded = jsonable_encoder(analysis_dict(response))
+    content = PortfolioAnalyzeResponse.model_validate(encoded).model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def single_pass(response: PortfolioAnalyzeResponse) -> bytes:
+    return response.model_dump_json().encode("utf-8")
+
+
+def timed(fn, response, repeat: int) -> float:
+    fn(response)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(response)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000, help="serializations per path")
+    args = parser.parse_args()
+
+    response = analyze_portfolio_response(PortfolioAnalyzeRequest.model_validate(PAYLOAD))
+    if json.loads(legacy(response)) != json.loads(single_pass(response)):
+        sys.exit("the two paths produce different documents")
+
+    tasks = sum(len(s.tasks) for s in response.critical_improvements + response.lens_improvements)
+    print(f"response: {len(single_pass(response))} bytes, {tasks} improvement tasks")
+    print(f"{'path':<12} {'us/response':>12}")
+    old, new = timed(legacy, response, args.repeat), timed(single_pass, response, args.repeat)
+    print(f"{'legacy':<12} {old * 1e6:>12.0f}")
+    print(f"{'single pass':<12} {new * 1e6:>12.0f}")
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
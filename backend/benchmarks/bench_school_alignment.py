@@ -0,0 +1,97 @@
+"""
+Benchmark: school alignment matrix vs per-school scalar loops.
+
+Builds seeded synthetic school contexts and student profiles and times
+alignment for every student and school with alignment_for_school in
+Python loops and with one alignment() call over the students x schools
+matrix, for a single request (one student) and for a cohort. Both paths
+must agree exactly.
+
+    cd backend && python benchmarks/bench_school_alignment.py [--schools 20] [--students 1000] [--repeat 200]
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import random
+import time
+import numpy as np
+from src.portfolio.alignment import SchoolMatrix, StudentMatrix, alignment
+from src.portfolio.constants import LENS_LIST
+from src.portfolio.models import SchoolContext, StudentProfile
+from src.portfolio.service import alignment_for_school
+
+IMPORTANCE = ["very_important", "important", "considered", "not_considered"]
+
+
+def synthetic_school(rng: random.Random, i: int) -> SchoolContext:
+    sat = rng.randrange(1100, 1450, 10)
+    act = rng.randint(22, 30)
+    return SchoolContext(
+        name=f"School {i}",
+        mid50_scores={"sat_composite": [sat, sat + 70, sat + 140], "act_composite": [act, act + 2, act + 4]},
+        factor_importance={f: rng.choice(IMPORTANCE) for f in ("gpa", "rigor", "test_scores", "essay", "ec", "recommendations")},
+        recommenders_required=rng.randint(1, 3)
+    )
+
+
+def synthetic_student(rng: random.Random, i: int) -> tuple:
+    tests = {"sat": {"score": rng.randrange(1000, 1600, 10)}} if rng.random() < 0.6 else {"act": {"score": rng.randint(18, 36)}}
+    prof = StudentProfile(
+        student_id=f"s{i}", current_grade="12", weekly_hours_cap=8,
+        gpa_unweighted=round(rng.uniform(2.5, 4.0), 2),
+        grades_by_subject={f"S{k}": rng.choice(("A*", "A", "B", "C")) for k in range(6)},
+        tests=tests
+    )
+    return prof, {lens: rng.uniform(0, 10) for lens in LENS_LIST}
+
+
+def scalar(students: list, schools: list) -> list:
+    return [[alignment_for_school(ctx, prof, lens_s) for ctx in schools] for prof, lens_s in students]
+
+
+def vectorized(students: list, schools: list, names: list) -> np.ndarray:
+    return alignment(StudentMatrix.compile(students), SchoolMatrix.compile(names, schools))
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--schools", type=int, default=20, help="schools per request")
+    parser.add_argument("--students", type=int, default=1000, help="students in the cohort run")
+    parser.add_argument("--repeat", type=int, default=200, help="timed runs of the single-request case")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    schools = [synthetic_school(rng, i) for i in range(args.schools)]
+    names = [ctx.name for ctx in schools]
+    students = [synthetic_student(rng, i) for i in range(args.students)]
+    compiled = SchoolMatrix.compile(names, schools)
+
+    print(f"{'case':<28} {'scalar ms':>10} {'matrix ms':>10} {'speedup':>8}")
+    cases = [
+        ("1 student", students[:1], args.repeat),
+        (f"{args.students} students", students, max(1, args.repeat // 100))
+    ]
+    for label, cohort, repeat in cases:
+        scalar_s, expected = timed(lambda: scalar(cohort, schools), repeat)
+        matrix_s, result = timed(lambda: vectorized(cohort, schools, names), repeat)
+        # A server-side school set is compiled once, when it is stored
+        stored_s, _ = timed(lambda: alignment(StudentMatrix.compile(cohort), compiled), repeat)
+        if result.tolist() != expected:
+            sys.exit(f"{label}: matrix and scalar alignment differ")
+        print(f"{label:<28} {scalar_s * 1000:>10.3f} {matrix_s * 1000:>10.3f} {scalar_s / matrix_s:>7.1f}x")
+        print(f"{label + ' (school set)':<28} {scalar_s * 1000:>10.3f} {stored_s * 1000:>10.3f} {scalar_s / stored_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: latency of the LLM-free scores fast path.
+
+Times request validation plus score_portfolio() for the example request
+and a larger synthetic portfolio, and fails (exit status 1) when the p99
+exceeds the target. In-process HTTP latency through /portfolio/scores is
+reported for reference; it includes the ASGI test transport and is not
+held to the target.
+
+    cd backend && python benchmarks/bench_scores_fast_path.py [--iterations N] [--target-ms 1.0]
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import statistics
+import time
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio.models import PortfolioAnalyzeRequest
+from src.portfolio.service import score_portfolio
+
+EXAMPLE = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def large_payload(items: int) -> dict:
+    portfolio = [dict(ev, id=f"{ev['id']}-{i}") for i in range(items // len(EXAMPLE["portfolio"]) + 1)
+                 for ev in EXAMPLE["portfolio"]]
+    return dict(EXAMPLE, portfolio=portfolio[:items])
+
+
+def percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+    }
+
+
+def time_service(payload: dict, iterations: int) -> dict:
+    for _ in range(50):
+        score_portfolio(PortfolioAnalyzeRequest.model_validate(payload))
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        score_portfolio(PortfolioAnalyzeRequest.model_validate(payload))
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def time_http(client: TestClient, payload: dict, iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        res = client.post("/portfolio/scores", json=payload)
+        samples.append(time.perf_counter() - started)
+        res.raise_for_status()
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000, help="timed calls per payload")
+    parser.add_argument("--target-ms", type=float, default=1.0, help="p99 latency target for the service path")
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    payloads = {"example": EXAMPLE, "40 items": large_payload(40)}
+    failed = False
+    print(f"{'payload':<10} {'svc p50 ms':>11} {'svc p99 ms':>11} {'http p50 ms':>12} {'http p99 ms':>12}")
+    for name, payload in payloads.items():
+        svc = time_service(payload, args.iterations)
+        http = time_http(client, payload, max(1, args.iterations // 10))
+        failed |= svc["p99_ms"] > args.target_ms
+        print(f"{name:<10} {svc['p50_ms']:>11.3f} {svc['p99_ms']:>11.3f} {http['p50_ms']:>12.3f} {http['p99_ms']:>12.3f}")
+    if failed:
+        sys.exit(f"service p99 above the {args.target_ms} ms target")
+    print(f"service p99 within the {args.target_ms} ms target")
+
+
+if __name__ == "__main__":
+    main()
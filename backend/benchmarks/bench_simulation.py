@@ -0,0 +1,87 @@
+"""
+Benchmark: batched what-if simulation vs rescoring each variant.
+
+Generates seeded edit scripts (patch role/hours, remove, add) against a
+larger copy of the example portfolio and times simulate_portfolio() on
+all of them against calling score_portfolio() once per edited request,
+which is what re-posting each variant to the scores endpoint costs
+without the LLM stage.
+
+    cd backend && python benchmarks/bench_simulation.py [--scenarios 300] [--items 40]
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import random
+import time
+from src.portfolio.models import SimulateRequest
+from src.portfolio.service import score_portfolio
+from src.portfolio.simulation import apply_edits, simulate_portfolio
+
+EXAMPLE = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def base_payload(items: int) -> dict:
+    portfolio = [dict(ev, id=f"{ev['id']}-{i}") for i in range(items // len(EXAMPLE["portfolio"]) + 1)
+                 for ev in EXAMPLE["portfolio"]]
+    return dict(EXAMPLE, portfolio=portfolio[:items])
+
+
+def random_scenario(rng: random.Random, ids: list, n: int) -> dict:
+    edits = []
+    for k in range(rng.randint(1, 3)):
+        kind = rng.choice(("patch", "patch", "remove", "add"))
+        if kind == "add":
+            edits.append({"op": "add", "evidence": {
+                "id": f"new-{n}-{k}", "title": "Volunteer tutoring", "lens": rng.choice(("Community", "Growth")),
+                "type": "Volunteering", "role_level": rng.choice(("Member", "Lead")), "hours_total": rng.randint(20, 200),
+                "theme_tags": ["education"]
+            }})
+        elif kind == "remove" and len(ids) > 1:
+            edits.append({"op": "remove", "id": ids.pop(rng.randrange(len(ids)))})
+        else:
+            edits.append({"op": "patch", "id": rng.choice(ids),
+                          "changes": {"role_level": rng.choice(("Core", "Lead", "Founder")), "hours_total": rng.randint(10, 400)}})
+    return {"name": f"scenario {n}", "edits": edits}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", type=int, default=300, help="edit scripts per request")
+    parser.add_argument("--items", type=int, default=40, help="activities in the base portfolio")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payload = base_payload(args.items)
+    ids = [ev["id"] for ev in payload["portfolio"]]
+    scenarios = [random_scenario(rng, list(ids), n) for n in range(args.scenarios)]
+    req = SimulateRequest.model_validate({"base": payload, "scenarios": scenarios})
+
+    started = time.perf_counter()
+    batched = simulate_portfolio(req)
+    batched_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rescored = []
+    for scenario in req.scenarios:
+        variant = req.base.model_copy(update={"portfolio": apply_edits(req.base.portfolio, scenario.edits)})
+        rescored.append(score_portfolio(variant))
+    rescored_s = time.perf_counter() - started
+
+    for result, expected in zip(batched["scenarios"], rescored):
+        if (result["scores"], result["gaps"]) != (expected["scores"], expected["gaps"]):
+            sys.exit(f"{result['name']}: simulation differs from rescoring")
+    print(f"{args.scenarios} scenarios over {args.items} activities")
+    print(f"{'path':<12} {'total ms':>10} {'ms/scenario':>12}")
+    print(f"{'rescoring':<12} {rescored_s * 1000:>10.1f} {rescored_s * 1000 / args.scenarios:>12.3f}")
+    print(f"{'simulate':<12} {batched_s * 1000:>10.1f} {batched_s * 1000 / args.scenarios:>12.3f}")
+    print(f"speedup: {rescored_s / batched_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.portfolio.api import router as portfolio_router, test_router, eligibility_router, profile_router, essay_router
+from src.portfolio import api
+from src.portfolio.api import router as portfolio_router, test_router, eligibility_router, profile_router, essay_router, jobs_router, ops_router
 
-app = FastAPI(title="Portfolio Analyzer API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume jobs a previous process left queued or running
+    api.job_queue.start()
+    yield
+    api.job_queue.stop()
+
+app = FastAPI(title="Portfolio Analyzer API", version="0.1.0", lifespan=lifespan)
 
 # CORS middleware for frontend
 app.add_middleware(
@@ -11,6 +20,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the dashboard read validators for conditional GETs and the job URL of 202 responses
+    expose_headers=["ETag", "Location"],
 )
 
 @app.get("/healthz")
@@ -22,4 +33,6 @@ app.include_router(test_router)
 app.include_router(eligibility_router)
 app.include_router(profile_router)
 app.include_router(essay_router)
+app.include_router(jobs_router)
+app.include_router(ops_router)
 
@@ -0,0 +1,173 @@
+"""
+School Alignment Matrix
+Batch version of alignment_for_school and the test competitiveness bands
+of analyze_standardized_tests, for many students against many schools.
+
+Schools are compiled once into a SchoolMatrix (factor weights, mid-50
+bands, recommender factor) and students into a StudentMatrix (GPA, rigor,
+essay, EC, SAT and ACT). alignment() then evaluates the students x schools
+x factors tensor in one pass. Factors are accumulated in the scalar
+function's order, so results match alignment_for_school bit for bit.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .constants import FACTOR_WEIGHT
+from .models import SchoolContext, StudentProfile
+
+FACTORS = ("gpa", "rigor", "test_scores", "essay", "ec", "recommendations", "interest")
+COMPETITIVENESS = ("not_competitive", "below_competitive", "competitive", "highly_competitive")
+TEST_TYPES = (None, "SAT", "ACT")
+RIGOR_GRADES = {"A*", "A", "HL", "HLA"}
+BANDS = ("sat_composite", "act_composite")
+GPA_RANGE = (2.5, 4.0)
+# Band of a test the school does not list: every score is at or below p25
+_UNLISTED = (np.inf, np.inf, np.inf, 1.0, 1.0)
+
+
+@dataclass
+class StudentMatrix:
+    """Per-student factor values, one row per student"""
+    valid: np.ndarray       # False where the student has no profile
+    gpa: np.ndarray
+    rigor: np.ndarray
+    essay: np.ndarray
+    ec: np.ndarray
+    scores: np.ndarray      # n_students x 2 (SAT, ACT); 0 when not taken
+
+    @classmethod
+    def compile(cls, students: Sequence[Tuple[Optional[StudentProfile], Dict[str, float]]]) -> "StudentMatrix":
+        """From (profile, lens scores) pairs"""
+        lo, hi = GPA_RANGE
+        rows = []
+        for prof, lens_s in students:
+            if not prof:
+                rows.append((0.0,) * 7)
+                continue
+            gpa = prof.gpa_unweighted
+            rigor_count = sum(1 for grade in prof.grades_by_subject.values() if str(grade).upper() in RIGOR_GRADES)
+            rows.append((
+                1.0,
+                (min(max(gpa, lo), hi) - lo) / (hi - lo) if gpa is not None else 0.0,
+                min(1.0, rigor_count / 6.0),
+                (lens_s.get("Creativity", 0.0) + lens_s.get("Growth", 0.0)) / 20.0,
+                (lens_s.get("Leadership", 0.0) + lens_s.get("Community", 0.0)) / 20.0,
+                *((test.score or 0) if test else 0 for test in (prof.tests.sat, prof.tests.act))
+            ))
+        m = np.array(rows, dtype=float).reshape(len(rows), 7)
+        return cls(m[:, 0] > 0, m[:, 1], m[:, 2], m[:, 3], m[:, 4], m[:, 5:])
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+
+@dataclass
+class SchoolMatrix:
+    """Per-school weights and mid-50 bands, one row per school"""
+    names: List[str]
+    usable: np.ndarray      # False where the school has no context (or every factor is not_considered)
+    weights: np.ndarray     # n_schools x len(FACTORS)
+    weight_sum: np.ndarray  # summed in FACTORS order; 1 where not usable
+    recs: np.ndarray
+    listed: np.ndarray      # n_schools x 2: the school publishes a SAT / ACT band
+    banded: np.ndarray      # n_schools x 2: the band has p25, p50 and p75
+    bands: np.ndarray       # n_schools x 2 x 5: p25, p50, p75, p50 - p25, p75 - p50 (differences 1 when not positive)
+
+    @classmethod
+    def compile(cls, names: Sequence[str], contexts: Sequence[Optional[SchoolContext]]) -> "SchoolMatrix":
+        n = len(contexts)
+        usable, weights, weight_sum, recs, listed, banded, bands = [], [], [], [], [], [], []
+        for ctx in contexts:
+            importance = (ctx.factor_importance if ctx else None) or {}
+            row = [FACTOR_WEIGHT.get(importance.get(factor, "considered"), 0.3) for factor in FACTORS]
+            den = 0.0
+            for w in row:
+                den += w
+            usable.append(bool(ctx) and den > 0)
+            weights.append(row)
+            weight_sum.append(den if usable[-1] else 1.0)
+            recs.append(1.0 if ((ctx.recommenders_required if ctx else None) or 0) <= 1 else 0.5)
+            mid50 = (ctx.mid50_scores if ctx else None) or {}
+            for key in BANDS:
+                band = mid50.get(key)
+                listed.append(bool(band))
+                banded.append(bool(band) and len(band) >= 3)
+                if not band:
+                    bands.append(_UNLISTED)
+                    continue
+                lo, md, hi = band[0], band[1] if len(band) > 1 else band[0], band[-1]
+                bands.append((lo, md, hi, md - lo if md > lo else 1.0, hi - md if hi > md else 1.0))
+        return cls(
+            list(names), np.array(usable, dtype=bool), np.array(weights, dtype=float).reshape(n, len(FACTORS)),
+            np.array(weight_sum, dtype=float), np.array(recs, dtype=float),
+            np.array(listed, dtype=bool).reshape(n, 2), np.array(banded, dtype=bool).reshape(n, 2),
+            np.array(bands, dtype=float).reshape(n, 2, 5)
+        )
+
+    def take(self, indices: Sequence[int]) -> "SchoolMatrix":
+        """Sub-matrix of the given school rows, in that order"""
+        idx = np.asarray(indices, dtype=np.intp)
+        arrays = (getattr(self, f.name)[idx] for f in fields(self) if f.name != "names")
+        return SchoolMatrix([self.names[i] for i in idx], *arrays)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def _test_choice(students: StudentMatrix, schools: SchoolMatrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """SAT when both the student and the school have it, else ACT when both have that; the score and band used"""
+    taken = students.scores > 0
+    sat = taken[:, None, 0] & schools.listed[:, 0]
+    act = taken[:, None, 1] & schools.listed[:, 1] & ~sat
+    score = np.where(act, students.scores[:, None, 1], students.scores[:, None, 0])
+    band = schools.bands[np.arange(len(schools)), act.astype(np.intp)]
+    return np.where(sat, 1, np.where(act, 2, 0)), score, band
+
+
+def alignment(students: StudentMatrix, schools: SchoolMatrix) -> np.ndarray:
+    """n_students x n_schools alignment; 0 where either side is missing, like alignment_for_school"""
+    _, s, band = _test_choice(students, schools)
+    lo, md, hi, below_den, above_den = (band[..., k] for k in range(5))
+    # _tests_norm: 0 at p25, 0.5 at p50, 1.0 at p75. Without a shared test the band is
+    # unlisted (or the score 0), so the `s <= lo` case applies
+    tests = np.where(s < md, (s - lo) / below_den * 0.5, 0.5 + (s - md) / above_den * 0.5)
+    tests = np.where(s == md, 0.5, tests)
+    tests = np.where(s >= hi, 1.0, tests)
+    tests = np.where(s <= lo, 0.0, tests)
+
+    w = schools.weights
+    # Accumulated in FACTORS order like the scalar loop; "interest" is always 0 and only counts in weight_sum
+    num = w[:, 0] * students.gpa[:, None]
+    num = num + w[:, 1] * students.rigor[:, None]
+    num = num + w[:, 2] * tests
+    num = num + w[:, 3] * students.essay[:, None]
+    num = num + w[:, 4] * students.ec[:, None]
+    num = num + w[:, 5] * schools.recs
+    return np.where(students.valid[:, None] & schools.usable, num / schools.weight_sum, 0.0)
+
+
+@dataclass
+class ScoreStanding:
+    """Test each student would send to each school, its score and competitiveness (-1: no full band)"""
+    choice: np.ndarray      # index into TEST_TYPES
+    score: np.ndarray
+    competitiveness: np.ndarray
+
+    def test_type(self, student: int, school: int) -> Optional[str]:
+        return TEST_TYPES[self.choice[student, school]]
+
+    def rating(self, student: int, school: int) -> Optional[str]:
+        code = self.competitiveness[student, school]
+        return COMPETITIVENESS[code] if code >= 0 else None
+
+
+def score_standing(students: StudentMatrix, schools: SchoolMatrix) -> ScoreStanding:
+    """Which test each student would send to each school and where it falls in the school's band"""
+    choice, score, band = _test_choice(students, schools)
+    banded = (choice > 0) & np.where(choice == 2, schools.banded[:, 1], schools.banded[:, 0])
+    rated = np.where(score >= band[..., 0], 1, 0)
+    rated = np.where(score >= band[..., 1], 2, rated)
+    rated = np.where(score >= band[..., 2], 3, rated)
+    return ScoreStanding(choice, np.where(choice > 0, score, 0.0), np.where(banded, rated, -1))
@@ -1,36 +1,209 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header, Query, Request
 from fastapi.encoders import jsonable_encoder
-from typing import List, Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
+import json
 from .models import (
-    PortfolioAnalyzeRequest, PortfolioAnalyzeResponse,
+    PortfolioAnalyzeRequest, PortfolioAnalyzeResponse, PortfolioScoresResponse,
     TestPlanRequest, TestPlanResponse,
     EligibilityCheckRequest, EligibilityCheckResponse,
     RegenerateTasksRequest, RegenerateTasksResponse,
-    Evidence, StudentProfile,
-    EssayAnalysis, AnalyzeEssayRequest
+    Evidence, StudentProfile, SchoolContext, SchoolSetResponse, SimulateRequest, SimulateResponse,
+    EssayAnalysis, AnalyzeEssayRequest, JobResponse
 )
-from .service import analyze_portfolio, plan_tests, check_eligibility, regenerate_tasks_for_section
-from .essay_analyzer import EssayAnalyzer
+from .service import (
+    aanalyze_portfolio_response, analyze_portfolio_response, score_portfolio, stream_portfolio_analysis, plan_tests, check_eligibility,
+    aregenerate_tasks_for_section, resolve_scoring_context, resolve_as_of
+)
+from .essay_analyzer import AsyncEssayAnalyzer, EssayAnalyzer
+from .llm_cache import response_cache
+from .singleflight import flight_group, request_fingerprint, coalescing_stats
+from .llm_limiter import llm_limiter
+from .llm_backends import backend_stats
+from .circuit_breaker import llm_breaker
+from .incremental import IncrementalPortfolioScores
+from .records import ActivityRecord
+from .scoring_context import UnknownScoringContext, scoring_contexts
+from .school_sets import UnknownSchoolSet, school_sets
+from .simulation import simulate_portfolio
+from .batch import analyze_batch
+from .percentiles import percentile_index
+from .etags import not_modified, profile_versions, strong_etag, weak_etag
+from .jobs import TERMINAL, UnknownJob, job_queue
 
 router = APIRouter(prefix="/portfolio", tags=["portfolio"])
 
-@router.post("/analyze", response_model=PortfolioAnalyzeResponse)
-def analyze(req: PortfolioAnalyzeRequest):
+# Identical concurrent requests share one in-flight computation
+_analyze_flight = flight_group("portfolio.analyze")
+_regenerate_flight = flight_group("portfolio.regenerate_tasks")
+_essay_flight = flight_group("essays.analyze")
+
+def _model_response(model: BaseModel) -> Response:
+    """
+    Serialize a response model once, in pydantic-core. Returning a Response skips FastAPI's
+    re-validation against response_model, which stays on the route for the OpenAPI schema.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+# Job mode: answer 202 with a job id and run the work on the background job queue
+RunMode = Literal["sync", "async"]
+_MODE_QUERY = Query("sync", description="async: queue the work and answer 202 with a job to poll at /jobs/{id}")
+_PRIORITY_QUERY = Query(0, ge=-100, le=100, description="Job mode only; higher runs first")
+_JOB_RESPONSES = {202: {"model": JobResponse, "description": "Queued as a background job"}}
+
+def _run_analysis_job(payload: str) -> str:
+    return analyze_portfolio_response(PortfolioAnalyzeRequest.model_validate_json(payload)).model_dump_json()
+
+def _run_essay_job(payload: str) -> str:
+    return EssayAnalyzer().analyze_essay(**json.loads(payload)).model_dump_json()
+
+def register_job_handlers(queue) -> None:
+    queue.register("portfolio.analyze", _run_analysis_job)
+    queue.register("essays.analyze", _run_essay_job)
+
+register_job_handlers(job_queue)
+
+async def _job_accepted(kind: str, payload: str, priority: int) -> Response:
+    job = JobResponse(**await run_in_threadpool(job_queue.submit, kind, payload, priority))
+    return Response(content=job.model_dump_json(), status_code=202, media_type="application/json",
+                    headers={"Location": f"/jobs/{job.id}"})
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def _precondition_failed(etag: str) -> Response:
+    """A matching If-None-Match on a method other than GET/HEAD (RFC 9110 13.1.2)"""
+    return Response(status_code=412, headers={"ETag": etag})
+
+def _analysis_etag(req: PortfolioAnalyzeRequest) -> Optional[str]:
+    """
+    Weak tag for the analysis of a stored student: the request (as_of included), the student's
+    portfolio version and, for requests naming a school set, the registry generation. Weak
+    because the LLM-written sections and timings differ between equivalent runs; cohort
+    percentiles are not covered and may lag the cohort.
+    """
+    student_id = req.student_profile.student_id if req.student_profile else None
+    version = profile_versions.get(student_id) if student_id else None
+    if version is None:
+        return None
+    return weak_etag(request_fingerprint(req), student_id, version, school_sets.generation if req.school_set else None)
+
+@router.post("/analyze", response_model=PortfolioAnalyzeResponse, responses=_JOB_RESPONSES)
+async def analyze(req: PortfolioAnalyzeRequest, if_none_match: Optional[str] = Header(None),
+                  mode: RunMode = _MODE_QUERY, priority: int = _PRIORITY_QUERY):
+    try:
+        req = resolve_as_of(req)
+        etag = _analysis_etag(req)
+        if etag and not_modified(if_none_match, etag):
+            return _precondition_failed(etag)
+        if mode == "async":
+            return await _job_accepted("portfolio.analyze", req.model_dump_json(), priority)
+        result = await _analyze_flight.ado(request_fingerprint(req), aanalyze_portfolio_response, req)
+        response = _model_response(result)
+        if etag:
+            response.headers["ETag"] = etag
+        return response
+    except UnknownSchoolSet as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analyzer error: {e}")
+
+def _sse(events):
+    """Format (event, data) pairs as Server-Sent Events"""
+    try:
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': f'Analyzer error: {e}'})}\n\n"
+        return
+    yield "event: done\ndata: {}\n\n"
+
+@router.post("/analyze/stream")
+def analyze_stream(req: PortfolioAnalyzeRequest):
+    """Stream scores and gaps immediately, then each recommendation section as soon as it is generated"""
+    return StreamingResponse(
+        _sse(stream_portfolio_analysis(req)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that streams while the request body is still being read. The stock one
+    also listens for a disconnect on receive(), which would swallow body messages; here
+    disconnects surface through request.stream() and failed sends instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+@router.post("/analyze-batch")
+async def analyze_batch_ndjson(request: Request):
+    """
+    Analyze a caseload: one PortfolioAnalyzeRequest per NDJSON line in, one result line per item
+    out as each finishes (`index`, `student_id`, `status`, then `result` or `detail`), then a summary
+    """
+    return _DuplexStreamingResponse(
+        analyze_batch(request.stream()),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/scores", response_model=PortfolioScoresResponse)
+def scores(req: PortfolioAnalyzeRequest):
+    """Scores and gaps only: deterministic, no LLM or task generation"""
     try:
-        result = analyze_portfolio(req)
-        return jsonable_encoder(result)
+        return _model_response(PortfolioScoresResponse(**score_portfolio(req)))
+    except UnknownSchoolSet as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analyzer error: {e}")
 
+@router.post("/simulate", response_model=SimulateResponse)
+def simulate(req: SimulateRequest):
+    """Score and gap deltas of hypothetical portfolio edits against the base request; no LLM calls"""
+    try:
+        return simulate_portfolio(req)
+    except UnknownSchoolSet as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Simulation error: {e}")
+
+@router.put("/school-sets/{name}", response_model=SchoolSetResponse)
+def put_school_set(name: str, contexts: dict[str, SchoolContext] = Body(...)):
+    """Store (or replace) a named set of school contexts, keyed by the school names used in requests"""
+    school_set = school_sets.put(name, contexts)
+    return {"name": name, "schools": list(school_set.contexts)}
+
+@router.get("/school-sets/{name}", response_model=dict[str, SchoolContext])
+def get_school_set(name: str):
+    school_set = school_sets.get(name)
+    if school_set is None:
+        raise HTTPException(status_code=404, detail=f"Unknown school set: {name}")
+    return dict(school_set.contexts)
+
+@router.delete("/school-sets/{name}")
+def delete_school_set(name: str):
+    if not school_sets.delete(name):
+        raise HTTPException(status_code=404, detail=f"Unknown school set: {name}")
+    return {"message": "School set deleted"}
+
 test_router = APIRouter(prefix="/tests", tags=["tests"])
 
 @test_router.post("/plan", response_model=TestPlanResponse)
-def plan_test(req: TestPlanRequest):
+async def plan_test(req: TestPlanRequest):
+    # Rule-based and cheap; runs on the event loop
     try:
         result = plan_tests(req)
-        return jsonable_encoder(result)
+        return _model_response(result)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -42,23 +215,31 @@ eligibility_router = APIRouter(prefix="/eligibility", tags=["eligibility"])
 def check(req: EligibilityCheckRequest):
     try:
         result = check_eligibility(req)
-        return jsonable_encoder(result)
+        return _model_response(result)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Eligibility check error: {e}")
 
 @router.post("/regenerate-tasks", response_model=RegenerateTasksResponse)
-def regenerate_tasks(req: RegenerateTasksRequest):
-    """Regenerate alternative tasks for a specific section"""
+async def regenerate_tasks(req: RegenerateTasksRequest):
+    """Regenerate alternative tasks for a specific section, from a context token or the full original request"""
     try:
-        result = regenerate_tasks_for_section(
-            req.original_request,
+        # Rescoring an expired context is CPU-bound; keep it off the event loop
+        ctx = await run_in_threadpool(resolve_scoring_context, req.context_token, req.original_request)
+        result = await _regenerate_flight.ado(
+            request_fingerprint(ctx.token, req.section_type, req.section_identifier, req.exclude_task_titles),
+            aregenerate_tasks_for_section,
+            ctx,
             req.section_type,
             req.section_identifier,
             req.exclude_task_titles
         )
-        return jsonable_encoder(result)
+        return _model_response(result)
+    except UnknownScoringContext as e:
+        raise HTTPException(status_code=404, detail=f"{e}; resend original_request")
+    except UnknownSchoolSet as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
@@ -67,25 +248,44 @@ def regenerate_tasks(req: RegenerateTasksRequest):
 # Portfolio CRUD endpoints
 profile_router = APIRouter(prefix="/profile", tags=["profile"])
 
-# In-memory storage (replace with database in production)
-_portfolio_storage: dict[str, List[Evidence]] = {}
+# In-memory storage (replace with database in production); activities are stored as compact
+# records and turned back into Evidence only in responses
+_portfolio_storage: dict[str, List[ActivityRecord]] = {}
 _profile_storage: dict[str, StudentProfile] = {}
+# Scores maintained incrementally as activities change
+_score_states: dict[str, IncrementalPortfolioScores] = {}
+
+def _score_state(student_id: str) -> IncrementalPortfolioScores:
+    state = _score_states.get(student_id)
+    if state is None:
+        profile = _profile_storage.get(student_id)
+        state = _score_states.setdefault(
+            student_id, IncrementalPortfolioScores(profile.intended_major if profile else None)
+        )
+    return state
 
 @profile_router.get("/{student_id}")
-def get_profile(student_id: str):
+def get_profile(student_id: str, response: Response, if_none_match: Optional[str] = Header(None)):
     """Get student profile and portfolio activities"""
+    etag = strong_etag("profile", profile_versions.get(student_id) or 0)
+    if not_modified(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
     profile = _profile_storage.get(student_id)
     activities = _portfolio_storage.get(student_id, [])
     
     return {
         "profile": jsonable_encoder(profile) if profile else None,
-        "activities": [jsonable_encoder(activity) for activity in activities]
+        "activities": [jsonable_encoder(activity.to_evidence()) for activity in activities]
     }
 
 @profile_router.post("/{student_id}")
 def create_or_update_profile(student_id: str, profile: StudentProfile):
     """Create or update student profile"""
     _profile_storage[student_id] = profile
+    if student_id in _score_states:
+        _score_states[student_id].set_intended_major(profile.intended_major)
+    profile_versions.bump(student_id)
     return {"message": "Profile updated", "profile": jsonable_encoder(profile)}
 
 @profile_router.post("/{student_id}/activities", response_model=Evidence)
@@ -93,14 +293,23 @@ def add_activity(student_id: str, activity: Evidence):
     """Add a new activity to student's portfolio"""
     if student_id not in _portfolio_storage:
         _portfolio_storage[student_id] = []
-    _portfolio_storage[student_id].append(activity)
+    if any(a.id == activity.id for a in _portfolio_storage[student_id]):
+        raise HTTPException(status_code=409, detail=f"Activity {activity.id} already exists")
+    record = ActivityRecord.from_evidence(activity)
+    _portfolio_storage[student_id].append(record)
+    _score_state(student_id).upsert(record)
+    profile_versions.bump(student_id)
     return jsonable_encoder(activity)
 
 @profile_router.get("/{student_id}/activities", response_model=List[Evidence])
-def get_activities(student_id: str):
+def get_activities(student_id: str, response: Response, if_none_match: Optional[str] = Header(None)):
     """Get all activities for a student"""
+    etag = strong_etag("activities", profile_versions.get(student_id) or 0)
+    if not_modified(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
     activities = _portfolio_storage.get(student_id, [])
-    return [jsonable_encoder(activity) for activity in activities]
+    return [jsonable_encoder(activity.to_evidence()) for activity in activities]
 
 @profile_router.put("/{student_id}/activities/{activity_id}", response_model=Evidence)
 def update_activity(student_id: str, activity_id: str, activity: Evidence):
@@ -113,8 +322,13 @@ def update_activity(student_id: str, activity_id: str, activity: Evidence):
     
     if index is None:
         raise HTTPException(status_code=404, detail="Activity not found")
+    if activity.id != activity_id and any(a.id == activity.id for a in activities):
+        raise HTTPException(status_code=409, detail=f"Activity {activity.id} already exists")
     
-    activities[index] = activity
+    record = ActivityRecord.from_evidence(activity)
+    activities[index] = record
+    _score_state(student_id).replace(activity_id, record)
+    profile_versions.bump(student_id)
     return jsonable_encoder(activity)
 
 @profile_router.delete("/{student_id}/activities/{activity_id}")
@@ -130,44 +344,162 @@ def delete_activity(student_id: str, activity_id: str):
     if len(_portfolio_storage[student_id]) == initial_length:
         raise HTTPException(status_code=404, detail="Activity not found")
     
+    _score_state(student_id).remove(activity_id)
+    profile_versions.bump(student_id)
     return {"message": "Activity deleted"}
 
+@profile_router.get("/{student_id}/scores")
+def get_scores(student_id: str):
+    """Current portfolio scores, maintained incrementally as activities change"""
+    state = _score_states.get(student_id)
+    return state.scores() if state else IncrementalPortfolioScores().scores()
+
 # Essay Analysis Routes
 essay_router = APIRouter(prefix="/essays", tags=["essays"])
 
-@essay_router.post("/analyze-text", response_model=EssayAnalysis)
-def analyze_essay_text(request: AnalyzeEssayRequest):
+def _essay_job_payload(request: AnalyzeEssayRequest, essay_id: Optional[str]) -> str:
+    return json.dumps({
+        "essay_text": request.essay_text,
+        "essay_id": essay_id,
+        "prompt": request.prompt_text,
+        "target_word_count": request.target_word_count,
+        "mode": request.analysis_mode
+    })
+
+@essay_router.post("/analyze-text", response_model=EssayAnalysis, responses=_JOB_RESPONSES)
+async def analyze_essay_text(request: AnalyzeEssayRequest, mode: RunMode = _MODE_QUERY, priority: int = _PRIORITY_QUERY):
     """Analyze essay text directly (for draft analysis)"""
     try:
-        analyzer = EssayAnalyzer()
-        result = analyzer.analyze_essay(
+        if mode == "async":
+            return await _job_accepted("essays.analyze", _essay_job_payload(request, request.essay_id), priority)
+        analyzer = AsyncEssayAnalyzer()
+        result = await _essay_flight.ado(
+            request_fingerprint(request),
+            analyzer.analyze_essay,
             essay_text=request.essay_text,
             essay_id=request.essay_id,
             prompt=request.prompt_text,
-            target_word_count=request.target_word_count
+            target_word_count=request.target_word_count,
+            mode=request.analysis_mode
         )
-        return jsonable_encoder(result)
+        return _model_response(result)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Essay analysis error: {e}")
 
-@essay_router.post("/{essay_id}/analyze", response_model=EssayAnalysis)
-def analyze_essay(
+@essay_router.post("/{essay_id}/analyze", response_model=EssayAnalysis, responses=_JOB_RESPONSES)
+async def analyze_essay(
     essay_id: str,
-    request: AnalyzeEssayRequest
+    request: AnalyzeEssayRequest,
+    mode: RunMode = _MODE_QUERY,
+    priority: int = _PRIORITY_QUERY
 ):
     """Analyze an essay by ID and return feedback"""
     try:
-        analyzer = EssayAnalyzer()
-        result = analyzer.analyze_essay(
+        if mode == "async":
+            return await _job_accepted("essays.analyze", _essay_job_payload(request, essay_id), priority)
+        analyzer = AsyncEssayAnalyzer()
+        result = await _essay_flight.ado(
+            request_fingerprint(request, essay_id),
+            analyzer.analyze_essay,
             essay_text=request.essay_text,
             essay_id=essay_id,
             prompt=request.prompt_text,
-            target_word_count=request.target_word_count
+            target_word_count=request.target_word_count,
+            mode=request.analysis_mode
         )
-        return jsonable_encoder(result)
+        return _model_response(result)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Essay analysis error: {e}")
+
+# Background jobs
+jobs_router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@jobs_router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=60, description="Long-poll: seconds to wait for the job to finish")):
+    """Status, timings and, once finished, the result or error of a background job"""
+    try:
+        job = await job_queue.wait(job_id, wait) if wait else await job_queue.aget(job_id)
+    except UnknownJob as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _model_response(JobResponse(**job))
+
+@jobs_router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: `status` on every change, then `done` with the finished job"""
+    try:
+        await job_queue.aget(job_id)
+    except UnknownJob as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def events():
+        async for job in job_queue.watch(job_id):
+            if job is None:
+                yield ": keep-alive\n\n"
+                continue
+            event = "done" if job["status"] in TERMINAL else "status"
+            yield f"event: {event}\ndata: {JobResponse(**job).model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Operational endpoints
+ops_router = APIRouter(prefix="/ops", tags=["ops"])
+
+@ops_router.get("/llm-cache")
+def llm_cache_stats():
+    """Hit/miss counters and entry counts for the LLM response cache"""
+    return response_cache.stats()
+
+@ops_router.delete("/llm-cache")
+def invalidate_llm_cache(prefix: str = Query("", description="Key prefix, e.g. 'essay.' or 'portfolio.structured'")):
+    """Invalidate cached LLM responses whose key starts with prefix (empty prefix clears everything)"""
+    removed = response_cache.invalidate(prefix)
+    return {"invalidated": removed, "prefix": prefix}
+
+@ops_router.get("/scoring-contexts")
+def scoring_context_stats():
+    """Entries, cached portfolio items, hits, misses and evictions of the scoring-context LRU"""
+    return scoring_contexts.stats()
+
+@ops_router.get("/percentiles")
+def percentile_index_stats():
+    """Students, cohort cells, pending writes and merge counters of the cohort percentile index"""
+    return percentile_index.stats()
+
+@ops_router.get("/jobs")
+def job_queue_stats():
+    """Jobs by status, worker count, retry counters and queue/run/total time percentiles per job kind"""
+    return job_queue.stats()
+
+@ops_router.get("/coalescing")
+def coalescing_metrics():
+    """Executions vs. coalesced requests for each single-flight group"""
+    return coalescing_stats()
+
+@ops_router.get("/llm-limiter")
+def llm_limiter_metrics():
+    """Concurrency limit, token bucket level, queue wait times and rejection counts of the LLM governor"""
+    return llm_limiter.stats()
+
+@ops_router.get("/llm-backend")
+def llm_backend_info():
+    """Active LLM backend; the local stand-in also reports call and token accounting"""
+    return backend_stats()
+
+@ops_router.get("/circuit-breaker")
+def circuit_breaker_status():
+    """State, counters and recent state transitions of the LLM circuit breaker"""
+    return llm_breaker.stats()
+
+@ops_router.post("/circuit-breaker/reset")
+def reset_circuit_breaker():
+    """Force the LLM circuit breaker closed"""
+    llm_breaker.reset()
+    return llm_breaker.stats()
@@ -0,0 +1,141 @@
+"""
+Batch Portfolio Analysis
+NDJSON in, NDJSON out: one PortfolioAnalyzeRequest per input line, one
+result line per item in completion order, then a summary line.
+
+The body is read as it arrives and at most ANALYZE_BATCH_CONCURRENCY items
+are in flight. An item keeps its slot until its result line has been handed
+to the response, so a slow reader also throttles the body reader and memory
+is bounded by the concurrency, not the batch size. If the response is closed
+early, items still in flight are cancelled. Items without as_of share the
+date the batch started on, items naming the same schools share one
+resolution of their school contexts (SharedSchools), and identical items
+coalesce with each other and with /portfolio/analyze through its
+single-flight group.
+"""
+
+from __future__ import annotations
+from datetime import date
+from typing import AsyncIterator, Optional, Tuple
+import asyncio
+import json
+import os
+from pydantic import ValidationError
+from .models import PortfolioAnalyzeRequest
+from .school_sets import SharedSchools, UnknownSchoolSet
+from .service import aanalyze_portfolio_response
+from .singleflight import flight_group, request_fingerprint
+
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "8"))
+ANALYZE_BATCH_MAX_LINE_BYTES = int(os.getenv("ANALYZE_BATCH_MAX_LINE_BYTES", str(1 << 20)))
+
+_analyze_flight = flight_group("portfolio.analyze")
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """Non-blank lines of an NDJSON stream; None stands for a line longer than max_line_bytes"""
+    buffer = bytearray()
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end < 0 else chunk[start:end]
+            if not oversized and len(buffer) + len(piece) > max_line_bytes:
+                oversized = True
+                buffer.clear()
+            if not oversized:
+                buffer += piece
+            if end < 0:
+                break
+            if oversized:
+                yield None
+            elif buffer.strip():
+                yield bytes(buffer).strip()
+            buffer.clear()
+            oversized = False
+            start = end + 1
+    if oversized:
+        yield None
+    elif buffer.strip():
+        yield bytes(buffer).strip()
+
+
+def _failure(index: int, student_id: Optional[str], status: int, detail) -> dict:
+    return {"index": index, "student_id": student_id, "status": status, "detail": detail}
+
+
+async def analyze_item(index: int, line: Optional[bytes], as_of: date, shared: SharedSchools,
+                       max_line_bytes: int = ANALYZE_BATCH_MAX_LINE_BYTES) -> Tuple[bool, str]:
+    """
+    (succeeded, result line) of one batch item. Failures carry the status code
+    /portfolio/analyze would have answered with.
+    """
+    if line is None:
+        return False, _ndjson(_failure(index, None, 413, f"Line exceeds {max_line_bytes} bytes"))
+    try:
+        req = PortfolioAnalyzeRequest.model_validate_json(line)
+    except ValidationError as e:
+        return False, _ndjson(_failure(index, None, 422, json.loads(e.json(include_url=False, include_input=False))))
+    student_id = req.student_profile.student_id if req.student_profile else None
+    if req.as_of is None:
+        req = req.model_copy(update={"as_of": as_of})
+    try:
+        result = await _analyze_flight.ado(request_fingerprint(req), aanalyze_portfolio_response, req, shared)
+        body = result.model_dump_json()
+    except UnknownSchoolSet as e:
+        return False, _ndjson(_failure(index, student_id, 404, str(e)))
+    except ValueError as e:
+        return False, _ndjson(_failure(index, student_id, 422, str(e)))
+    except Exception as e:
+        return False, _ndjson(_failure(index, student_id, 500, f"Analyzer error: {e}"))
+    # The result is already serialized; splice it into the envelope instead of re-encoding it
+    envelope = _ndjson({"index": index, "student_id": student_id, "status": 200})
+    return True, f'{envelope[:-2]},"result":{body}}}\n'
+
+
+def _ndjson(obj: dict) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+async def analyze_batch(chunks: AsyncIterator[bytes], concurrency: int = ANALYZE_BATCH_CONCURRENCY,
+                        max_line_bytes: int = ANALYZE_BATCH_MAX_LINE_BYTES) -> AsyncIterator[str]:
+    """Analyze every line of an NDJSON body, yielding result lines as items finish"""
+    as_of = date.today()
+    shared = SharedSchools()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    finished: asyncio.Queue = asyncio.Queue()
+    running: set = set()
+
+    async def feed() -> int:
+        index = 0
+        async for line in ndjson_lines(chunks, max_line_bytes):
+            await slots.acquire()
+            item = asyncio.ensure_future(analyze_item(index, line, as_of, shared, max_line_bytes))
+            running.add(item)
+            item.add_done_callback(running.discard)
+            item.add_done_callback(finished.put_nowait)
+            index += 1
+        return index
+
+    feeder = asyncio.ensure_future(feed())
+    feeder.add_done_callback(finished.put_nowait)
+    total, sent, failed = None, 0, 0
+    try:
+        while total is None or sent < total:
+            task = await finished.get()
+            if task is feeder:
+                total = task.result()
+                continue
+            succeeded, line = task.result()
+            failed += not succeeded
+            yield line
+            sent += 1
+            slots.release()
+        yield _ndjson({"summary": {"items": total, "succeeded": total - failed, "failed": failed}})
+    finally:
+        # The client may have gone away: stop reading and stop items still calling the LLM
+        outstanding = [feeder, *running]
+        for task in outstanding:
+            task.cancel()
+        await asyncio.gather(*outstanding, return_exceptions=True)
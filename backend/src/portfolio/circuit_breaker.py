@@ -0,0 +1,149 @@
+"""
+LLM Circuit Breaker
+Shared closed / open / half-open breaker around every LLM call.
+
+Consecutive upstream failures (5xx, timeouts, connection errors) open the
+breaker; while open, calls fail immediately with CircuitOpen so callers go
+straight to their rule-based fallbacks. After the recovery timeout a limited
+number of probe calls are let through (half-open): a success closes the
+breaker, a failure opens it again. 429s are left to the concurrency governor.
+"""
+
+from __future__ import annotations
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+import os
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the LLM while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._transitions: deque[dict] = deque(maxlen=50)
+        self._counters = {"calls": 0, "successes": 0, "failures": 0, "short_circuited": 0}
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")),
+            recovery_timeout=float(os.getenv("LLM_BREAKER_RECOVERY_SECONDS", "30")),
+            half_open_max_calls=int(os.getenv("LLM_BREAKER_HALF_OPEN_CALLS", "1"))
+        )
+
+    def _transition_locked(self, state: str, reason: str) -> None:
+        if state == self.state:
+            return
+        self._transitions.append({
+            "from": self.state,
+            "to": state,
+            "reason": reason,
+            "at": datetime.now(timezone.utc).isoformat()
+        })
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            self._probes_in_flight = 0
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be short-circuited without probing"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.recovery_timeout
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpen"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self._counters["short_circuited"] += 1
+                    raise CircuitOpen(f"LLM circuit '{self.name}' is open")
+                self._transition_locked(HALF_OPEN, "recovery timeout elapsed")
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    self._counters["short_circuited"] += 1
+                    raise CircuitOpen(f"LLM circuit '{self.name}' is half-open and probing")
+                self._probes_in_flight += 1
+            self._counters["calls"] += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._counters["successes"] += 1
+            self._consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self._transition_locked(CLOSED, "probe succeeded")
+
+    def record_failure(self, error: Optional[Exception] = None) -> None:
+        reason = type(error).__name__ if error is not None else "failure"
+        with self._lock:
+            self._counters["failures"] += 1
+            self._consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._transition_locked(OPEN, f"probe failed: {reason}")
+            elif self.state == CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._transition_locked(OPEN, f"{self._consecutive_failures} consecutive failures, last: {reason}")
+
+    def record_ignored(self) -> None:
+        """Release a half-open probe slot for an outcome that says nothing about upstream health"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            self._transition_locked(CLOSED, "manual reset")
+
+    def stats(self) -> dict:
+        with self._lock:
+            retry_in = self.recovery_timeout - (time.monotonic() - self._opened_at) if self.state == OPEN else 0.0
+            return {
+                "name": self.name,
+                "state": self.state,
+                **self._counters,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout_s": self.recovery_timeout,
+                "half_open_in_s": round(max(0.0, retry_in), 3),
+                "transitions": list(self._transitions)
+            }
+
+
+def is_breaker_failure(error: Exception) -> bool:
+    """Upstream health failures: 5xx, timeouts and connection errors"""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+        "APITimeoutError", "APIConnectionError", "InternalServerError"
+    )
+
+
+llm_breaker = CircuitBreaker.from_env("openai")
@@ -0,0 +1,196 @@
+"""
+Cohort Scoring Engine
+Batch version of compute_impact / normalize_impacts / lens_scores /
+coverage_index / detect_spike for many students at once.
+
+A cohort is loaded once into columnar NumPy arrays (one row per evidence
+item, rows of a student contiguous), and every stage is a vectorized
+expression or a segment reduction over the student index. Results match
+the scalar functions in service.py bit for bit:
+- sums are accumulated in portfolio order (np.bincount adds sequentially),
+- log1p columns and the entropy logs use math.log1p / math.log, because
+  NumPy's SIMD log kernels can differ from libm in the last bit.
+Evidence ids are assumed unique within a portfolio.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import numpy as np
+from .constants import AWARD_WEIGHT, LENS_LIST, ROLE_WEIGHT, SPIKE_MIN_SHARE
+from .models import Evidence
+from .service import _weeks_between
+
+LENS_INDEX = {lens: i for i, lens in enumerate(LENS_LIST)}
+N_LENSES = len(LENS_LIST)
+
+
+@dataclass
+class CohortArrays:
+    """Columnar view of a cohort; one row per evidence item"""
+    n_students: int
+    evidence_ids: List[str]
+    role_weight: np.ndarray
+    log_people: np.ndarray
+    log_hours: np.ndarray
+    award_weight: np.ndarray
+    lens_idx: np.ndarray
+    student_idx: np.ndarray
+    theme_idx: np.ndarray   # -1 when the item has no theme tags
+    themes: List[str]
+
+
+@dataclass
+class CohortScores:
+    """Per-item and per-student outputs of score_cohort"""
+    arrays: CohortArrays
+    impacts_raw: np.ndarray     # per item
+    impacts_norm: np.ndarray    # per item
+    lens_scores: np.ndarray     # n_students x N_LENSES, columns in LENS_LIST order
+    coverage: np.ndarray        # per student
+    spike_theme: List[Optional[str]]
+    spike_share: np.ndarray     # per student
+
+    def _rows(self, student: int) -> np.ndarray:
+        return np.flatnonzero(self.arrays.student_idx == student)
+
+    def impacts_for(self, student: int) -> Dict[str, float]:
+        return {self.arrays.evidence_ids[i]: float(self.impacts_norm[i]) for i in self._rows(student)}
+
+    def lens_scores_for(self, student: int) -> Dict[str, float]:
+        return {lens: float(v) for lens, v in zip(LENS_LIST, self.lens_scores[student])}
+
+    def spike_for(self, student: int) -> Tuple[Optional[str], float]:
+        return self.spike_theme[student], float(self.spike_share[student])
+
+
+def load_cohort(portfolios: Sequence[List[Evidence]], today: Optional[date] = None) -> CohortArrays:
+    """Extract the columns compute_impact needs from each student's evidence list"""
+    role, people, hours, award, lens, student, theme_idx, ids = [], [], [], [], [], [], [], []
+    themes: Dict[str, int] = {}
+    for s, portfolio in enumerate(portfolios):
+        for ev in portfolio:
+            if ev.hours_total is not None:
+                hours_total = ev.hours_total
+            else:
+                end = (ev.end_date or today) if ev.start_date else None
+                hours_total = (ev.hours_per_week or 0) * _weeks_between(ev.start_date, end)
+            award_max = 0.0
+            for a in ev.awards:
+                award_max = max(award_max, AWARD_WEIGHT.get(str(a.get("level", "none")).lower(), 0.0))
+            role.append(ROLE_WEIGHT[ev.role_level])
+            people.append(math.log1p(ev.people_impacted or 0))
+            hours.append(math.log1p(hours_total or 0))
+            award.append(award_max)
+            lens.append(LENS_INDEX[ev.lens])
+            student.append(s)
+            theme_idx.append(themes.setdefault(ev.theme_tags[0].lower(), len(themes)) if ev.theme_tags else -1)
+            ids.append(ev.id)
+    return CohortArrays(
+        n_students=len(portfolios),
+        evidence_ids=ids,
+        role_weight=np.array(role, dtype=np.float64),
+        log_people=np.array(people, dtype=np.float64),
+        log_hours=np.array(hours, dtype=np.float64),
+        award_weight=np.array(award, dtype=np.float64),
+        lens_idx=np.array(lens, dtype=np.int64),
+        student_idx=np.array(student, dtype=np.int64),
+        theme_idx=np.array(theme_idx, dtype=np.int64),
+        themes=list(themes)
+    )
+
+
+def _exact_log(x: np.ndarray) -> np.ndarray:
+    return np.fromiter(map(math.log, x.tolist()), dtype=np.float64, count=x.size)
+
+
+def _normalize(impacts_raw: np.ndarray, student_idx: np.ndarray, n_students: int) -> np.ndarray:
+    """Per-student min-max scaling to 0-10 (5.0 for every item when max == min)"""
+    mn = np.full(n_students, np.inf)
+    mx = np.full(n_students, -np.inf)
+    np.minimum.at(mn, student_idx, impacts_raw)
+    np.maximum.at(mx, student_idx, impacts_raw)
+    lo, hi = mn[student_idx], mx[student_idx]
+    flat = np.abs(hi - lo) < 1e-9
+    span = np.where(flat, 1.0, hi - lo)
+    return np.where(flat, 5.0, 10.0 * (impacts_raw - lo) / span)
+
+
+def _lens_scores(impacts_norm: np.ndarray, a: CohortArrays) -> np.ndarray:
+    sums = np.bincount(a.student_idx * N_LENSES + a.lens_idx, weights=impacts_norm,
+                       minlength=a.n_students * N_LENSES).reshape(a.n_students, N_LENSES)
+    max_sum = sums.max(axis=1)
+    max_sum = np.where(max_sum <= 0, 1.0, max_sum)
+    return (sums / max_sum[:, None]) * 10.0
+
+
+def _coverage(lens_s: np.ndarray) -> np.ndarray:
+    # Column-by-column accumulation keeps the scalar summation order
+    total = np.zeros(lens_s.shape[0])
+    for j in range(N_LENSES):
+        total = total + lens_s[:, j]
+    safe_total = np.where(total > 0, total, 1.0)
+    entropy = np.zeros(lens_s.shape[0])
+    for j in range(N_LENSES):
+        p = lens_s[:, j] / safe_total
+        positive = p > 0
+        logs = np.zeros_like(p)
+        logs[positive] = _exact_log(p[positive])
+        entropy = np.where(positive, entropy - p * logs, entropy)
+    return np.where(total > 0, entropy / math.log(N_LENSES), 0.0)
+
+
+def _spikes(impacts_norm: np.ndarray, a: CohortArrays) -> Tuple[List[Optional[str]], np.ndarray]:
+    themed = a.theme_idx >= 0
+    shares = np.zeros(a.n_students)
+    spike_theme: List[Optional[str]] = [None] * a.n_students
+    if not themed.any():
+        return spike_theme, shares
+    students, theme_ids, weights = a.student_idx[themed], a.theme_idx[themed], impacts_norm[themed]
+
+    # Groups are (student, theme) pairs numbered in first-appearance order, like the scalar dict
+    keys = students * len(a.themes) + theme_ids
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.size)
+    group_sum = np.bincount(rank[inverse], weights=weights, minlength=order.size)
+    group_student = students[first[order]]
+    group_theme = theme_ids[first[order]]
+
+    total = np.bincount(group_student, weights=group_sum, minlength=a.n_students)
+    top = np.full(a.n_students, -np.inf)
+    np.maximum.at(top, group_student, group_sum)
+    # First group reaching the maximum wins ties, as max() over dict items does
+    candidate = np.where(group_sum == top[group_student], np.arange(group_sum.size), group_sum.size)
+    winner = np.full(a.n_students, group_sum.size)
+    np.minimum.at(winner, group_student, candidate)
+
+    has_total = total > 0
+    has_group = winner < group_sum.size
+    top_sum = np.where(has_group, group_sum[np.minimum(winner, group_sum.size - 1)], 0.0)
+    shares = np.where(has_total, top_sum / np.where(has_total, total, 1.0), 0.0)
+    for s in np.flatnonzero(has_total & (shares >= SPIKE_MIN_SHARE)):
+        spike_theme[s] = a.themes[group_theme[winner[s]]]
+    return spike_theme, shares
+
+
+def score_cohort(portfolios: Sequence[List[Evidence]], today: Optional[date] = None) -> CohortScores:
+    """Score every student's portfolio in one vectorized pass"""
+    return score_arrays(load_cohort(portfolios, today))
+
+
+def score_arrays(a: CohortArrays) -> CohortScores:
+    impacts_raw = (
+        0.28 * a.role_weight +
+        0.18 * a.log_people +
+        0.38 * a.log_hours +
+        0.16 * a.award_weight
+    )
+    impacts_norm = _normalize(impacts_raw, a.student_idx, a.n_students) if impacts_raw.size else impacts_raw
+    lens_s = _lens_scores(impacts_norm, a)
+    coverage = _coverage(lens_s)
+    spike_theme, spike_share = _spikes(impacts_norm, a)
+    return CohortScores(a, impacts_raw, impacts_norm, lens_s, coverage, spike_theme, spike_share)
@@ -0,0 +1,120 @@
+"""
+Request Deadlines
+End-to-end latency budgets that are passed down to every LLM call.
+
+A Deadline is installed for the duration of a request with deadline_scope();
+chat_completion picks it up from a context variable, caps its limiter wait and
+HTTP timeout by the remaining budget, and refuses to start once it has expired.
+hedge() races an LLM-backed computation against its deterministic fallback;
+ahedge() does the same for an asyncio task.
+"""
+
+from __future__ import annotations
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional, Tuple
+import asyncio
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an LLM call would start after its request deadline"""
+
+
+class Deadline:
+    """Monotonic end-to-end budget for one request"""
+
+    def __init__(self, budget_seconds: float):
+        self.budget = float(budget_seconds)
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"Request deadline of {self.budget:.2f}s exceeded")
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make `deadline` the budget for LLM calls made in this context"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def hedge(
+    primary: Future,
+    fallback: Callable[[], Any],
+    deadline: Deadline,
+    speculate_at: float
+) -> Tuple[Any, str]:
+    """
+    Wait for `primary` within the deadline, hedging with `fallback`.
+
+    Once only `speculate_at` seconds of budget remain the fallback is computed
+    speculatively; the primary result still wins if it lands before the
+    deadline. Returns (result, source) where source is "primary" or one of
+    "error" / "deadline" describing why the fallback was used.
+    """
+    speculative = None
+    try:
+        return primary.result(timeout=max(0.0, deadline.remaining() - speculate_at)), "primary"
+    except FutureTimeout:
+        speculative = fallback()
+    except Exception:
+        return fallback(), "error"
+
+    try:
+        return primary.result(timeout=deadline.remaining()), "primary"
+    except FutureTimeout:
+        return speculative, "deadline"
+    except Exception:
+        return speculative, "error"
+
+
+async def ahedge(
+    primary: "asyncio.Future",
+    fallback: Callable[[], Any],
+    deadline: Deadline,
+    speculate_at: float
+) -> Tuple[Any, str]:
+    """
+    hedge() for an asyncio task. A primary that misses the deadline is left
+    to finish in the background rather than cancelled, so the circuit
+    breaker still sees the outcome of the call; its exception is consumed.
+    """
+    primary.add_done_callback(lambda f: f.cancelled() or f.exception())
+    speculative = None
+    try:
+        return await asyncio.wait_for(asyncio.shield(primary), max(0.0, deadline.remaining() - speculate_at)), "primary"
+    except asyncio.TimeoutError:
+        speculative = fallback()
+    except Exception:
+        return fallback(), "error"
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(primary), deadline.remaining()), "primary"
+    except asyncio.TimeoutError:
+        return speculative, "deadline"
+    except Exception:
+        return speculative, "error"
@@ -4,68 +4,116 @@ Provides AI-powered analysis of college application essays
 """
 
 from typing import Optional
+import asyncio
 import json
-import os
+import re
 from datetime import datetime
-from openai import OpenAI
-from dotenv import load_dotenv
 import textstat
-from .models import EssayAnalysis, EssaySuggestion
+from .models import EssayAnalysis, EssaySuggestion, EssayAnalysisMode
+from .llm import chat_completion, achat_completion, client, async_client
+from .prompt_builder import PromptBuilder
 
-# Load environment variables
-env_paths = [
-    os.path.join(os.path.dirname(__file__), '..', '..', '..', '.env'),
-    os.path.join(os.path.dirname(__file__), '..', '..', '.env'),
-    os.path.join(os.getcwd(), '.env'),
-    '.env'
-]
-for env_path in env_paths:
-    abs_path = os.path.abspath(env_path)
-    if os.path.exists(abs_path):
-        load_dotenv(dotenv_path=abs_path)
-        break
-else:
-    load_dotenv()
+_NULLABLE_STRING = {"type": ["string", "null"]}
 
-_openai_api_key = os.getenv("OPENAI_API_KEY")
-if _openai_api_key:
-    _openai_api_key = _openai_api_key.strip().strip('"').strip("'")
-client = OpenAI(api_key=_openai_api_key) if _openai_api_key else None
+# Strict JSON schema for single-shot mode: scores, feedback and suggestions in one completion
+SINGLE_SHOT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overall_score": {"type": "number"},
+        "content_score": {"type": "number"},
+        "tone_score": {"type": "number"},
+        "prompt_alignment_score": {"type": "number"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "weaknesses": {"type": "array", "items": {"type": "string"}},
+        "suggestions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string", "enum": ["structure", "content", "tone", "grammar", "clarity", "prompt_alignment"]},
+                    "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+                    "location": _NULLABLE_STRING,
+                    "current_text": _NULLABLE_STRING,
+                    "suggested_text": _NULLABLE_STRING,
+                    "explanation": {"type": "string"}
+                },
+                "required": ["type", "priority", "location", "current_text", "suggested_text", "explanation"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["overall_score", "content_score", "tone_score", "prompt_alignment_score", "strengths", "weaknesses", "suggestions"],
+    "additionalProperties": False
+}
+
+# Static parts of the suggestions prompt; the essay and its analysis follow them
+SUGGESTIONS_SYSTEM_PROMPT = "You are an expert essay editor. Provide specific, actionable suggestions in JSON format."
+SUGGESTIONS_INSTRUCTIONS = """Based on the essay analysis that follows, provide 5-7 specific, actionable suggestions.
+
+For each suggestion, provide a JSON object with:
+- type: one of "structure", "content", "tone", "grammar", "clarity", "prompt_alignment"
+- priority: "high", "medium", or "low"
+- location: specific sentence/paragraph reference if applicable (e.g., "paragraph 2", "opening sentence")
+- current_text: the text that needs improvement (if applicable, quote exact text)
+- suggested_text: improved version (if applicable)
+- explanation: why this change helps (2-3 sentences)
+
+Return a JSON object with a "suggestions" array containing these objects."""
 
 
 class EssayAnalyzer:
     """Analyzes college application essays using AI and text analysis"""
     
-    def __init__(self, openai_client: Optional[OpenAI] = None):
+    def __init__(self, openai_client=None):
         self.client = openai_client or client
         if not self.client:
-            raise ValueError("OpenAI client not initialized. Please set OPENAI_API_KEY environment variable.")
+            raise ValueError("LLM client not initialized. Please set OPENAI_API_KEY (or LLM_BACKEND=local).")
     
     def analyze_essay(
         self,
         essay_text: str,
         essay_id: Optional[str] = None,
         prompt: Optional[str] = None,
-        target_word_count: Optional[int] = None
+        target_word_count: Optional[int] = None,
+        mode: EssayAnalysisMode = "multi_call"
     ) -> EssayAnalysis:
         """Comprehensive essay analysis"""
         
         # Basic metrics
-        word_count = len(essay_text.split())
         readability = textstat.flesch_reading_ease(essay_text)
         
-        # AI-powered analysis
-        analysis = self._get_ai_analysis(essay_text, prompt, target_word_count)
+        if mode == "single_shot":
+            analysis, alignment_score, suggestions = self._get_single_shot_analysis(essay_text, prompt, target_word_count)
+        else:
+            # AI-powered analysis
+            analysis = self._get_ai_analysis(essay_text, prompt, target_word_count)
+            
+            # Prompt alignment
+            alignment_score = self._check_prompt_alignment(essay_text, prompt) if prompt else 7.0
+            
+            # Generate suggestions
+            suggestions = self._generate_suggestions(essay_text, analysis, prompt)
+        
+        return self._build_analysis(
+            essay_text, essay_id, target_word_count, readability, analysis, alignment_score, suggestions
+        )
+    
+    def _build_analysis(
+        self,
+        essay_text: str,
+        essay_id: Optional[str],
+        target_word_count: Optional[int],
+        readability: float,
+        analysis: dict,
+        alignment_score: float,
+        suggestions: list[EssaySuggestion]
+    ) -> EssayAnalysis:
+        """Combine LLM results with local metrics into an EssayAnalysis"""
+        word_count = len(essay_text.split())
         
         # Structure analysis
         structure_score, _ = self._analyze_structure(essay_text)
         
-        # Prompt alignment
-        alignment_score = self._check_prompt_alignment(essay_text, prompt) if prompt else 7.0
-        
-        # Generate suggestions
-        suggestions = self._generate_suggestions(essay_text, analysis, prompt)
-        
         # Generate ID if not provided
         analysis_id = f"analysis-{datetime.now().isoformat()}-{hash(essay_text) % 10000}"
         
@@ -86,13 +134,13 @@ class EssayAnalyzer:
             created_at=datetime.now().isoformat()
         )
     
-    def _get_ai_analysis(
+    def _analysis_request(
         self,
         essay_text: str,
         prompt: Optional[str],
         target_word_count: Optional[int]
     ) -> dict:
-        """Use GPT to analyze essay content, tone, and quality"""
+        """Completion arguments for the main content/tone analysis"""
         prompt_text = f"""Analyze this college application essay and provide detailed feedback.
 
 Essay:
@@ -109,7 +157,48 @@ Provide a JSON response with:
 5. tone_score: number between 0-10
 
 Return only valid JSON."""
+        return dict(
+            namespace="essay.analysis",
+            model="gpt-4o-mini",  # Using mini for cost efficiency, can upgrade to gpt-4
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an expert college admissions essay reviewer. Provide detailed, constructive feedback in JSON format."
+                },
+                {"role": "user", "content": prompt_text}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.3
+        )
+    
+    def _parse_analysis(self, content: str) -> dict:
+        result = json.loads(content)
         
+        # Ensure all required fields exist with defaults
+        return {
+            "overall_score": float(result.get("overall_score", 7.0)),
+            "strengths": result.get("strengths", []),
+            "weaknesses": result.get("weaknesses", []),
+            "content_score": float(result.get("content_score", 7.0)),
+            "tone_score": float(result.get("tone_score", 7.0))
+        }
+    
+    def _default_analysis(self) -> dict:
+        return {
+            "overall_score": 7.0,
+            "strengths": ["Essay has been submitted for analysis"],
+            "weaknesses": ["Unable to complete full analysis"],
+            "content_score": 7.0,
+            "tone_score": 7.0
+        }
+    
+    def _get_ai_analysis(
+        self,
+        essay_text: str,
+        prompt: Optional[str],
+        target_word_count: Optional[int]
+    ) -> dict:
+        """Use GPT to analyze essay content, tone, and quality"""
         if not self.client:
             return {
                 "overall_score": 7.0,
@@ -120,40 +209,13 @@ Return only valid JSON."""
             }
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Using mini for cost efficiency, can upgrade to gpt-4
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert college admissions essay reviewer. Provide detailed, constructive feedback in JSON format."
-                    },
-                    {"role": "user", "content": prompt_text}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.3
-            )
-            
-            content = response.choices[0].message.content
-            result = json.loads(content)
-            
-            # Ensure all required fields exist with defaults
-            return {
-                "overall_score": float(result.get("overall_score", 7.0)),
-                "strengths": result.get("strengths", []),
-                "weaknesses": result.get("weaknesses", []),
-                "content_score": float(result.get("content_score", 7.0)),
-                "tone_score": float(result.get("tone_score", 7.0))
-            }
+            request = self._analysis_request(essay_text, prompt, target_word_count)
+            content = chat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_analysis(content)
         except Exception as e:
             print(f"Error in AI analysis: {e}")
             # Return default analysis on error
-            return {
-                "overall_score": 7.0,
-                "strengths": ["Essay has been submitted for analysis"],
-                "weaknesses": ["Unable to complete full analysis"],
-                "content_score": 7.0,
-                "tone_score": 7.0
-            }
+            return self._default_analysis()
     
     def _analyze_structure(self, essay_text: str) -> tuple[float, dict]:
         """Analyze essay structure (intro, body, conclusion)"""
@@ -196,12 +258,8 @@ Return only valid JSON."""
         
         return structure_score, feedback
     
-    def _check_prompt_alignment(
-        self,
-        essay_text: str,
-        prompt: str
-    ) -> float:
-        """Check how well essay addresses the prompt"""
+    def _alignment_request(self, essay_text: str, prompt: str) -> dict:
+        """Completion arguments for the prompt-alignment rating"""
         alignment_prompt = f"""Rate how well this essay addresses the prompt on a scale of 0-10.
 
 Prompt: {prompt}
@@ -214,35 +272,96 @@ Consider:
 - Does it meet all requirements?
 
 Return only a number between 0 and 10."""
-        
+        return dict(
+            namespace="essay.alignment",
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an expert at evaluating how well essays address their prompts. Return only a number."
+                },
+                {"role": "user", "content": alignment_prompt}
+            ],
+            temperature=0.2
+        )
+    
+    def _parse_alignment(self, content: str) -> float:
+        # Extract number from response
+        numbers = re.findall(r'\d+\.?\d*', content.strip())
+        if numbers:
+            score = float(numbers[0])
+            return max(0.0, min(10.0, score))
+        return 7.0
+    
+    def _check_prompt_alignment(
+        self,
+        essay_text: str,
+        prompt: str
+    ) -> float:
+        """Check how well essay addresses the prompt"""
         if not self.client:
             return 7.0
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert at evaluating how well essays address their prompts. Return only a number."
-                    },
-                    {"role": "user", "content": alignment_prompt}
-                ],
-                temperature=0.2
-            )
-            
-            content = response.choices[0].message.content.strip()
-            # Extract number from response
-            import re
-            numbers = re.findall(r'\d+\.?\d*', content)
-            if numbers:
-                score = float(numbers[0])
-                return max(0.0, min(10.0, score))
-            return 7.0
+            request = self._alignment_request(essay_text, prompt)
+            content = chat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_alignment(content)
         except Exception as e:
             print(f"Error in prompt alignment check: {e}")
             return 7.0
     
+    def _suggestions_request(
+        self,
+        essay_text: str,
+        analysis: dict,
+        prompt: Optional[str]
+    ) -> dict:
+        """Completion arguments for the improvement suggestions, compacted to the prompt token budget"""
+        builder = PromptBuilder("essay.suggestions").system(SUGGESTIONS_SYSTEM_PROMPT).instructions(SUGGESTIONS_INSTRUCTIONS)
+        builder.section("ANALYSIS", json.dumps(analysis, separators=(",", ":")))
+        if prompt:
+            builder.section("PROMPT", prompt)
+        builder.section("ESSAY", essay_text, truncatable=True)
+        return dict(
+            namespace="essay.suggestions",
+            model="gpt-4o-mini",
+            messages=builder.build(),
+            response_format={"type": "json_object"},
+            temperature=0.4
+        )
+    
+    def _parse_suggestions(self, content: str) -> list[EssaySuggestion]:
+        result = json.loads(content)
+        
+        suggestions_data = result.get("suggestions", [])
+        suggestions = []
+        
+        for sug in suggestions_data[:7]:  # Limit to 7 suggestions
+            try:
+                suggestion = EssaySuggestion(
+                    type=sug.get("type", "content"),
+                    priority=sug.get("priority", "medium"),
+                    location=sug.get("location"),
+                    current_text=sug.get("current_text"),
+                    suggested_text=sug.get("suggested_text"),
+                    explanation=sug.get("explanation", "No explanation provided")
+                )
+                suggestions.append(suggestion)
+            except Exception as e:
+                print(f"Error parsing suggestion: {e}")
+                continue
+        
+        return suggestions
+    
+    def _default_suggestions(self) -> list[EssaySuggestion]:
+        return [
+            EssaySuggestion(
+                type="content",
+                priority="medium",
+                explanation="Review the essay for clarity and impact. Consider adding specific examples and details."
+            )
+        ]
+    
     def _generate_suggestions(
         self,
         essay_text: str,
@@ -250,26 +369,6 @@ Return only a number between 0 and 10."""
         prompt: Optional[str]
     ) -> list[EssaySuggestion]:
         """Generate specific improvement suggestions"""
-        suggestion_prompt = f"""Based on this essay analysis, provide 5-7 specific, actionable suggestions.
-
-Essay:
-{essay_text}
-
-Analysis:
-{json.dumps(analysis, indent=2)}
-
-{f'Prompt: {prompt}' if prompt else ''}
-
-For each suggestion, provide a JSON object with:
-- type: one of "structure", "content", "tone", "grammar", "clarity", "prompt_alignment"
-- priority: "high", "medium", or "low"
-- location: specific sentence/paragraph reference if applicable (e.g., "paragraph 2", "opening sentence")
-- current_text: the text that needs improvement (if applicable, quote exact text)
-- suggested_text: improved version (if applicable)
-- explanation: why this change helps (2-3 sentences)
-
-Return a JSON object with a "suggestions" array containing these objects."""
-        
         if not self.client:
             return [
                 EssaySuggestion(
@@ -280,49 +379,168 @@ Return a JSON object with a "suggestions" array containing these objects."""
             ]
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert essay editor. Provide specific, actionable suggestions in JSON format."
-                    },
-                    {"role": "user", "content": suggestion_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.4
-            )
-            
-            content = response.choices[0].message.content
-            result = json.loads(content)
-            
-            suggestions_data = result.get("suggestions", [])
-            suggestions = []
-            
-            for sug in suggestions_data[:7]:  # Limit to 7 suggestions
-                try:
-                    suggestion = EssaySuggestion(
-                        type=sug.get("type", "content"),
-                        priority=sug.get("priority", "medium"),
-                        location=sug.get("location"),
-                        current_text=sug.get("current_text"),
-                        suggested_text=sug.get("suggested_text"),
-                        explanation=sug.get("explanation", "No explanation provided")
-                    )
-                    suggestions.append(suggestion)
-                except Exception as e:
-                    print(f"Error parsing suggestion: {e}")
-                    continue
-            
-            return suggestions
+            request = self._suggestions_request(essay_text, analysis, prompt)
+            content = chat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_suggestions(content)
         except Exception as e:
             print(f"Error generating suggestions: {e}")
             # Return a default suggestion
-            return [
-                EssaySuggestion(
-                    type="content",
-                    priority="medium",
-                    explanation="Review the essay for clarity and impact. Consider adding specific examples and details."
-                )
-            ]
+            return self._default_suggestions()
+
+    
+    def _single_shot_request(
+        self,
+        essay_text: str,
+        prompt: Optional[str],
+        target_word_count: Optional[int]
+    ) -> dict:
+        """Completion arguments for the one-call analysis (essay sent once)"""
+        prompt_text = f"""Analyze this college application essay and return scores, feedback and suggestions.
+
+Essay:
+{essay_text}
+
+{f'Prompt: {prompt}' if prompt else 'No prompt provided - set prompt_alignment_score to 7.'}
+{f'Target word count: {target_word_count}' if target_word_count else ''}
+
+Provide:
+- overall_score, content_score, tone_score: numbers between 0-10
+- prompt_alignment_score: 0-10, how directly the essay addresses the prompt, stays on topic and meets its requirements
+- strengths: 3-5 key strengths
+- weaknesses: 3-5 key weaknesses
+- suggestions: 5-7 specific, actionable suggestions; quote exact text in current_text when applicable,
+  give an improved version in suggested_text, and explain why the change helps in 2-3 sentences"""
+        return dict(
+            namespace="essay.single_shot",
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an expert college admissions essay reviewer and editor. Provide detailed, constructive feedback that matches the JSON schema."
+                },
+                {"role": "user", "content": prompt_text}
+            ],
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "essay_analysis", "strict": True, "schema": SINGLE_SHOT_SCHEMA}
+            },
+            temperature=0.3
+        )
+    
+    def _parse_single_shot(self, content: str, prompt: Optional[str]) -> tuple[dict, float, list[EssaySuggestion]]:
+        analysis = self._parse_analysis(content)
+        alignment_score = 7.0
+        if prompt:
+            alignment_score = max(0.0, min(10.0, float(json.loads(content).get("prompt_alignment_score", 7.0))))
+        return analysis, alignment_score, self._parse_suggestions(content)
+    
+    def _get_single_shot_analysis(
+        self,
+        essay_text: str,
+        prompt: Optional[str],
+        target_word_count: Optional[int]
+    ) -> tuple[dict, float, list[EssaySuggestion]]:
+        """Scores, alignment and suggestions from a single schema-constrained completion"""
+        try:
+            request = self._single_shot_request(essay_text, prompt, target_word_count)
+            content = chat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_single_shot(content, prompt)
+        except Exception as e:
+            print(f"Error in single-shot analysis: {e}")
+            return self._default_analysis(), 7.0, self._default_suggestions()
+
+
+class AsyncEssayAnalyzer(EssayAnalyzer):
+    """EssayAnalyzer on AsyncOpenAI that overlaps the three LLM round trips.
 
+    Prompt alignment runs concurrently with the main analysis, and suggestions
+    start as soon as the analysis JSON arrives, so wall-clock latency is roughly
+    max(analysis, alignment) + suggestions instead of their sum.
+    """
+    
+    def __init__(self, openai_client=None):
+        self.client = openai_client or async_client
+        if not self.client:
+            raise ValueError("LLM client not initialized. Please set OPENAI_API_KEY (or LLM_BACKEND=local).")
+    
+    async def analyze_essay(
+        self,
+        essay_text: str,
+        essay_id: Optional[str] = None,
+        prompt: Optional[str] = None,
+        target_word_count: Optional[int] = None,
+        mode: EssayAnalysisMode = "multi_call"
+    ) -> EssayAnalysis:
+        """Comprehensive essay analysis with overlapped LLM calls"""
+        # textstat is CPU-bound; keep it off the event loop
+        readability_task = asyncio.create_task(asyncio.to_thread(textstat.flesch_reading_ease, essay_text))
+        alignment_task = None
+        try:
+            if mode == "single_shot":
+                analysis, alignment_score, suggestions = await self._get_single_shot_analysis(essay_text, prompt, target_word_count)
+            else:
+                alignment_task = asyncio.create_task(self._check_prompt_alignment(essay_text, prompt)) if prompt else None
+                analysis = await self._get_ai_analysis(essay_text, prompt, target_word_count)
+                suggestions = await self._generate_suggestions(essay_text, analysis, prompt)
+                alignment_score = await alignment_task if alignment_task else 7.0
+            readability = await readability_task
+        finally:
+            # Cancelled (e.g. the client went away): don't leave the alignment call holding a limiter slot
+            for task in (readability_task, alignment_task):
+                if task is not None and not task.done():
+                    task.cancel()
+        
+        return self._build_analysis(
+            essay_text, essay_id, target_word_count, readability, analysis, alignment_score, suggestions
+        )
+    
+    async def _get_ai_analysis(
+        self,
+        essay_text: str,
+        prompt: Optional[str],
+        target_word_count: Optional[int]
+    ) -> dict:
+        try:
+            request = self._analysis_request(essay_text, prompt, target_word_count)
+            content = await achat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_analysis(content)
+        except Exception as e:
+            print(f"Error in AI analysis: {e}")
+            return self._default_analysis()
+    
+    async def _check_prompt_alignment(self, essay_text: str, prompt: str) -> float:
+        try:
+            request = self._alignment_request(essay_text, prompt)
+            content = await achat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_alignment(content)
+        except Exception as e:
+            print(f"Error in prompt alignment check: {e}")
+            return 7.0
+    
+    async def _generate_suggestions(
+        self,
+        essay_text: str,
+        analysis: dict,
+        prompt: Optional[str]
+    ) -> list[EssaySuggestion]:
+        try:
+            request = self._suggestions_request(essay_text, analysis, prompt)
+            content = await achat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_suggestions(content)
+        except Exception as e:
+            print(f"Error generating suggestions: {e}")
+            return self._default_suggestions()
+    
+    async def _get_single_shot_analysis(
+        self,
+        essay_text: str,
+        prompt: Optional[str],
+        target_word_count: Optional[int]
+    ) -> tuple[dict, float, list[EssaySuggestion]]:
+        try:
+            request = self._single_shot_request(essay_text, prompt, target_word_count)
+            content = await achat_completion(self.client, request.pop("namespace"), **request)
+            return self._parse_single_shot(content, prompt)
+        except Exception as e:
+            print(f"Error in single-shot analysis: {e}")
+            return self._default_analysis(), 7.0, self._default_suggestions()
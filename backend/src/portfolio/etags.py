@@ -0,0 +1,69 @@
+"""
+Entity Tags
+Per-student version counters and the ETags derived from them, for
+conditional GETs (If-None-Match -> 304) on profile resources and
+preconditions (If-None-Match -> 412) on the analysis POST.
+
+Every mutation of a student's profile or activities bumps the student's
+version. An ETag is a function of the version alone, so a matching
+If-None-Match is answered without reading or serializing the resource.
+Tags also carry a per-process epoch: storage is in memory, and a tag
+issued before a restart must not match a version reached again after it.
+"""
+
+from __future__ import annotations
+from typing import Dict, Optional
+import hashlib
+import secrets
+import threading
+
+_EPOCH = secrets.token_hex(4)
+
+
+class ResourceVersions:
+    """Thread-safe student_id -> version counters; a student nobody has written to has no version"""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, student_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(student_id, 0) + 1
+            self._versions[student_id] = version
+            return version
+
+    def get(self, student_id: str) -> Optional[int]:
+        with self._lock:
+            return self._versions.get(student_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+def strong_etag(resource: str, version: int) -> str:
+    return f'"{resource}.{_EPOCH}.{version}"'
+
+
+def weak_etag(*parts) -> str:
+    """Weak tag over arbitrary inputs, for representations that are equivalent but not byte-identical"""
+    digest = hashlib.sha256(repr((_EPOCH,) + parts).encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def not_modified(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, as RFC 9110 requires)"""
+    if not header:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+profile_versions = ResourceVersions()
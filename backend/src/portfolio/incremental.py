@@ -0,0 +1,226 @@
+"""
+Incremental Portfolio Scoring
+Per-student scoring state maintained across activity CRUD.
+
+Raw impacts are computed once per activity. Min and max raw impact live
+in lazy-deletion heaps, so inserts and deletes cost O(log n) amortized.
+Lens and theme totals are kept as raw sums plus item counts; since
+min-max normalization is affine, the normalized sum of a group is
+10 * (raw_sum - count * min) / (max - min). A mutation that leaves min and
+max unchanged only rescales the touched lens and theme; every group is
+rescaled only when min or max actually moves. The scores view is rebuilt
+on mutation and served as-is afterwards.
+
+Activities are kept as compact ActivityRecords (see records.py).
+
+Scores agree with a full rescoring up to float rounding (the sums are
+accumulated in mutation order rather than portfolio order). Ongoing
+activities are scored as of the day they were inserted; the state
+rescores itself when read on a later day.
+"""
+
+from __future__ import annotations
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Union
+import heapq
+import threading
+from .constants import LENS_LIST, SPIKE_MIN_SHARE
+from .models import Evidence
+from .records import ActivityRecord, as_record
+from .service import compute_impact, coverage_index
+
+
+class _Bound:
+    """Lazy-deletion heap over (raw impact, activity id); `sign` -1 makes it a max-heap"""
+
+    def __init__(self, sign: int):
+        self.sign = sign
+        self.heap: List[Tuple[float, int, str]] = []
+
+    def push(self, raw: float, seq: int, activity_id: str):
+        heapq.heappush(self.heap, (self.sign * raw, seq, activity_id))
+
+    def peek(self, live: Dict[str, Tuple[float, int]]) -> Optional[float]:
+        # Entries whose (id, seq) no longer matches a live activity are stale
+        while self.heap:
+            key, seq, activity_id = self.heap[0]
+            current = live.get(activity_id)
+            if current is not None and current[1] == seq:
+                return self.sign * key
+            heapq.heappop(self.heap)
+        return None
+
+    def compact(self, live: Dict[str, Tuple[float, int]]):
+        self.heap = [(self.sign * raw, seq, activity_id) for activity_id, (raw, seq) in live.items()]
+        heapq.heapify(self.heap)
+
+
+class _Group:
+    """Raw impact sum and item count of a lens or theme, with its normalized sum cached"""
+    __slots__ = ("raw_sum", "count", "norm_sum")
+
+    def __init__(self):
+        self.raw_sum = 0.0
+        self.count = 0
+        self.norm_sum = 0.0
+
+    def rescale(self, mn: float, span: Optional[float]):
+        if self.count == 0:
+            self.norm_sum = 0.0
+        elif span is None:
+            self.norm_sum = 5.0 * self.count
+        else:
+            self.norm_sum = 10.0 * (self.raw_sum - self.count * mn) / span
+
+
+class IncrementalPortfolioScores:
+    """Scoring state of one student's portfolio, updated per activity"""
+
+    def __init__(self, intended_major: Optional[str] = None):
+        self.intended_major = intended_major
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._seq = 0
+        self._live: Dict[str, Tuple[float, int]] = {}   # id -> (raw impact, seq)
+        self._activities: Dict[str, ActivityRecord] = {}
+        self._min = _Bound(1)
+        self._max = _Bound(-1)
+        self._lenses: Dict[str, _Group] = {lens: _Group() for lens in LENS_LIST}
+        self._themes: Dict[str, _Group] = {}  # first-insert order, like detect_spike's dict
+        self._bounds: Tuple[Optional[float], Optional[float]] = (None, None)
+        self._scored_on = date.today()
+        self._view = self._build_view()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def upsert(self, activity: Union[Evidence, ActivityRecord]):
+        """Add an activity, replacing any activity with the same id"""
+        activity = as_record(activity)
+        with self._lock:
+            self._remove(activity.id)
+            self._insert(activity)
+            self._refresh({activity.lens}, self._theme_of(activity))
+
+    def remove(self, activity_id: str) -> bool:
+        with self._lock:
+            removed = self._remove(activity_id)
+            if removed is None:
+                return False
+            self._refresh({removed.lens}, self._theme_of(removed))
+            return True
+
+    def replace(self, activity_id: str, activity: Union[Evidence, ActivityRecord]):
+        """Swap the activity stored under `activity_id` for `activity` (whose id may differ)"""
+        activity = as_record(activity)
+        with self._lock:
+            removed = self._remove(activity_id)
+            self._remove(activity.id)
+            self._insert(activity)
+            lenses, themes = {activity.lens}, self._theme_of(activity)
+            if removed is not None:
+                lenses.add(removed.lens)
+                themes |= self._theme_of(removed)
+            self._refresh(lenses, themes)
+
+    def set_intended_major(self, intended_major: Optional[str]):
+        with self._lock:
+            if intended_major != self.intended_major:
+                self.intended_major = intended_major
+                self._rebuild()
+
+    def scores(self) -> dict:
+        """Current impact total, lens scores, coverage and spike"""
+        with self._lock:
+            if self._scored_on != date.today():
+                self._rebuild()
+            return self._view
+
+    @staticmethod
+    def _theme_of(activity: ActivityRecord) -> set:
+        return {activity.theme_tags[0].lower()} if activity.theme_tags else set()
+
+    def _insert(self, activity: ActivityRecord):
+        raw = compute_impact(activity, self.intended_major)
+        self._seq += 1
+        self._live[activity.id] = (raw, self._seq)
+        self._activities[activity.id] = activity
+        self._min.push(raw, self._seq, activity.id)
+        self._max.push(raw, self._seq, activity.id)
+        self._add_to_groups(activity, raw, 1)
+
+    def _remove(self, activity_id: str) -> Optional[ActivityRecord]:
+        entry = self._live.pop(activity_id, None)
+        if entry is None:
+            return None
+        activity = self._activities.pop(activity_id)
+        self._add_to_groups(activity, entry[0], -1)
+        if len(self._min.heap) > 2 * len(self._live) + 16:
+            self._min.compact(self._live)
+            self._max.compact(self._live)
+        return activity
+
+    def _add_to_groups(self, activity: ActivityRecord, raw: float, sign: int):
+        groups = [self._lenses[activity.lens]]
+        for theme in self._theme_of(activity):
+            groups.append(self._themes.setdefault(theme, _Group()))
+        for group in groups:
+            group.raw_sum += sign * raw
+            group.count += sign
+            if group.count == 0:
+                group.raw_sum = 0.0  # drop accumulated rounding
+        for theme in self._theme_of(activity):
+            if self._themes[theme].count == 0:
+                del self._themes[theme]
+
+    def _span(self) -> Tuple[float, Optional[float]]:
+        mn, mx = self._bounds
+        if mn is None or abs(mx - mn) < 1e-9:
+            return mn or 0.0, None
+        return mn, mx - mn
+
+    def _refresh(self, lenses: set, themes: set):
+        bounds = (self._min.peek(self._live), self._max.peek(self._live))
+        if bounds != self._bounds:
+            # Min or max moved: every normalized group sum changes
+            self._bounds = bounds
+            lenses, themes = set(self._lenses), set(self._themes)
+        mn, span = self._span()
+        for lens in lenses:
+            self._lenses[lens].rescale(mn, span)
+        for theme in themes:
+            if theme in self._themes:
+                self._themes[theme].rescale(mn, span)
+        self._view = self._build_view()
+
+    def _rebuild(self):
+        activities = list(self._activities.values())
+        self._reset()
+        for activity in activities:
+            self._insert(activity)
+        self._refresh(set(), set())
+
+    def _build_view(self) -> dict:
+        sums = {lens: group.norm_sum for lens, group in self._lenses.items()}
+        max_sum = max(sums.values())
+        if max_sum <= 0:
+            max_sum = 1.0
+        lens_s = {lens: (v / max_sum) * 10.0 for lens, v in sums.items()}
+        coverage = coverage_index(lens_s) if sum(lens_s.values()) > 0 else 0.0
+
+        spike_theme, spike_share = None, 0.0
+        total = sum(group.norm_sum for group in self._themes.values())
+        if total > 0:
+            theme, top = max(((t, g.norm_sum) for t, g in self._themes.items()), key=lambda kv: kv[1])
+            spike_share = top / total
+            spike_theme = theme if spike_share >= SPIKE_MIN_SHARE else None
+
+        return {
+            "impact_total": round(sum(sums.values()), 2),
+            "lens_scores": {k: round(v, 2) for k, v in lens_s.items()},
+            "coverage": round(coverage, 3),
+            "spike": ({"theme": spike_theme, "share": round(spike_share, 3)} if spike_theme else None),
+            "activities": len(self._live)
+        }
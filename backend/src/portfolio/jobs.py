@@ -0,0 +1,460 @@
+"""
+Background Jobs
+Durable queue for analyses that outlive a proxy's request timeout.
+
+A request submitted in job mode is stored in SQLite and answered with 202
+and a job id. A pool of worker threads claims jobs, highest priority first,
+runs the handler registered for the job's kind and stores its JSON result.
+- A claim takes a lease, which the worker renews while the handler runs.
+  A job whose worker died (or whose process was restarted) is claimed
+  again once the lease expires. Every claim bumps the job's attempt count,
+  and a worker's writes only apply while that count is still its own, so
+  a worker that lost its lease cannot overwrite a newer attempt.
+- A failed attempt is retried with exponential backoff per the kind's
+  RetryPolicy. Errors a retry cannot fix (invalid input, unknown school
+  set) fail the job at once, with the status the synchronous route would
+  have answered with.
+- Waiters in this process (long-poll, SSE) are woken when a job changes.
+  Changes made by other processes sharing the file are seen by polling
+  every JOB_POLL_SECONDS.
+"""
+
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from .school_sets import UnknownSchoolSet
+from .scoring_context import UnknownScoringContext
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'jobs.sqlite3')
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+
+TERMINAL = ("succeeded", "failed")
+_COLUMNS = ("id", "kind", "payload", "priority", "status", "attempts", "max_attempts", "run_after", "lease_until",
+            "created_at", "started_at", "finished_at", "run_seconds", "result", "error", "error_status")
+
+
+class UnknownJob(LookupError):
+    """No job has been stored under this id, or it was purged"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = JOB_MAX_ATTEMPTS
+    base_delay: float = JOB_RETRY_BASE_SECONDS
+    max_delay: float = 300.0
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before attempt `attempt + 1`"""
+        return min(self.max_delay, self.base_delay * 2 ** max(0, attempt - 1))
+
+
+def error_status(e: Exception) -> Optional[int]:
+    """
+    Status for errors a retry cannot fix, None for anything else: the statuses
+    the synchronous routes answer with. A KeyError or IndexError from a bug in
+    a handler is retried and ends as a 500, as it would on those routes.
+    """
+    if isinstance(e, (UnknownSchoolSet, UnknownScoringContext, UnknownJob)):
+        return 404
+    if isinstance(e, ValueError):  # pydantic's ValidationError included
+        return 422
+    return None
+
+
+class SQLiteJobStore:
+    """Jobs table; claims are serialized with BEGIN IMMEDIATE so a job goes to one worker"""
+
+    def __init__(self, path: str):
+        self.path = path if path == ":memory:" else os.path.abspath(path)
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, "
+            "run_after REAL NOT NULL, lease_until REAL, created_at REAL NOT NULL, started_at REAL, "
+            "finished_at REAL, run_seconds REAL NOT NULL DEFAULT 0, result TEXT, error TEXT, error_status INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at)")
+
+    def _row(self, row: Optional[tuple]) -> Optional[dict]:
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def enqueue(self, kind: str, payload: str, priority: int, max_attempts: int, now: float) -> dict:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, max_attempts, run_after, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, payload, priority, max_attempts, now, now)
+            )
+            return self._get_locked(job_id)
+
+    def claim(self, now: float, lease_seconds: float) -> Optional[dict]:
+        """Take the most urgent ready job: queued and due, or running with an expired lease"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) ORDER BY priority DESC, created_at LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                        "started_at = COALESCE(started_at, ?), lease_until = ? WHERE id = ?",
+                        (now, now + lease_seconds, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._get_locked(row[0]) if row else None
+
+    # renew/retry/finish apply only to the claim that made `attempt`; False means the lease was lost
+
+    def renew(self, job_id: str, attempt: int, lease_until: float) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (lease_until, job_id, attempt)
+            ).rowcount == 1
+
+    def retry(self, job_id: str, attempt: int, run_after: float, error: str, run_seconds: float) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, run_after = ?, error = ?, "
+                "run_seconds = run_seconds + ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (run_after, error, run_seconds, job_id, attempt)
+            ).rowcount == 1
+
+    def finish(self, job_id: str, attempt: int, status: str, result: Optional[str], error: Optional[str],
+               error_status: Optional[int], run_seconds: float, now: float) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL, finished_at = ?, result = ?, error = ?, "
+                "error_status = ?, run_seconds = run_seconds + ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (status, now, result, error, error_status, run_seconds, job_id, attempt)
+            ).rowcount == 1
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._get_locked(job_id)
+
+    def _get_locked(self, job_id: str) -> Optional[dict]:
+        return self._row(self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (finished_before,)
+            ).rowcount
+
+
+def job_view(job: dict) -> dict:
+    """Public form of a stored job, with timings and the result decoded"""
+    created, started, finished = job["created_at"], job["started_at"], job["finished_at"]
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "created_at": created,
+        "started_at": started,
+        "finished_at": finished,
+        "next_attempt_at": job["run_after"] if job["status"] == "queued" and job["attempts"] else None,
+        "timings": {
+            "queued_ms": int((started - created) * 1000) if started is not None else None,
+            "run_ms": int(job["run_seconds"] * 1000),
+            "total_ms": int((finished - created) * 1000) if finished is not None else None
+        },
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"],
+        "error_status": job["error_status"]
+    }
+
+
+def _percentile(values: List[float], q: float) -> Optional[int]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return int(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000)
+
+
+class JobQueue:
+    """Worker-thread pool over a SQLiteJobStore, with in-process change notifications"""
+
+    def __init__(self, store: SQLiteJobStore, workers: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS,
+                 lease_seconds: float = JOB_LEASE_SECONDS, retention_seconds: float = JOB_RETENTION_SECONDS):
+        self.store = store
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self._handlers: Dict[str, Tuple[Callable[[str], str], RetryPolicy]] = {}
+        self._threads: List[threading.Thread] = []
+        self._work = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._counters = {"submitted": 0, "succeeded": 0, "failed": 0, "retried": 0, "lease_lost": 0}
+        self._timings: Dict[str, Dict[str, Deque[float]]] = {}
+        self._purged_at = 0.0
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(SQLiteJobStore(os.getenv("JOB_QUEUE_PATH", DEFAULT_DB_PATH)))
+
+    def register(self, kind: str, handler: Callable[[str], str], retry: Optional[RetryPolicy] = None) -> None:
+        """Run `handler(payload_json) -> result_json` for jobs of `kind`"""
+        self._handlers[kind] = (handler, retry or RetryPolicy())
+
+    # Lifecycle
+
+    def start(self) -> None:
+        """Start the workers; jobs left queued or running by an earlier process are picked up"""
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._work.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    # Submission and lookup
+
+    def submit(self, kind: str, payload: str, priority: int = 0, max_attempts: Optional[int] = None) -> dict:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        policy = self._handlers[kind][1]
+        job = self.store.enqueue(kind, payload, priority, max_attempts or policy.max_attempts, time.time())
+        with self._lock:
+            self._counters["submitted"] += 1
+        self.start()
+        self._work.set()
+        return job_view(job)
+
+    def get(self, job_id: str) -> dict:
+        job = self.store.get(job_id)
+        if job is None:
+            raise UnknownJob(f"Unknown job: {job_id}")
+        return job_view(job)
+
+    async def aget(self, job_id: str) -> dict:
+        """get() on a worker thread: the store lock can be held behind a worker's BEGIN IMMEDIATE"""
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> dict:
+        """The job once it has finished, or as it stands after `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        with self._subscription(job_id) as changed:
+            while True:
+                changed.clear()
+                job = await self.aget(job_id)
+                remaining = deadline - time.monotonic()
+                if job["status"] in TERMINAL or remaining <= 0:
+                    return job
+                await _wait_event(changed, min(remaining, self.poll_seconds))
+
+    async def watch(self, job_id: str, heartbeat_seconds: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """
+        The job each time its status or attempt count changes, ending with its final state.
+        None is yielded after `heartbeat_seconds` without a change, for keep-alives.
+        """
+        last, last_sent = None, time.monotonic()
+        with self._subscription(job_id) as changed:
+            while True:
+                changed.clear()
+                job = await self.aget(job_id)
+                if (job["status"], job["attempts"]) != last:
+                    last, last_sent = (job["status"], job["attempts"]), time.monotonic()
+                    yield job
+                    if job["status"] in TERMINAL:
+                        return
+                elif time.monotonic() - last_sent >= heartbeat_seconds:
+                    last_sent = time.monotonic()
+                    yield None
+                await _wait_event(changed, self.poll_seconds)
+
+    # Notifications
+
+    def _subscription(self, job_id: str) -> "_Subscription":
+        return _Subscription(self, job_id)
+
+    def _notify(self, job_id: str) -> None:
+        with self._lock:
+            waiters = list(self._waiters.get(job_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # the waiter's loop has closed
+
+    # Workers
+
+    def _worker(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(time.time(), self.lease_seconds)
+            except sqlite3.Error as e:
+                print(f"Job queue claim failed: {e}")
+                job = None
+            if job is None:
+                self._maybe_purge()
+                self._work.wait(self.poll_seconds)
+                self._work.clear()
+                continue
+            self._notify(job["id"])
+            try:
+                self._run(job)
+            except Exception as e:
+                # A store write failed (locked or full database). Keep the worker; if the result
+                # was not written, the lease runs out and the job is claimed again
+                print(f"Job {job['id']} write failed: {e}")
+            self._notify(job["id"])
+
+    def _run(self, job: dict) -> None:
+        handler, policy = self._handlers.get(job["kind"], (None, RetryPolicy()))
+        job_id, attempt = job["id"], job["attempts"]
+        started = time.monotonic()
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, attempt, done),
+                                     name=f"job-lease-{job_id[:8]}", daemon=True)
+        heartbeat.start()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+            if attempt > job["max_attempts"]:
+                raise TimeoutError("Job lease expired on its last attempt")
+            result = handler(job["payload"])
+        except Exception as e:
+            elapsed = time.monotonic() - started
+            status = error_status(e)
+            if status is None and attempt < job["max_attempts"]:
+                retried = self.store.retry(job_id, attempt, time.time() + policy.delay(attempt), str(e), elapsed)
+                self._count("retried" if retried else "lease_lost")
+                return
+            written = self.store.finish(job_id, attempt, "failed", None, str(e), status or 500, elapsed, time.time())
+            outcome = "failed"
+        else:
+            written = self.store.finish(job_id, attempt, "succeeded", result, None, None,
+                                        time.monotonic() - started, time.time())
+            outcome = "succeeded"
+        finally:
+            done.set()
+        if not written:
+            # Another worker claimed the job after this one's lease ran out; its attempt owns the row
+            self._count("lease_lost")
+            return
+        self._count(outcome)
+        self._record_timings(job_id)
+
+    def _heartbeat(self, job_id: str, attempt: int, done: threading.Event) -> None:
+        """Renew the lease of a running attempt until it finishes or the lease is lost"""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                if not self.store.renew(job_id, attempt, time.time() + self.lease_seconds):
+                    return
+            except sqlite3.Error as e:
+                print(f"Job lease renewal failed: {e}")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _record_timings(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        timings = job_view(job)["timings"]
+        with self._lock:
+            samples = self._timings.setdefault(job["kind"], {k: deque(maxlen=1024) for k in ("queued", "run", "total")})
+            for name in ("queued", "run", "total"):
+                if timings[f"{name}_ms"] is not None:
+                    samples[name].append(timings[f"{name}_ms"] / 1000)
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        if now - self._purged_at < 600:
+            return
+        self._purged_at = now
+        try:
+            self.store.purge(now - self.retention_seconds)
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {
+                kind: {f"{name}_ms": {"p50": _percentile(list(values), 0.5), "p95": _percentile(list(values), 0.95),
+                                      "max": _percentile(list(values), 1.0)}
+                       for name, values in samples.items()}
+                for kind, samples in self._timings.items()
+            }
+            workers = sum(t.is_alive() for t in self._threads)
+        return {"workers": workers, "jobs": self.store.counts(), **counters, "timings": timings}
+
+
+class _Subscription:
+    """Registers an asyncio.Event of the running loop to be set when a job changes"""
+
+    def __init__(self, queue: JobQueue, job_id: str):
+        self.queue, self.job_id = queue, job_id
+        self.entry = (asyncio.get_running_loop(), asyncio.Event())
+
+    def __enter__(self) -> asyncio.Event:
+        with self.queue._lock:
+            self.queue._waiters.setdefault(self.job_id, []).append(self.entry)
+        return self.entry[1]
+
+    def __exit__(self, *exc) -> None:
+        with self.queue._lock:
+            waiters = self.queue._waiters.get(self.job_id, [])
+            if self.entry in waiters:
+                waiters.remove(self.entry)
+            if not waiters:
+                self.queue._waiters.pop(self.job_id, None)
+
+
+async def _wait_event(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+job_queue = JobQueue.from_env()
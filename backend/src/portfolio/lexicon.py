@@ -0,0 +1,35 @@
+"""
+Theme Lexicon Corpus
+THEME_LEXICON precomputed once into the text _major_match searches.
+
+A tag counts as a lexicon mention when it is a substring of some theme's
+terms joined with spaces. Those joins used to be rebuilt for every tag of
+every activity; here they are built once at import, themes separated by a
+newline so a match cannot span two themes, and answers are memoized per
+tag since tags repeat across requests.
+"""
+
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, Iterable
+from .constants import THEME_LEXICON
+
+
+class LexiconCorpus:
+    """Each theme's space-joined terms, searchable with one substring test"""
+
+    def __init__(self, lexicon: Dict[str, Iterable[str]]):
+        lexicon = {theme: tuple(terms) for theme, terms in lexicon.items()}
+        self.terms = sum(len(terms) for terms in lexicon.values())
+        self._joined = tuple(" ".join(terms) for terms in lexicon.values())
+        self._corpus = "\n".join(self._joined)
+        self.mentions = lru_cache(maxsize=8192)(self._mentions)
+
+    def _mentions(self, fragment: str) -> bool:
+        """Whether `fragment` is a substring of some theme's space-joined terms"""
+        if "\n" in fragment:
+            return any(fragment in joined for joined in self._joined)
+        return fragment in self._corpus
+
+
+THEME_CORPUS = LexiconCorpus(THEME_LEXICON)
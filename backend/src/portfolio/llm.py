@@ -0,0 +1,271 @@
+"""
+LLM Call Helpers
+Shared LLM clients and the single entry point for chat completions used by
+the portfolio and essay services. Every call goes through the response cache
+(unless it asks for a fresh sample with cache=False), the shared circuit
+breaker and the process-wide concurrency governor, and is bounded by the
+request deadline when one is in scope.
+"""
+
+from __future__ import annotations
+from typing import Any, Iterator, Optional
+import asyncio
+import json
+import os
+import random
+import time
+from dotenv import load_dotenv
+from .circuit_breaker import llm_breaker, is_breaker_failure
+from .deadline import Deadline, current_deadline
+from .llm_backends import create_llm_client
+from .llm_cache import make_cache_key, response_cache
+from .llm_limiter import llm_limiter, retry_after_seconds, is_rate_limit_error
+
+# Load .env file - try multiple locations
+env_paths = [
+    os.path.join(os.path.dirname(__file__), '..', '..', '..', '.env'),  # Project root
+    os.path.join(os.path.dirname(__file__), '..', '..', '.env'),  # Backend root
+    os.path.join(os.getcwd(), '.env'),  # Current working directory
+    '.env'  # Relative path
+]
+for env_path in env_paths:
+    abs_path = os.path.abspath(env_path)
+    if os.path.exists(abs_path):
+        load_dotenv(dotenv_path=abs_path)
+        break
+else:
+    # Fallback: try to find .env file
+    load_dotenv()
+
+# Backend is chosen by LLM_BACKEND (openai | local); None when OpenAI has no API key.
+# SDK retries are disabled: the governor owns backoff so 429s feed its adaptive limit
+client = create_llm_client(max_retries=0)
+async_client = create_llm_client(use_async=True, max_retries=0)
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+COMPLETION_TOKEN_RESERVE = int(os.getenv("LLM_COMPLETION_TOKEN_RESERVE", "800"))
+
+
+def chat_completion(
+    client: Any,
+    namespace: str,
+    *,
+    model: str,
+    messages: list[dict],
+    temperature: Optional[float] = None,
+    response_format: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    cache: bool = True
+) -> str:
+    """Return the message content for a completion, served from the response cache unless cache=False"""
+    key = make_cache_key(namespace, model, messages, temperature, response_format)
+    cached = response_cache.get(key) if cache else None
+    if cached is not None:
+        return cached
+
+    deadline = deadline or current_deadline()
+    kwargs = _request_kwargs(model, messages, temperature, response_format)
+    estimate = estimate_tokens(messages)
+    for attempt in range(MAX_RETRIES + 1):
+        if deadline:
+            deadline.check()
+            kwargs["timeout"] = deadline.remaining()
+        llm_breaker.before_call()
+        try:
+            llm_limiter.acquire(estimate, max_wait=deadline.remaining() if deadline else None)
+        except Exception:
+            llm_breaker.record_ignored()
+            raise
+        actual = None
+        try:
+            response = client.chat.completions.create(**kwargs)
+            actual = _total_tokens(response)
+        except Exception as e:
+            backoff = _on_error(e, attempt, deadline)
+            if backoff is None:
+                raise
+            time.sleep(backoff)
+            continue
+        finally:
+            llm_limiter.release(estimate, actual)
+        llm_limiter.on_success()
+        llm_breaker.record_success()
+        break
+    content = response.choices[0].message.content
+
+    if cache and _is_cacheable(content, response_format):
+        response_cache.set(key, content)
+    return content
+
+
+async def achat_completion(
+    client: Any,
+    namespace: str,
+    *,
+    model: str,
+    messages: list[dict],
+    temperature: Optional[float] = None,
+    response_format: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    cache: bool = True
+) -> str:
+    """Async counterpart of chat_completion for AsyncOpenAI clients"""
+    key = make_cache_key(namespace, model, messages, temperature, response_format)
+    cached = response_cache.get(key) if cache else None
+    if cached is not None:
+        return cached
+
+    deadline = deadline or current_deadline()
+    kwargs = _request_kwargs(model, messages, temperature, response_format)
+    estimate = estimate_tokens(messages)
+    for attempt in range(MAX_RETRIES + 1):
+        if deadline:
+            deadline.check()
+            kwargs["timeout"] = deadline.remaining()
+        llm_breaker.before_call()
+        try:
+            await llm_limiter.aacquire(estimate, max_wait=deadline.remaining() if deadline else None)
+        except Exception:
+            llm_breaker.record_ignored()
+            raise
+        actual = None
+        try:
+            response = await client.chat.completions.create(**kwargs)
+            actual = _total_tokens(response)
+        except Exception as e:
+            backoff = _on_error(e, attempt, deadline)
+            if backoff is None:
+                raise
+            await asyncio.sleep(backoff)
+            continue
+        finally:
+            llm_limiter.release(estimate, actual)
+        llm_limiter.on_success()
+        llm_breaker.record_success()
+        break
+    content = response.choices[0].message.content
+
+    if cache and _is_cacheable(content, response_format):
+        response_cache.set(key, content)
+    return content
+
+
+def stream_chat_completion(
+    client: Any,
+    namespace: str,
+    *,
+    model: str,
+    messages: list[dict],
+    temperature: Optional[float] = None,
+    response_format: Optional[dict] = None,
+    deadline: Optional[Deadline] = None,
+    cache: bool = True
+) -> Iterator[str]:
+    """Yield content deltas of a streamed completion; a cached response is replayed as one chunk"""
+    key = make_cache_key(namespace, model, messages, temperature, response_format)
+    cached = response_cache.get(key) if cache else None
+    if cached is not None:
+        yield cached
+        return
+
+    deadline = deadline or current_deadline()
+    kwargs = _request_kwargs(model, messages, temperature, response_format)
+    kwargs.update(stream=True, stream_options={"include_usage": True})
+    estimate = estimate_tokens(messages)
+    if deadline:
+        deadline.check()
+        kwargs["timeout"] = deadline.remaining()
+    llm_breaker.before_call()
+    try:
+        llm_limiter.acquire(estimate, max_wait=deadline.remaining() if deadline else None)
+    except Exception:
+        llm_breaker.record_ignored()
+        raise
+    # Streams are not retried: content may already have been handed to the caller
+    parts: list[str] = []
+    actual = None
+    try:
+        for chunk in client.chat.completions.create(**kwargs):
+            actual = _total_tokens(chunk) or actual
+            for choice in chunk.choices:
+                delta = choice.delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    except GeneratorExit:
+        llm_breaker.record_ignored()
+        raise
+    except Exception as e:
+        _on_error(e, MAX_RETRIES, deadline)
+        raise
+    finally:
+        llm_limiter.release(estimate, actual)
+    llm_limiter.on_success()
+    llm_breaker.record_success()
+
+    content = "".join(parts)
+    if cache and _is_cacheable(content, response_format):
+        response_cache.set(key, content)
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    """Rough prompt size (~4 chars per token) plus a reserve for the completion"""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + COMPLETION_TOKEN_RESERVE
+
+
+def _on_error(error: Exception, attempt: int, deadline: Optional[Deadline] = None) -> Optional[float]:
+    """Feed failures to the breaker and 429s to the governor; return a backoff if the call should be retried"""
+    if is_breaker_failure(error) and not _caused_by_deadline(error, deadline):
+        llm_breaker.record_failure(error)
+    else:
+        llm_breaker.record_ignored()
+    if not is_rate_limit_error(error):
+        return None
+    retry_after = retry_after_seconds(error)
+    llm_limiter.on_rate_limited(retry_after)
+    if attempt >= MAX_RETRIES:
+        return None
+    # The governor already pauses for retry-after; jittered exponential backoff otherwise
+    backoff = 0.0 if retry_after else min(8.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+    if deadline and max(backoff, retry_after or 0.0) >= deadline.remaining():
+        return None
+    return backoff
+
+
+def _caused_by_deadline(error: Exception, deadline: Optional[Deadline]) -> bool:
+    """A timeout that fired because the HTTP timeout was capped by the caller's own deadline"""
+    if deadline is None or not deadline.expired:
+        return False
+    return isinstance(error, TimeoutError) or type(error).__name__ == "APITimeoutError"
+
+
+def _total_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def _request_kwargs(
+    model: str,
+    messages: list[dict],
+    temperature: Optional[float],
+    response_format: Optional[dict]
+) -> dict[str, Any]:
+    kwargs: dict[str, Any] = {"model": model, "messages": messages}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    return kwargs
+
+
+def _is_cacheable(content: Optional[str], response_format: Optional[dict]) -> bool:
+    """Only cache non-empty content, and only valid JSON when JSON output was requested"""
+    if not content:
+        return False
+    if response_format and response_format.get("type") in ("json_object", "json_schema"):
+        try:
+            json.loads(content)
+        except ValueError:
+            return False
+    return True
@@ -0,0 +1,472 @@
+"""
+LLM Backends
+Environment-selectable chat completion backends.
+
+LLM_BACKEND=openai (default) builds OpenAI/AsyncOpenAI clients from
+OPENAI_API_KEY. LLM_BACKEND=local builds a deterministic in-process stand-in
+with the same `client.chat.completions.create(...)` surface (including
+stream=True); it returns schema-valid JSON for every prompt type in this
+repo, with configurable latency, injected errors/429s and token accounting,
+so the real code paths can be load-tested offline.
+
+Local backend settings:
+    LOCAL_LLM_LATENCY           fixed:S | uniform:LO,HI | normal:MEAN,STD | lognormal:MEDIAN,SIGMA (seconds, default fixed:0)
+    LOCAL_LLM_SECONDS_PER_TOKEN extra latency per completion token (default 0)
+    LOCAL_LLM_ERROR_RATE        probability of an injected 500 (default 0)
+    LOCAL_LLM_RATE_LIMIT_RATE   probability of an injected 429 (default 0)
+    LOCAL_LLM_RETRY_AFTER       retry-after seconds sent with injected 429s (default 1)
+    LOCAL_LLM_SEED              RNG seed for latency/error sampling (default 7)
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Optional
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import httpx
+import openai
+from .constants import LENS_LIST, SEED
+
+_LOCAL_URL = "http://local-llm.invalid/v1/chat/completions"
+STREAM_CHUNK_CHARS = 16
+
+
+# Response objects mirroring the parts of openai's ChatCompletion the code reads
+
+@dataclass
+class LocalMessage:
+    content: str
+    role: str = "assistant"
+
+
+@dataclass
+class LocalChoice:
+    message: LocalMessage
+    index: int = 0
+    finish_reason: str = "stop"
+
+
+@dataclass
+class LocalUsage:
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+@dataclass
+class LocalCompletion:
+    choices: list[LocalChoice]
+    usage: LocalUsage
+    model: str
+    id: str = "local-completion"
+
+
+# Latency / fault model
+
+def parse_latency_spec(spec: str) -> tuple[str, list[float]]:
+    kind, _, args = spec.partition(":")
+    kind = kind.strip().lower() or "fixed"
+    values = [float(a) for a in args.split(",") if a.strip()] or [0.0]
+    if kind not in ("fixed", "uniform", "normal", "lognormal"):
+        raise ValueError(f"Unknown LOCAL_LLM_LATENCY distribution: {kind}")
+    return kind, values
+
+
+@dataclass
+class LocalLLMConfig:
+    latency: tuple[str, list[float]] = ("fixed", [0.0])
+    seconds_per_token: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int = SEED
+
+    @classmethod
+    def from_env(cls) -> "LocalLLMConfig":
+        return cls(
+            latency=parse_latency_spec(os.getenv("LOCAL_LLM_LATENCY", "fixed:0")),
+            seconds_per_token=float(os.getenv("LOCAL_LLM_SECONDS_PER_TOKEN", "0")),
+            error_rate=float(os.getenv("LOCAL_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("LOCAL_LLM_RATE_LIMIT_RATE", "0")),
+            retry_after=float(os.getenv("LOCAL_LLM_RETRY_AFTER", "1")),
+            seed=int(os.getenv("LOCAL_LLM_SEED", str(SEED)))
+        )
+
+
+@dataclass
+class LocalLLMStats:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    injected_errors: int = 0
+    injected_rate_limits: int = 0
+    by_prompt_type: dict[str, int] = field(default_factory=dict)
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return max(1, math.ceil(len(text) / 4))
+
+
+# Deterministic responses per prompt type
+
+def _task(title: str, hours: int, focus: str) -> dict:
+    return {
+        "title": title,
+        "estimated_hours": hours,
+        "definition_of_done": [f"Plan the {focus} work", "Complete the core deliverable", "Add an artifact link to the portfolio"],
+        "micro_coaching": f"This task targets {focus} and should move the related metric within a few weeks.",
+        "quick_links": []
+    }
+
+
+def _three_tasks(focus: str, rng: random.Random) -> list[dict]:
+    verbs = ["Launch", "Deepen", "Document", "Lead", "Publish", "Mentor"]
+    picks = rng.sample(verbs, 3)
+    return [_task(f"{verb} a new {focus} initiative", rng.randint(4, 20), focus) for verb in picks]
+
+
+def _section_lines(prompt: str, header: str) -> list[str]:
+    match = re.search(rf"=== {re.escape(header)}[^\n]*===\n(.*?)(?:\n===|\Z)", prompt, re.S)
+    return [line.strip() for line in match.group(1).splitlines() if line.strip()] if match else []
+
+
+def _structured_recommendations(prompt: str, rng: random.Random) -> dict:
+    critical = []
+    for line in _section_lines(prompt, "CRITICAL GAPS"):
+        m = re.match(r"\d+\.\s+(\w+) GAP:\s*(\S+)\s*-\s*Severity:\s*([\d.]+)", line)
+        if not m:
+            continue
+        gap_type, lens, severity = m.group(1).lower(), m.group(2), float(m.group(3))
+        focus = lens if lens in LENS_LIST else gap_type
+        critical.append({
+            "gap_type": gap_type,
+            "gap_description": f"{focus} gap (severity {severity:.2f})",
+            "severity": severity,
+            "tasks": _three_tasks(focus, rng)
+        })
+    lens_improvements = []
+    for line in _section_lines(prompt, "LENSES THAT COULD IMPROVE"):
+        m = re.match(r"-\s*(\w+):\s*([\d.]+)/10", line)
+        if m:
+            lens_improvements.append({
+                "lens": m.group(1),
+                "current_score": float(m.group(2)),
+                "improvement_opportunity": f"{m.group(1)} can reach 8.0+ with focused effort",
+                "tasks": _three_tasks(m.group(1), rng)
+            })
+    spike = re.search(r"Current spike:\s*(.+)", prompt)
+    share = re.search(r"Spike share:\s*([\d.]+)%", prompt)
+    coverage = re.search(r"Coverage index:\s*([\d.]+)", prompt)
+    needs = bool(re.search(r"Needs improvement:\s*YES", prompt))
+    spike_theme = spike.group(1).strip() if spike and "NONE" not in spike.group(1) else None
+    alignment = []
+    for line in _section_lines(prompt, "ALIGNMENT SCORES"):
+        m = re.match(r"-\s*(.+):\s*([\d.]+)%", line)
+        if m:
+            score = float(m.group(2)) / 100.0
+            alignment.append({
+                "school_name": m.group(1),
+                "alignment_score": score,
+                "is_high_alignment": score >= 0.6,
+                "priority_tasks": [t["title"] for section in critical[:1] for t in section["tasks"]],
+                "alignment_notes": "High alignment; polish existing strengths." if score >= 0.6 else "Address the school's very_important factors first."
+            })
+    return {
+        "critical_improvements": critical,
+        "lens_improvements": lens_improvements,
+        "diversity_spike": {
+            "has_spike": spike_theme is not None,
+            "spike_theme": spike_theme,
+            "spike_share": float(share.group(1)) / 100.0 if share else 0.0,
+            "coverage_index": float(coverage.group(1)) if coverage else 0.0,
+            "needs_improvement": needs,
+            "tasks": _three_tasks("spike", rng) if needs else []
+        },
+        "alignment_priorities": alignment
+    }
+
+
+def _essay_suggestions(rng: random.Random, n: int) -> list[dict]:
+    kinds = ["structure", "content", "tone", "grammar", "clarity", "prompt_alignment"]
+    return [
+        {
+            "type": rng.choice(kinds),
+            "priority": rng.choice(["high", "medium", "low"]),
+            "location": f"paragraph {i + 1}",
+            "current_text": None,
+            "suggested_text": None,
+            "explanation": "Make this passage more specific. Concrete details show rather than tell."
+        }
+        for i in range(n)
+    ]
+
+
+def _essay_scores(rng: random.Random) -> dict:
+    return {
+        "overall_score": round(rng.uniform(5.5, 9.0), 1),
+        "strengths": ["Authentic voice", "Clear personal stakes", "Specific details"],
+        "weaknesses": ["Conclusion is abrupt", "Some sentences are wordy", "Middle paragraph lacks reflection"],
+        "content_score": round(rng.uniform(5.5, 9.0), 1),
+        "tone_score": round(rng.uniform(5.5, 9.0), 1)
+    }
+
+
+def classify_prompt(messages: list[dict], response_format: Optional[dict]) -> str:
+    text = "\n".join(str(m.get("content", "")) for m in messages)
+    if response_format and response_format.get("type") == "json_schema":
+        return "essay.single_shot"
+    if "Return only a number" in text:
+        return "essay.alignment"
+    if '"suggestions" array' in text:
+        return "essay.suggestions"
+    if "overall_score" in text:
+        return "essay.analysis"
+    if '"critical_improvements"' in text:
+        return "portfolio.structured"
+    if '"recommendations"' in text:
+        return "portfolio.recommendations"
+    if '{"tasks": [' in text:
+        return "portfolio.alternatives"
+    if "college admission documents" in text:
+        return "pdf.summary"
+    return "generic"
+
+
+def render_response(prompt_type: str, messages: list[dict], rng: random.Random) -> str:
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+    if prompt_type == "essay.alignment":
+        return f"{rng.uniform(5.0, 9.5):.1f}"
+    if prompt_type == "essay.analysis":
+        return json.dumps(_essay_scores(rng))
+    if prompt_type == "essay.suggestions":
+        return json.dumps({"suggestions": _essay_suggestions(rng, 6)})
+    if prompt_type == "essay.single_shot":
+        return json.dumps({**_essay_scores(rng), "prompt_alignment_score": round(rng.uniform(5.0, 9.5), 1),
+                           "suggestions": _essay_suggestions(rng, 6)})
+    if prompt_type == "portfolio.structured":
+        return json.dumps(_structured_recommendations(prompt, rng))
+    if prompt_type == "portfolio.recommendations":
+        return json.dumps({"recommendations": [_task(f"Portfolio task {i + 1}", rng.randint(4, 20), "the weakest lens") for i in range(8)]})
+    if prompt_type == "portfolio.alternatives":
+        return json.dumps({"tasks": _three_tasks("alternative", rng)})
+    if prompt_type == "pdf.summary":
+        return json.dumps({
+            "acceptance_rate": "17%",
+            "test_policy": "test-optional",
+            "relative_importance": {"gpa": "very_important", "course_rigor": "very_important", "essay": "important",
+                                    "test_scores": "considered", "extracurriculars": "important"},
+            "student_faculty_ratio": "19:1"
+        })
+    return "{}"
+
+
+class LocalLLMBackend:
+    """Shared generation/fault logic for the sync and async local clients"""
+
+    def __init__(self, config: Optional[LocalLLMConfig] = None):
+        self.config = config or LocalLLMConfig.from_env()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._stats = LocalLLMStats()
+
+    def _sample_latency(self) -> float:
+        kind, v = self.config.latency
+        with self._lock:
+            if kind == "uniform":
+                base = self._rng.uniform(v[0], v[1] if len(v) > 1 else v[0])
+            elif kind == "normal":
+                base = self._rng.gauss(v[0], v[1] if len(v) > 1 else 0.0)
+            elif kind == "lognormal":
+                base = v[0] * math.exp(self._rng.gauss(0.0, v[1] if len(v) > 1 else 0.0))
+            else:
+                base = v[0]
+        return max(0.0, base)
+
+    def _roll(self, probability: float) -> bool:
+        if probability <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < probability
+
+    def prepare(self, kwargs: dict) -> tuple[float, Optional[Exception], Optional[LocalCompletion]]:
+        """Decide latency and outcome of one call: (delay, error_to_raise, completion)"""
+        messages = kwargs.get("messages", [])
+        prompt_type = classify_prompt(messages, kwargs.get("response_format"))
+        delay = self._sample_latency()
+
+        if self._roll(self.config.rate_limit_rate):
+            with self._lock:
+                self._stats.injected_rate_limits += 1
+            response = httpx.Response(429, headers={"retry-after": str(self.config.retry_after)},
+                                      request=httpx.Request("POST", _LOCAL_URL))
+            return delay * 0.1, openai.RateLimitError("Injected rate limit", response=response, body=None), None
+        if self._roll(self.config.error_rate):
+            with self._lock:
+                self._stats.injected_errors += 1
+            response = httpx.Response(500, request=httpx.Request("POST", _LOCAL_URL))
+            return delay, openai.InternalServerError("Injected server error", response=response, body=None), None
+
+        # Content depends only on the request, so identical prompts get identical answers
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+        content = render_response(prompt_type, messages, random.Random(int(digest[:16], 16)))
+        prompt_tokens = sum(count_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = count_tokens(content)
+        with self._lock:
+            self._stats.calls += 1
+            self._stats.prompt_tokens += prompt_tokens
+            self._stats.completion_tokens += completion_tokens
+            self._stats.by_prompt_type[prompt_type] = self._stats.by_prompt_type.get(prompt_type, 0) + 1
+        completion = LocalCompletion(
+            choices=[LocalChoice(message=LocalMessage(content=content))],
+            usage=LocalUsage(prompt_tokens, completion_tokens, prompt_tokens + completion_tokens),
+            model=kwargs.get("model", "local")
+        )
+        return delay, None, completion
+
+    def token_delay(self, tokens: int) -> float:
+        return tokens * self.config.seconds_per_token
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = self._stats
+            return {
+                "calls": s.calls,
+                "prompt_tokens": s.prompt_tokens,
+                "completion_tokens": s.completion_tokens,
+                "injected_errors": s.injected_errors,
+                "injected_rate_limits": s.injected_rate_limits,
+                "by_prompt_type": dict(s.by_prompt_type)
+            }
+
+
+def _timeout_error() -> openai.APITimeoutError:
+    return openai.APITimeoutError(request=httpx.Request("POST", _LOCAL_URL))
+
+
+def _stream_pieces(completion: LocalCompletion, include_usage: bool) -> list[tuple[SimpleNamespace, int]]:
+    """Split a completion into (chunk, completion_tokens) pairs shaped like ChatCompletionChunk"""
+    content = completion.choices[0].message.content
+    pieces = []
+    for i in range(0, len(content), STREAM_CHUNK_CHARS):
+        text = content[i:i + STREAM_CHUNK_CHARS]
+        delta = SimpleNamespace(content=text, role="assistant" if i == 0 else None)
+        pieces.append((SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None),
+                       count_tokens(text)))
+    pieces.append((SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None, role=None), finish_reason="stop")],
+                                   usage=None), 0))
+    if include_usage:
+        pieces.append((SimpleNamespace(choices=[], usage=completion.usage), 0))
+    return pieces
+
+
+class LocalLLMClient:
+    """Synchronous OpenAI-compatible stand-in"""
+
+    def __init__(self, backend: Optional[LocalLLMBackend] = None):
+        self.backend = backend or LocalLLMBackend()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs) -> Any:
+        delay, error, completion = self.backend.prepare(kwargs)
+        if error is None and not kwargs.get("stream"):
+            delay += self.backend.token_delay(completion.usage.completion_tokens)
+        timeout = kwargs.get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise _timeout_error()
+        if delay > 0:
+            time.sleep(delay)
+        if error is not None:
+            raise error
+        if kwargs.get("stream"):
+            include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return self._stream(_stream_pieces(completion, include_usage))
+        return completion
+
+    def _stream(self, pieces: list[tuple[SimpleNamespace, int]]):
+        for chunk, tokens in pieces:
+            if tokens:
+                time.sleep(self.backend.token_delay(tokens))
+            yield chunk
+
+
+class AsyncLocalLLMClient:
+    """Asynchronous OpenAI-compatible stand-in"""
+
+    def __init__(self, backend: Optional[LocalLLMBackend] = None):
+        self.backend = backend or LocalLLMBackend()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs) -> Any:
+        delay, error, completion = self.backend.prepare(kwargs)
+        if error is None and not kwargs.get("stream"):
+            delay += self.backend.token_delay(completion.usage.completion_tokens)
+        timeout = kwargs.get("timeout")
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise _timeout_error()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        if kwargs.get("stream"):
+            include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return self._stream(_stream_pieces(completion, include_usage))
+        return completion
+
+    async def _stream(self, pieces: list[tuple[SimpleNamespace, int]]):
+        for chunk, tokens in pieces:
+            if tokens:
+                await asyncio.sleep(self.backend.token_delay(tokens))
+            yield chunk
+
+
+def backend_name() -> str:
+    return os.getenv("LLM_BACKEND", "openai").strip().lower()
+
+
+def _openai_api_key() -> Optional[str]:
+    key = os.getenv("OPENAI_API_KEY")
+    # Remove quotes if present
+    return key.strip().strip('"').strip("'") if key else None
+
+
+_local_backend: Optional[LocalLLMBackend] = None
+
+
+def local_backend() -> LocalLLMBackend:
+    """Process-wide local backend so sync and async clients share stats and RNG"""
+    global _local_backend
+    if _local_backend is None:
+        _local_backend = LocalLLMBackend()
+    return _local_backend
+
+
+def create_llm_client(use_async: bool = False, max_retries: Optional[int] = None) -> Any:
+    """Build the client selected by LLM_BACKEND, or None if it is not configured"""
+    name = backend_name()
+    if name == "local":
+        return AsyncLocalLLMClient(local_backend()) if use_async else LocalLLMClient(local_backend())
+    if name != "openai":
+        raise ValueError(f"Unknown LLM_BACKEND: {name}")
+    api_key = _openai_api_key()
+    if not api_key:
+        return None
+    kwargs: dict[str, Any] = {"api_key": api_key}
+    if max_retries is not None:
+        kwargs["max_retries"] = max_retries
+    return openai.AsyncOpenAI(**kwargs) if use_async else openai.OpenAI(**kwargs)
+
+
+def backend_stats() -> dict:
+    name = backend_name()
+    return {"backend": name, **(local_backend().stats() if name == "local" else {})}
@@ -0,0 +1,221 @@
+"""
+LLM Response Cache
+Two-tier, content-addressed cache for chat completion responses.
+
+Tier one is an in-process LRU with a TTL; tier two is an on-disk SQLite
+store that survives restarts. Keys are namespaced ("portfolio.structured:<sha256>")
+so whole families of entries can be invalidated by prefix.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'llm_cache.sqlite3')
+
+
+def make_cache_key(
+    namespace: str,
+    model: str,
+    messages: list[dict],
+    temperature: Optional[float],
+    response_format: Optional[dict]
+) -> str:
+    """Hash everything that determines a completion into a namespaced key"""
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": response_format
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class LRUTTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after ttl_seconds"""
+
+    def __init__(self, maxsize: int = 512, ttl_seconds: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCacheStore:
+    """Persistent key/value store backed by a single SQLite table"""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        self.path = os.path.abspath(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds and created_at + self.ttl_seconds < time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._conn.commit()
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM llm_cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Memory tier in front of an optional SQLite tier, with hit/miss counters"""
+
+    def __init__(
+        self,
+        memory: Optional[LRUTTLCache] = None,
+        disk: Optional[SQLiteCacheStore] = None,
+        enabled: bool = True
+    ):
+        self.memory = memory or LRUTTLCache()
+        self.disk = disk
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        enabled = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+        memory = LRUTTLCache(
+            maxsize=int(os.getenv("LLM_CACHE_MEMORY_SIZE", "512")),
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+        )
+        disk = None
+        if enabled and os.getenv("LLM_CACHE_DISK", "1").lower() not in ("0", "false", "no"):
+            try:
+                disk = SQLiteCacheStore(
+                    os.getenv("LLM_CACHE_PATH", DEFAULT_DB_PATH),
+                    ttl_seconds=float(os.getenv("LLM_CACHE_DISK_TTL_SECONDS", "604800")) or None
+                )
+            except sqlite3.Error as e:
+                print(f"LLM cache disk tier unavailable: {e}")
+        return cls(memory=memory, disk=disk, enabled=enabled)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+        self._count("writes")
+
+    def invalidate(self, prefix: str = "") -> int:
+        """Drop every entry whose key starts with prefix from both tiers"""
+        removed = self.memory.invalidate_prefix(prefix)
+        if self.disk is not None:
+            removed = max(removed, self.disk.invalidate_prefix(prefix))
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            "enabled": self.enabled,
+            **counters,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": self.disk.count() if self.disk is not None else None
+        }
+
+
+response_cache = ResponseCache.from_env()
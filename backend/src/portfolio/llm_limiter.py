@@ -0,0 +1,214 @@
+"""
+LLM Concurrency Governor
+Process-wide limiter shared by every LLM call site.
+
+Combines a token bucket for tokens per minute, a concurrency limit, and an
+AIMD-adapted ceiling on that limit: each success grows the limit additively,
+each 429 halves it and pauses new requests for the server's retry-after.
+"""
+
+from __future__ import annotations
+from collections import deque
+from typing import Optional
+import asyncio
+import math
+import os
+import threading
+import time
+
+
+class LimiterRejected(Exception):
+    """Raised when a request waited longer than the configured max queue wait"""
+
+
+class TokenBucket:
+    """Tokens-per-minute bucket; not thread-safe on its own (guarded by the limiter lock)"""
+
+    def __init__(self, tokens_per_minute: float):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, tokens: float) -> float:
+        """Seconds until `tokens` are available (0 if available now)"""
+        tokens = min(tokens, self.capacity)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class AdaptiveLimiter:
+    """Token bucket + adaptive (AIMD) concurrency limit with queue-wait metrics"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        tokens_per_minute: float = 200_000,
+        max_queue_wait: float = 30.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_queue_wait = max_queue_wait
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.limit = float(max_concurrency)
+        self.bucket = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._waits: deque[float] = deque(maxlen=1024)
+        self._counters = {"acquired": 0, "rejected": 0, "rate_limited": 0, "queued": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveLimiter":
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            min_concurrency=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+            max_queue_wait=float(os.getenv("LLM_MAX_QUEUE_WAIT_SECONDS", "30"))
+        )
+
+    # Acquisition
+
+    def _try_acquire_locked(self, tokens: float, now: float) -> float:
+        """Take a slot if possible and return 0, else return a suggested wait in seconds"""
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight >= max(self.min_concurrency, int(self.limit)):
+            return 0.05
+        self.bucket.refill(now)
+        wait = self.bucket.wait_for(tokens)
+        if wait > 0:
+            return wait
+        self.bucket.tokens -= min(tokens, self.bucket.capacity)
+        self._in_flight += 1
+        return 0.0
+
+    def _record_wait_locked(self, waited: float) -> None:
+        self._counters["acquired"] += 1
+        if waited > 0.001:
+            self._counters["queued"] += 1
+        self._waits.append(waited)
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def _reject_locked(self, waited: float, max_wait: float) -> LimiterRejected:
+        self._counters["rejected"] += 1
+        return LimiterRejected(f"LLM limiter queue wait exceeded {max_wait:.1f}s (waited {waited:.1f}s)")
+
+    def _max_wait(self, max_wait: Optional[float]) -> float:
+        return self.max_queue_wait if max_wait is None else min(self.max_queue_wait, max_wait)
+
+    def acquire(self, tokens: float, max_wait: Optional[float] = None) -> float:
+        """Block until a slot and `tokens` are available; returns seconds waited"""
+        started = time.monotonic()
+        max_wait = self._max_wait(max_wait)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._try_acquire_locked(tokens, now)
+                waited = now - started
+                if wait == 0.0:
+                    self._record_wait_locked(waited)
+                    return waited
+                remaining = max_wait - waited
+                if remaining <= 0:
+                    raise self._reject_locked(waited, max_wait)
+                self._cond.wait(min(wait, remaining))
+
+    async def aacquire(self, tokens: float, max_wait: Optional[float] = None) -> float:
+        """Async acquire; polls so event-loop callers never block a thread"""
+        started = time.monotonic()
+        max_wait = self._max_wait(max_wait)
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                wait = self._try_acquire_locked(tokens, now)
+                waited = now - started
+                if wait == 0.0:
+                    self._record_wait_locked(waited)
+                    return waited
+                remaining = max_wait - waited
+                if remaining <= 0:
+                    raise self._reject_locked(waited, max_wait)
+            await asyncio.sleep(min(wait, remaining, 0.05))
+
+    def release(self, estimated_tokens: float = 0.0, actual_tokens: Optional[float] = None) -> None:
+        """Free the slot and reconcile the token estimate against actual usage"""
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if actual_tokens is not None:
+                self.bucket.tokens = min(self.bucket.capacity, self.bucket.tokens + estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    # AIMD feedback
+
+    def on_success(self) -> None:
+        """Additive increase: roughly +1 to the limit per limit-many successes"""
+        with self._cond:
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def on_rate_limited(self, retry_after: Optional[float]) -> None:
+        """Multiplicative decrease (at most once per cooldown) and pause until retry-after"""
+        now = time.monotonic()
+        with self._cond:
+            self._counters["rate_limited"] += 1
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+                self._last_decrease = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self.bucket.refill(now)
+            waits = sorted(self._waits)
+            acquired = self._counters["acquired"]
+            return {
+                **self._counters,
+                "in_flight": self._in_flight,
+                "concurrency_limit": round(self.limit, 2),
+                "max_concurrency": self.max_concurrency,
+                "tokens_available": int(self.bucket.tokens),
+                "tokens_per_minute": int(self.bucket.capacity),
+                "paused_for_s": round(max(0.0, self._blocked_until - now), 3),
+                "queue_wait_avg_s": round(self._wait_total / acquired, 4) if acquired else 0.0,
+                "queue_wait_p95_s": round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else 0.0,
+                "queue_wait_max_s": round(self._wait_max, 4)
+            }
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read retry-after-ms / retry-after from an API error's response headers"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+llm_limiter = AdaptiveLimiter.from_env()
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from typing import Optional, Literal
-from pydantic import BaseModel, Field, AnyUrl
+from typing import Any, Optional, Literal
+from pydantic import BaseModel, Field, AnyUrl, model_validator
 from datetime import date
 
 Lens = Literal["Curiosity","Growth","Community","Creativity","Leadership","Achievements"]
@@ -11,6 +11,8 @@ TestUse = Literal["required","recommended","considered_if_submitted","not_consid
 Platform = Literal["Common App","UCAS","Coalition","School Portal"]
 TestPrepStatus = Literal["none","studying","taken"]
 Criticality = Literal["low","medium","high"]
+EssayAnalysisMode = Literal["multi_call","single_shot"]
+AnalyzeSection = Literal["scores","gaps","critical_improvements","lens_improvements","diversity_spike","alignment_priorities","standardized_tests"]
 
 class TestScore(BaseModel):
     score: Optional[int] = None
@@ -92,9 +94,13 @@ class PortfolioAnalyzeRequest(BaseModel):
     schools: list[str]
     deadlines: dict[str, str]
     weekly_hours_cap: int = Field(8, ge=2, le=25)
-    school_context: Optional[SchoolContext] = None
+    school_context: Optional[SchoolContext] = Field(None, description="Context for every school without a more specific one")
+    school_contexts: dict[str, SchoolContext] = Field(default_factory=dict, description="Per-school contexts keyed by names in schools")
+    school_set: Optional[str] = Field(None, description="Name of a server-side school set to take contexts from")
     student_profile: Optional[StudentProfile] = None
     portfolio: list[Evidence] = []
+    sections: Optional[list[AnalyzeSection]] = Field(None, description="Response sections to compute; all when omitted. Scores and gaps are always returned")
+    as_of: Optional[date] = Field(None, description="Evaluation date for ongoing activities and test runways; today when omitted")
 
 class RecommendationTask(BaseModel):
     title: str
@@ -154,6 +160,14 @@ class TestAnalysis(BaseModel):
     rationale: str
     tasks: list[RecommendationTask] = Field(default_factory=list, description="Tasks for test prep if needed")
 
+class ResponseProvenance(BaseModel):
+    """Which sections came from the LLM and which from the rule-based fallback"""
+    sections: dict[str, Literal["llm", "fallback", "rules"]]
+    fallback_reason: Optional[Literal["llm_unavailable", "circuit_open", "llm_error", "llm_incomplete", "deadline"]] = None
+    budget_ms: int
+    elapsed_ms: int
+    as_of: Optional[date] = Field(None, description="Evaluation date the analysis used")
+
 class PortfolioAnalyzeResponse(BaseModel):
     scores: dict
     gaps: list[dict]
@@ -162,11 +176,18 @@ class PortfolioAnalyzeResponse(BaseModel):
     diversity_spike: Optional[DiversitySpikeSection] = None
     alignment_priorities: list[AlignmentPriority] = Field(default_factory=list)
     standardized_tests: list[TestAnalysis] = Field(default_factory=list, description="Test analysis for each school")
+    provenance: Optional[ResponseProvenance] = None
+    context_token: Optional[str] = Field(None, description="Pass to /portfolio/regenerate-tasks instead of the original request")
+
+class PortfolioScoresResponse(BaseModel):
+    scores: dict
+    gaps: list[dict]
 
 class TestPlanRequest(BaseModel):
     student_profile: StudentProfile
     school_context: SchoolContext
     weekly_hours_cap: int = Field(..., ge=2, le=25)
+    as_of: Optional[date] = Field(None, description="Evaluation date for the test runway; today when omitted")
 
 class TestPlanResponse(BaseModel):
     decision: Literal["PLAN", "SEND", "SKIP", "OPTIONAL"]
@@ -182,9 +203,51 @@ class EligibilityCheckResponse(BaseModel):
     warnings: list[str] = Field(default_factory=list)
     errors: list[str] = Field(default_factory=list)
 
+class EvidenceEdit(BaseModel):
+    """One step of a what-if scenario"""
+    op: Literal["add", "remove", "patch"]
+    id: Optional[str] = Field(None, description="Activity to remove or patch")
+    evidence: Optional[Evidence] = Field(None, description="Activity to add")
+    changes: dict[str, Any] = Field(default_factory=dict, description="Evidence fields to overwrite when patching")
+
+    @model_validator(mode="after")
+    def _check_op(self):
+        if self.op == "add" and self.evidence is None:
+            raise ValueError("add requires evidence")
+        if self.op != "add" and not self.id:
+            raise ValueError(f"{self.op} requires id")
+        if self.op == "patch" and (not self.changes or "id" in self.changes):
+            raise ValueError("patch requires changes, which cannot include id")
+        return self
+
+class SimulationScenario(BaseModel):
+    name: Optional[str] = None
+    edits: list[EvidenceEdit] = Field(..., min_length=1, max_length=100)
+
+class SimulateRequest(BaseModel):
+    base: PortfolioAnalyzeRequest
+    scenarios: list[SimulationScenario] = Field(..., min_length=1, max_length=500)
+
+class ScenarioResult(BaseModel):
+    name: Optional[str] = None
+    scores: Optional[dict] = None
+    gaps: list[dict] = Field(default_factory=list)
+    deltas: Optional[dict] = Field(None, description="Scenario minus base for impact_total, coverage, spike_share, lens_scores and alignment")
+    gap_deltas: list[dict] = Field(default_factory=list, description="Gaps whose severity changed; None means absent")
+    error: Optional[str] = Field(None, description="Why the edits could not be applied; nothing else is set then")
+
+class SimulateResponse(BaseModel):
+    base: PortfolioScoresResponse
+    scenarios: list[ScenarioResult]
+
+class SchoolSetResponse(BaseModel):
+    name: str
+    schools: list[str]
+
 class RegenerateTasksRequest(BaseModel):
     """Request to regenerate alternative tasks for a specific section"""
-    original_request: PortfolioAnalyzeRequest
+    original_request: Optional[PortfolioAnalyzeRequest] = Field(None, description="Required when context_token is missing or expired")
+    context_token: Optional[str] = Field(None, description="context_token from /portfolio/analyze")
     section_type: Literal["critical_improvements", "lens_improvements", "diversity_spike"]
     section_identifier: Optional[str] = Field(None, description="For critical_improvements: gap_type or lens name. For lens_improvements: lens name. For diversity_spike: can be None")
     exclude_task_titles: list[str] = Field(default_factory=list, description="Task titles to exclude from new suggestions")
@@ -224,4 +287,30 @@ class AnalyzeEssayRequest(BaseModel):
     essay_text: str
     prompt_text: Optional[str] = None
     target_word_count: Optional[int] = None
-    essay_id: Optional[str] = None
\ No newline at end of file
+    essay_id: Optional[str] = None
+    analysis_mode: EssayAnalysisMode = Field("multi_call", description="multi_call: three focused completions; single_shot: one schema-constrained completion")
+
+
+# Background Job Models
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+class JobTimings(BaseModel):
+    queued_ms: Optional[int] = Field(None, description="Submission to first start")
+    run_ms: int = Field(0, description="Time spent running, summed over attempts")
+    total_ms: Optional[int] = Field(None, description="Submission to completion")
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: JobStatus
+    priority: int
+    attempts: int
+    max_attempts: int
+    created_at: float = Field(..., description="Unix time")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    next_attempt_at: Optional[float] = Field(None, description="When a queued retry becomes eligible")
+    timings: JobTimings
+    result: Optional[dict] = Field(None, description="The synchronous route's response body, once succeeded")
+    error: Optional[str] = None
+    error_status: Optional[int] = Field(None, description="Status code the synchronous route would have answered with")
@@ -0,0 +1,281 @@
+"""
+Cohort Percentiles
+Where a student's impact total and lens scores fall among the other
+students scored by this service.
+
+Each cohort cell, keyed by (intended major, grade), keeps one sorted array
+per metric. A lookup is two bisections, so O(log n). An insert is a bisection
+plus a list insert. Every student is added to three cells: its own
+(major, grade) cell, its grade across majors and everyone. A lookup uses the
+narrowest of these that holds at least PERCENTILE_MIN_COHORT students. A
+student keeps only its latest scores; rescoring replaces the old values.
+
+Scores are persisted to SQLite, one row per student, each row stamped with
+an increasing sequence number. sync() writes the pending rows and merges the
+rows written since the last sync, including rows from other processes
+sharing the file. It runs once at startup, then on a background thread at
+most once every PERCENTILE_SYNC_SECONDS, outside the lock lookups take.
+"""
+
+from __future__ import annotations
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Mapping, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+from .constants import LENS_LIST
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'percentiles.sqlite3')
+PERCENTILE_MIN_COHORT = int(os.getenv("PERCENTILE_MIN_COHORT", "20"))
+PERCENTILE_SYNC_SECONDS = float(os.getenv("PERCENTILE_SYNC_SECONDS", "5"))
+
+METRICS = ("impact_total",) + tuple(LENS_LIST)
+ANY = "*"
+
+CellKey = Tuple[str, str]
+
+
+def _normalize(label: Optional[str]) -> str:
+    return " ".join(label.lower().split()) if label and label.strip() else ANY
+
+
+def cohort_cells(intended_major: Optional[str], grade: Optional[str]) -> List[CellKey]:
+    """Cells a student belongs to, narrowest first, without duplicates"""
+    major, grade = _normalize(intended_major), _normalize(grade)
+    cells = [(major, grade), (ANY, grade), (ANY, ANY)]
+    return list(dict.fromkeys(cells))
+
+
+class CohortSketch:
+    """Sorted score arrays of one cohort cell, one per metric"""
+
+    def __init__(self):
+        self.values: Dict[str, List[float]] = {m: [] for m in METRICS}
+        self.size = 0
+
+    def add(self, scores: Mapping[str, float]) -> None:
+        for m in METRICS:
+            insort(self.values[m], scores[m])
+        self.size += 1
+
+    def remove(self, scores: Mapping[str, float]) -> None:
+        for m in METRICS:
+            column = self.values[m]
+            del column[bisect_left(column, scores[m])]
+        self.size -= 1
+
+    def percentile(self, metric: str, value: float, exclude: Optional[Mapping[str, float]] = None) -> float:
+        """Mid-rank percentile: share of the cohort below `value`, counting ties as half.
+        `exclude` holds one member's scores to leave out of the ranking."""
+        column = self.values[metric]
+        below = bisect_left(column, value)
+        ties = bisect_right(column, value) - below
+        size = len(column)
+        if exclude is not None:
+            size -= 1
+            if exclude[metric] < value:
+                below -= 1
+            elif exclude[metric] == value:
+                ties -= 1
+        return 100.0 * (below + 0.5 * ties) / size
+
+
+class SQLitePercentileStore:
+    """Latest scores per student, with a sequence number for incremental merges"""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cohort_scores ("
+            "student_id TEXT PRIMARY KEY, intended_major TEXT, grade TEXT, scores TEXT NOT NULL, "
+            "seq INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cohort_scores_seq ON cohort_scores (seq)")
+        self._conn.commit()
+
+    def write(self, rows: List[Tuple[str, Optional[str], Optional[str], Mapping[str, float]]]) -> None:
+        with self._conn:
+            # IMMEDIATE takes the write lock first, so concurrent writers commit sequence numbers in order
+            self._conn.execute("BEGIN IMMEDIATE")
+            seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM cohort_scores").fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cohort_scores (student_id, intended_major, grade, scores, seq) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(sid, major, grade, json.dumps(scores), seq + i)
+                 for i, (sid, major, grade, scores) in enumerate(rows, start=1)]
+            )
+
+    def since(self, seq: int) -> List[tuple]:
+        return self._conn.execute(
+            "SELECT student_id, intended_major, grade, scores, seq FROM cohort_scores WHERE seq > ? ORDER BY seq",
+            (seq,)
+        ).fetchall()
+
+    def clear(self) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM cohort_scores")
+
+
+class PercentileIndex:
+    """Thread-safe cohort percentile index with an optional SQLite store"""
+
+    def __init__(self, store: Optional[SQLitePercentileStore] = None, min_cohort: int = PERCENTILE_MIN_COHORT,
+                 sync_seconds: float = PERCENTILE_SYNC_SECONDS, enabled: bool = True):
+        self.store = store
+        self.min_cohort = min_cohort
+        self.sync_seconds = sync_seconds
+        self.enabled = enabled
+        self._cells: Dict[CellKey, CohortSketch] = {}
+        self._students: Dict[str, Tuple[List[CellKey], Dict[str, float]]] = {}
+        self._pending: Dict[str, Tuple[Optional[str], Optional[str], Dict[str, float]]] = {}
+        self._seq = 0
+        self._synced_at = float("-inf")
+        self._syncing = False
+        self._lock = threading.Lock()
+        # Held for store I/O only, so lookups and records never wait on disk
+        self._sync_lock = threading.Lock()
+        self._counters = {"records": 0, "lookups": 0, "merged": 0, "store_errors": 0}
+        if self.store is not None and self.enabled:
+            self.sync()
+
+    @classmethod
+    def from_env(cls) -> "PercentileIndex":
+        enabled = os.getenv("PERCENTILES_ENABLED", "1").lower() not in ("0", "false", "no")
+        store = None
+        if enabled and os.getenv("PERCENTILE_DISK", "1").lower() not in ("0", "false", "no"):
+            try:
+                store = SQLitePercentileStore(os.getenv("PERCENTILE_INDEX_PATH", DEFAULT_DB_PATH))
+            except sqlite3.Error as e:
+                print(f"Percentile store unavailable: {e}")
+        return cls(store=store, enabled=enabled)
+
+    def _apply(self, student_id: str, intended_major: Optional[str], grade: Optional[str],
+               scores: Dict[str, float]) -> None:
+        cells = cohort_cells(intended_major, grade)
+        previous = self._students.get(student_id)
+        if previous is not None:
+            if previous == (cells, scores):
+                return
+            for key in previous[0]:
+                self._cells[key].remove(previous[1])
+        for key in cells:
+            self._cells.setdefault(key, CohortSketch()).add(scores)
+        self._students[student_id] = (cells, scores)
+
+    def record(self, student_id: str, intended_major: Optional[str], grade: Optional[str],
+               scores: Mapping[str, float]) -> None:
+        """Add or replace a student's scores (one value per entry of METRICS)"""
+        if not self.enabled:
+            return
+        scores = {m: float(scores[m]) for m in METRICS}
+        with self._lock:
+            self._apply(student_id, intended_major, grade, scores)
+            if self.store is not None:
+                self._pending[student_id] = (intended_major, grade, scores)
+            self._counters["records"] += 1
+        self._maybe_sync()
+
+    def percentiles(self, intended_major: Optional[str], grade: Optional[str],
+                    scores: Mapping[str, float], student_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Percentiles of `scores` in the narrowest cohort with at least min_cohort
+        students, else None. The scores stored for `student_id`, if any, are
+        left out, so a student is only ranked against its peers.
+        """
+        if not self.enabled:
+            return None
+        self._maybe_sync()
+        with self._lock:
+            self._counters["lookups"] += 1
+            own_cells, own_scores = self._students.get(student_id, ((), None))
+            for key in cohort_cells(intended_major, grade):
+                sketch = self._cells.get(key)
+                exclude = own_scores if key in own_cells else None
+                size = (sketch.size if sketch else 0) - (exclude is not None)
+                if size < max(1, self.min_cohort):
+                    continue
+                major, grade_key = key
+                return {
+                    "cohort": {
+                        "intended_major": None if major == ANY else major,
+                        "grade": None if grade_key == ANY else grade_key,
+                        "size": size
+                    },
+                    "impact_total": round(sketch.percentile("impact_total", scores["impact_total"], exclude), 1),
+                    "lens_scores": {lens: round(sketch.percentile(lens, scores[lens], exclude), 1) for lens in LENS_LIST}
+                }
+        return None
+
+    def _maybe_sync(self) -> None:
+        """Start a background sync when one is due, so request threads never do the store I/O"""
+        if self.store is None:
+            return
+        with self._lock:
+            if self._syncing or time.monotonic() - self._synced_at < self.sync_seconds:
+                return
+            self._syncing = True
+        threading.Thread(target=self.sync, name="percentile-sync", daemon=True).start()
+
+    def sync(self) -> None:
+        """Write pending scores to the store and merge rows written since the last sync"""
+        if self.store is None:
+            return
+        with self._sync_lock:
+            try:
+                self._sync()
+            finally:
+                with self._lock:
+                    self._syncing = False
+
+    def _sync(self) -> None:
+        with self._lock:
+            self._synced_at = time.monotonic()
+            pending, self._pending = self._pending, {}
+            seq = self._seq
+        try:
+            if pending:
+                self.store.write([(sid, major, grade, scores) for sid, (major, grade, scores) in pending.items()])
+            rows = self.store.since(seq)
+        except sqlite3.Error as e:
+            # Keep the scores for the next attempt; lookups go on with what is in memory
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+                self._counters["store_errors"] += 1
+            print(f"Percentile store sync failed: {e}")
+            return
+        with self._lock:
+            for student_id, major, grade, scores, row_seq in rows:
+                # Scores recorded while the store was busy are newer than anything read back
+                if student_id not in self._pending:
+                    self._apply(student_id, major, grade, json.loads(scores))
+                self._seq = max(self._seq, row_seq)
+            self._counters["merged"] += len(rows)
+
+    def clear(self) -> None:
+        with self._sync_lock, self._lock:
+            self._cells.clear()
+            self._students.clear()
+            self._pending.clear()
+            self._seq = 0
+            if self.store is not None:
+                self.store.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self._counters,
+                "students": len(self._students),
+                "cells": len(self._cells),
+                "pending": len(self._pending),
+                "min_cohort": self.min_cohort,
+                "persistent": self.store is not None
+            }
+
+
+percentile_index = PercentileIndex.from_env()
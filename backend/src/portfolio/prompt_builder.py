@@ -0,0 +1,146 @@
+"""
+Prompt Builder
+Token-counted, budget-enforced assembly of chat prompts.
+
+Static text (system message and instruction block) always comes first so
+provider-side prefix caching can reuse it across requests; per-request
+context follows as titled sections. When the prompt exceeds its token
+budget, sections are shrunk lowest priority first until it fits: list
+sections lose items from the end, truncatable text sections are cut. Token counts come
+from tiktoken when its encoding is available locally, otherwise from a
+~4 characters per token estimate.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "4000"))
+TRUNCATION_MARKER = "\n[... truncated to fit the prompt budget ...]"
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str) -> Any:
+    """tiktoken encoding for `model`, or None when tiktoken or its BPE file is unavailable"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.info(f"tiktoken encoding for {model} unavailable ({type(e).__name__}); estimating tokens")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Cut `text` to at most `max_tokens` tokens, marking the cut"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - count_tokens(TRUNCATION_MARKER, model))
+    encoding = _encoding(model)
+    head = encoding.decode(encoding.encode(text)[:keep]) if encoding is not None else text[:keep * 4]
+    return head + TRUNCATION_MARKER
+
+
+@dataclass
+class PromptSection:
+    title: Optional[str]
+    body: str = ""
+    items: Optional[list[str]] = None
+    min_items: int = 0
+    priority: int = 0
+    truncatable: bool = False
+    dropped: int = 0
+
+    def render(self) -> str:
+        body = "\n".join(self.items) if self.items is not None else self.body
+        return f"=== {self.title} ===\n{body}" if self.title else body
+
+
+@dataclass
+class PromptBuilder:
+    """Assemble messages as static system/instructions followed by budgeted context sections"""
+    name: str
+    model: str = "gpt-4o-mini"
+    budget: int = DEFAULT_PROMPT_TOKEN_BUDGET
+    system_text: str = ""
+    instruction_text: str = ""
+    sections: list[PromptSection] = field(default_factory=list)
+
+    def system(self, text: str) -> "PromptBuilder":
+        self.system_text = text
+        return self
+
+    def instructions(self, text: str) -> "PromptBuilder":
+        self.instruction_text = text
+        return self
+
+    def section(
+        self,
+        title: Optional[str],
+        body: str = "",
+        *,
+        items: Optional[list[str]] = None,
+        min_items: int = 0,
+        priority: int = 0,
+        truncatable: bool = False
+    ) -> "PromptBuilder":
+        """Add a context section; `items` can be trimmed down to `min_items`, low priority first"""
+        self.sections.append(PromptSection(title, body, list(items) if items is not None else None,
+                                           min_items, priority, truncatable))
+        return self
+
+    def _user_text(self) -> str:
+        parts = [self.instruction_text] if self.instruction_text else []
+        parts.extend(section.render() for section in self.sections)
+        return "\n\n".join(parts)
+
+    def _tokens(self) -> int:
+        return count_tokens(self.system_text, self.model) + count_tokens(self._user_text(), self.model)
+
+    def _compact(self, tokens: int) -> int:
+        """Shrink sections, lowest priority first, until the prompt fits the budget"""
+        for section in sorted(self.sections, key=lambda s: s.priority):
+            if tokens <= self.budget:
+                break
+            if section.items is not None:
+                while tokens > self.budget and len(section.items) > section.min_items:
+                    section.items.pop()
+                    section.dropped += 1
+                    tokens = self._tokens()
+            elif section.truncatable:
+                own = count_tokens(section.body, self.model)
+                section.body = truncate_to_tokens(section.body, max(0, own - (tokens - self.budget)), self.model)
+                tokens = self._tokens()
+        return tokens
+
+    def build(self) -> list[dict]:
+        tokens = self._tokens()
+        if tokens > self.budget:
+            tokens = self._compact(tokens)
+        static = count_tokens(self.system_text, self.model) + count_tokens(self.instruction_text, self.model)
+        dropped = sum(s.dropped for s in self.sections)
+        logger.info(f"prompt {self.name}: {tokens} tokens (budget {self.budget}, static prefix {static}, "
+                    f"{dropped} items dropped)")
+        if tokens > self.budget:
+            logger.warning(f"prompt {self.name} is {tokens} tokens after compaction, over its {self.budget} budget")
+        messages = [{"role": "system", "content": self.system_text}] if self.system_text else []
+        messages.append({"role": "user", "content": self._user_text()})
+        return messages
@@ -0,0 +1,93 @@
+"""
+Compact Activity Records
+Storage form of Evidence for activities kept in memory (the profile
+store, incremental score states, cohort loads).
+
+A pydantic Evidence instance carries an instance __dict__, a fields-set
+set, AnyUrl objects and a fresh list per list field, which adds up to
+well over a kilobyte per activity. ActivityRecord is a slotted dataclass
+with the same attribute names:
+- lens, type, role_level, area_of_activity and theme tags are interned,
+  so every record shares one string object per distinct value,
+- list fields become tuples, and empty ones share the empty tuple,
+- artifact links are kept as strings.
+compute_impact, load_cohort and IncrementalPortfolioScores only read
+attributes, so they accept records and Evidence alike. Evidence is
+materialized again with to_evidence() at the API boundary.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional, Tuple, Union
+import sys
+from .models import Evidence
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+@dataclass(slots=True, eq=False)
+class ActivityRecord:
+    id: str
+    title: str
+    lens: str
+    type: str
+    role_level: str
+    area_of_activity: Optional[str] = None
+    theme_tags: Tuple[str, ...] = ()
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    hours_total: Optional[int] = None
+    hours_per_week: Optional[float] = None
+    team_size: Optional[int] = None
+    people_impacted: Optional[int] = None
+    awards: Tuple[dict, ...] = ()
+    artifact_links: Tuple[str, ...] = ()
+    description_raw: Optional[str] = None
+
+    @classmethod
+    def from_evidence(cls, ev: Evidence) -> "ActivityRecord":
+        return cls(
+            id=ev.id,
+            title=ev.title,
+            lens=sys.intern(ev.lens),
+            type=sys.intern(ev.type),
+            role_level=sys.intern(ev.role_level),
+            area_of_activity=_intern(ev.area_of_activity),
+            theme_tags=tuple(sys.intern(t) for t in ev.theme_tags) if ev.theme_tags else (),
+            start_date=ev.start_date,
+            end_date=ev.end_date,
+            hours_total=ev.hours_total,
+            hours_per_week=ev.hours_per_week,
+            team_size=ev.team_size,
+            people_impacted=ev.people_impacted,
+            awards=tuple(dict(a) for a in ev.awards) if ev.awards else (),
+            artifact_links=tuple(str(u) for u in ev.artifact_links) if ev.artifact_links else (),
+            description_raw=ev.description_raw
+        )
+
+    def to_evidence(self) -> Evidence:
+        return Evidence.model_validate({
+            "id": self.id,
+            "title": self.title,
+            "lens": self.lens,
+            "type": self.type,
+            "area_of_activity": self.area_of_activity,
+            "role_level": self.role_level,
+            "theme_tags": list(self.theme_tags),
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "hours_total": self.hours_total,
+            "hours_per_week": self.hours_per_week,
+            "team_size": self.team_size,
+            "people_impacted": self.people_impacted,
+            "awards": [dict(a) for a in self.awards],
+            "artifact_links": list(self.artifact_links),
+            "description_raw": self.description_raw
+        })
+
+
+def as_record(activity: Union[Evidence, ActivityRecord]) -> ActivityRecord:
+    return activity if isinstance(activity, ActivityRecord) else ActivityRecord.from_evidence(activity)
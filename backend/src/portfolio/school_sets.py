@@ -0,0 +1,122 @@
+"""
+School Sets
+Server-side school lists that analysis requests can reference by name
+(`school_set`) instead of sending a SchoolContext per school.
+
+A set is compiled into a SchoolMatrix when it is stored, so requests that
+draw all their schools from one set only select columns from it.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Sequence
+import threading
+from .alignment import SchoolMatrix
+from .models import SchoolContext
+
+
+class UnknownSchoolSet(LookupError):
+    """No school set has been stored under this name"""
+
+
+@dataclass(frozen=True)
+class SchoolSet:
+    name: str
+    contexts: Mapping[str, SchoolContext]   # keyed by the school names used in requests
+    matrix: SchoolMatrix
+    index: Mapping[str, int]
+
+    @classmethod
+    def create(cls, name: str, contexts: Dict[str, SchoolContext]) -> "SchoolSet":
+        contexts = {school: ctx.model_copy(deep=True) for school, ctx in contexts.items()}
+        return cls(
+            name=name,
+            contexts=MappingProxyType(contexts),
+            matrix=SchoolMatrix.compile(list(contexts), list(contexts.values())),
+            index=MappingProxyType({school: i for i, school in enumerate(contexts)})
+        )
+
+    def columns(self, schools: Sequence[str]) -> Optional[SchoolMatrix]:
+        """Matrix of `schools` in order, or None when any of them is not in the set"""
+        if any(school not in self.index for school in schools):
+            return None
+        return self.matrix.take([self.index[school] for school in schools])
+
+
+class SchoolSetRegistry:
+    """Thread-safe name -> SchoolSet store; storing a name again replaces the set"""
+
+    def __init__(self):
+        self._sets: Dict[str, SchoolSet] = {}
+        self._lock = threading.Lock()
+        # Bumped on every change, so cached results that used a set can tell it changed
+        self.generation = 0
+
+    def put(self, name: str, contexts: Dict[str, SchoolContext]) -> SchoolSet:
+        school_set = SchoolSet.create(name, contexts)
+        with self._lock:
+            self._sets[name] = school_set
+            self.generation += 1
+        return school_set
+
+    def get(self, name: str) -> Optional[SchoolSet]:
+        with self._lock:
+            return self._sets.get(name)
+
+    def require(self, name: str) -> SchoolSet:
+        school_set = self.get(name)
+        if school_set is None:
+            raise UnknownSchoolSet(f"Unknown school set: {name}")
+        return school_set
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            self.generation += 1
+            return self._sets.pop(name, None) is not None
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._sets)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+            self.generation += 1
+
+
+class SharedSchools:
+    """
+    Bounded LRU of resolved school contexts shared by the items of a batch, keyed by the
+    school fields of a request (FIELDS) and the school set they reference
+    """
+    FIELDS = {"schools", "school_context", "school_contexts", "school_set"}
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            resolved = self._data.get(key)
+            if resolved is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return resolved
+
+    def put(self, key: Hashable, resolved: Any) -> Any:
+        with self._lock:
+            self._data[key] = resolved
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return resolved
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+school_sets = SchoolSetRegistry()
@@ -0,0 +1,130 @@
+"""
+Scoring Context Cache
+Keeps the deterministic scoring results of an analyzed portfolio so that
+follow-up calls (task regeneration) can refer to them by token instead of
+re-sending and re-scoring the whole request.
+
+Contexts are immutable, keyed by the request fingerprint, and evicted
+least-recently-used once either the entry limit or the total number of
+cached portfolio items is exceeded.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+import os
+import threading
+from .models import PortfolioAnalyzeRequest
+
+SCORING_CONTEXT_MAX_ENTRIES = int(os.getenv("SCORING_CONTEXT_MAX_ENTRIES", "512"))
+SCORING_CONTEXT_MAX_ITEMS = int(os.getenv("SCORING_CONTEXT_MAX_ITEMS", "20000"))
+
+
+class UnknownScoringContext(LookupError):
+    """The context token was never issued or its context has been evicted"""
+
+
+@dataclass(frozen=True)
+class ScoringContext:
+    token: str
+    request: PortfolioAnalyzeRequest
+    impacts_norm: Mapping[str, float]
+    lens_scores: Mapping[str, float]
+    coverage: float
+    spike_theme: Optional[str]
+    spike_share: float
+    gaps: Tuple[Mapping, ...]
+    portfolio_summary: Tuple[Mapping, ...]
+
+    @classmethod
+    def create(cls, token, request, impacts_norm, lens_scores, coverage, spike_theme, spike_share,
+               gaps, portfolio_summary) -> "ScoringContext":
+        """Freeze freshly computed scoring results"""
+        return cls(
+            token=token,
+            request=request.model_copy(deep=True),
+            impacts_norm=MappingProxyType(dict(impacts_norm)),
+            lens_scores=MappingProxyType(dict(lens_scores)),
+            coverage=coverage,
+            spike_theme=spike_theme,
+            spike_share=spike_share,
+            gaps=tuple(MappingProxyType(dict(g)) for g in gaps),
+            portfolio_summary=tuple(MappingProxyType(dict(s)) for s in portfolio_summary)
+        )
+
+    @property
+    def track(self) -> str:
+        return self.request.country_tracks[0] if self.request.country_tracks else "US"
+
+    @property
+    def size(self) -> int:
+        return max(1, len(self.request.portfolio))
+
+
+class ScoringContextCache:
+    """Thread-safe LRU of scoring contexts bounded by entry count and total portfolio items"""
+
+    def __init__(self, max_entries: int = SCORING_CONTEXT_MAX_ENTRIES, max_items: int = SCORING_CONTEXT_MAX_ITEMS):
+        self.max_entries = max_entries
+        self.max_items = max_items
+        self._data: OrderedDict[str, ScoringContext] = OrderedDict()
+        self._items = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, token: str) -> Optional[ScoringContext]:
+        with self._lock:
+            ctx = self._data.get(token)
+            if ctx is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(token)
+            self._hits += 1
+            return ctx
+
+    def require(self, token: str) -> ScoringContext:
+        ctx = self.get(token)
+        if ctx is None:
+            raise UnknownScoringContext(f"Unknown or expired context token: {token}")
+        return ctx
+
+    def put(self, ctx: ScoringContext) -> None:
+        if self.max_entries <= 0 or ctx.size > self.max_items:
+            return
+        with self._lock:
+            previous = self._data.pop(ctx.token, None)
+            if previous is not None:
+                self._items -= previous.size
+            self._data[ctx.token] = ctx
+            self._items += ctx.size
+            while len(self._data) > self.max_entries or self._items > self.max_items:
+                _, evicted = self._data.popitem(last=False)
+                self._items -= evicted.size
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._items = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "items": self._items,
+                "max_entries": self.max_entries,
+                "max_items": self.max_items,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+scoring_contexts = ScoringContextCache()
@@ -1,43 +1,56 @@
 from __future__ import annotations
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple, Optional
 from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import math
 import json
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
 from .models import (
     PortfolioAnalyzeRequest, RecommendationTask, Evidence, SchoolContext, StudentProfile, TestPolicy,
     TaskTemplate, TestPlanRequest, TestPlanResponse, EligibilityCheckRequest, EligibilityCheckResponse,
     CriticalImprovementSection, LensImprovementSection, DiversitySpikeSection, AlignmentPriority,
-    RegenerateTasksResponse, TestAnalysis
+    RegenerateTasksResponse, TestAnalysis, PortfolioAnalyzeResponse
 )
 from .constants import (
     ROLE_WEIGHT, AWARD_WEIGHT, FACTOR_WEIGHT, LENS_LIST, SPIKE_MIN_SHARE, LENS_MIN_SCORE, 
-    MIN_PLAYBOOKS, THEME_LEXICON, SAT_TARGET_DELTA, ACT_TARGET_DELTA
+    MIN_PLAYBOOKS, SAT_TARGET_DELTA, ACT_TARGET_DELTA
 )
-
-# Load .env file - try multiple locations
-env_paths = [
-    os.path.join(os.path.dirname(__file__), '..', '..', '..', '.env'),  # Project root
-    os.path.join(os.path.dirname(__file__), '..', '..', '.env'),  # Backend root
-    os.path.join(os.getcwd(), '.env'),  # Current working directory
-    '.env'  # Relative path
-]
-for env_path in env_paths:
-    abs_path = os.path.abspath(env_path)
-    if os.path.exists(abs_path):
-        load_dotenv(dotenv_path=abs_path)
-        break
-else:
-    # Fallback: try to find .env file
-    load_dotenv()
-
-_openai_api_key = os.getenv("OPENAI_API_KEY")
-if _openai_api_key:
-    # Remove quotes if present
-    _openai_api_key = _openai_api_key.strip().strip('"').strip("'")
-client = OpenAI(api_key=_openai_api_key) if _openai_api_key else None
+from .llm import achat_completion, chat_completion, stream_chat_completion, async_client, client
+from .deadline import Deadline, ahedge, deadline_scope, hedge
+from .circuit_breaker import llm_breaker
+from .stream_json import SectionStreamParser
+from .prompt_builder import PromptBuilder
+from .lexicon import THEME_CORPUS
+from .scoring_context import ScoringContext, UnknownScoringContext, scoring_contexts
+from .alignment import SchoolMatrix, StudentMatrix, alignment, score_standing
+from .school_sets import SharedSchools, school_sets
+from .percentiles import percentile_index
+from .etags import profile_versions
+from .singleflight import request_fingerprint
+
+# End-to-end budget for analyze_portfolio; the rule-based fallback is started
+# speculatively once less than ANALYZE_SPECULATE_SECONDS of it remain
+ANALYZE_DEADLINE_SECONDS = float(os.getenv("ANALYZE_DEADLINE_SECONDS", "20"))
+ANALYZE_SPECULATE_SECONDS = float(os.getenv("ANALYZE_SPECULATE_SECONDS", "2"))
+
+# LLM calls run here so the request thread can stop waiting when the budget runs out
+_llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_WORKER_THREADS", "8")), thread_name_prefix="portfolio-llm")
+
+STRUCTURED_SECTIONS = ("critical_improvements", "lens_improvements", "diversity_spike", "alignment_priorities")
+ANALYZE_SECTIONS = ("scores", "gaps") + STRUCTURED_SECTIONS + ("standardized_tests",)
+# Stream event emitted for each item of a structured section
+STREAM_EVENTS = {
+    "critical_improvements": "critical_improvement",
+    "lens_improvements": "lens_improvement",
+    "diversity_spike": "diversity_spike",
+    "alignment_priorities": "alignment_priority"
+}
+# Portfolio items included in prompts, picked by normalized impact
+PROMPT_PORTFOLIO_ITEMS = int(os.getenv("PROMPT_PORTFOLIO_ITEMS", "10"))
+
+StructuredSections = Tuple[List[CriticalImprovementSection], List[LensImprovementSection], Optional[DiversitySpikeSection], List[AlignmentPriority]]
 
 def _load_playbooks() -> List[dict]:
     """Load playbooks from JSON file"""
@@ -51,25 +64,27 @@ def _load_playbooks() -> List[dict]:
 def _log1p(x: float | int | None) -> float:
     return math.log1p(x or 0)
 
-def _weeks_between(start: Optional[date], end: Optional[date]) -> int:
+def _weeks_between(start: Optional[date], end: Optional[date], as_of: Optional[date] = None) -> int:
+    """Weeks from start to end; ongoing items (no end) run until as_of, today when not given"""
     if not start:
         return 1
-    e = end or date.today()
+    e = end or as_of or date.today()
     days = max(1, (e - start).days)
     return max(1, math.ceil(days / 7))
 
 def _major_match(theme_tags: List[str], intended_major: Optional[str]) -> int:
+    """1 when a tag appears in the intended major or anywhere in the theme lexicon"""
     if not intended_major or not theme_tags:
         return 0
     im = intended_major.lower()
     for t in theme_tags:
-        if t.lower() in im or any(t.lower() in " ".join(v) for v in THEME_LEXICON.values()):
+        if t.lower() in im or THEME_CORPUS.mentions(t.lower()):
             return 1
     return 0
 
-def compute_impact(ev: Evidence, intended_major: Optional[str]) -> float:
+def compute_impact(ev: Evidence, intended_major: Optional[str], as_of: Optional[date] = None) -> float:
     """Compute raw impact score per spec: 0.28×role + 0.18×log1p(people) + 0.38×log1p(hours) + 0.16×award"""
-    weeks_active = _weeks_between(ev.start_date, ev.end_date)
+    weeks_active = _weeks_between(ev.start_date, ev.end_date, as_of)
     award_weight_max = 0.0
     for a in ev.awards:
         lvl = str(a.get("level","none")).lower()
@@ -193,10 +208,58 @@ def alignment_for_school(ctx: Optional[SchoolContext], prof: Optional[StudentPro
         den += w
     return (num / den) if den > 0 else 0.0
 
+def resolve_school_contexts(req: PortfolioAnalyzeRequest, shared: Optional[SharedSchools] = None
+                            ) -> Tuple[List[Optional[SchoolContext]], SchoolMatrix]:
+    """
+    Context of each school in req.schools, with the schools compiled into one SchoolMatrix.
+
+    A school's entry in school_contexts wins over its entry in the referenced school set,
+    which wins over the shared school_context. Raises UnknownSchoolSet for an unknown set.
+    With `shared`, requests naming the same schools and contexts reuse one resolution.
+    """
+    school_set = school_sets.require(req.school_set) if req.school_set else None
+    if shared is None:
+        return _resolve_school_contexts(req, school_set)
+    # The entry keeps its school set alive, so the set's id cannot be reused while the key exists
+    key = (id(school_set), request_fingerprint(req.model_dump(mode="json", include=SharedSchools.FIELDS)))
+    entry = shared.get(key)
+    if entry is None:
+        entry = shared.put(key, (school_set, _resolve_school_contexts(req, school_set)))
+    return entry[1]
+
+def _resolve_school_contexts(req: PortfolioAnalyzeRequest, school_set) -> Tuple[List[Optional[SchoolContext]], SchoolMatrix]:
+    if school_set is not None and not req.school_contexts:
+        matrix = school_set.columns(req.schools)
+        if matrix is not None:
+            return [school_set.contexts[s] for s in req.schools], matrix
+    contexts: List[Optional[SchoolContext]] = []
+    for s in req.schools:
+        ctx = req.school_contexts.get(s)
+        if ctx is None and school_set is not None:
+            ctx = school_set.contexts.get(s)
+        contexts.append(ctx or req.school_context)
+    return contexts, SchoolMatrix.compile(req.schools, contexts)
+
+def _activity_facts(ev: Evidence, intended_major: Optional[str], as_of: Optional[date], memo: dict) -> Tuple[int, int]:
+    """Weeks active and major match of an activity, memoized by object id"""
+    facts = memo.get(id(ev))
+    if facts is None:
+        facts = memo[id(ev)] = (_weeks_between(ev.start_date, ev.end_date, as_of),
+                                _major_match(ev.theme_tags, intended_major))
+    return facts
+
 def analyze_gaps(portfolio: List[Evidence], lens_s: Dict[str, float], spike: Tuple[Optional[str], float], 
-                 ctx: Optional[SchoolContext], prof: Optional[StudentProfile], impacts_norm: Dict[str, float]) -> List[dict]:
-    """Comprehensive gap analysis per spec"""
+                 ctx: Optional[SchoolContext], prof: Optional[StudentProfile], impacts_norm: Dict[str, float],
+                 memo: Optional[dict] = None, as_of: Optional[date] = None) -> List[dict]:
+    """
+    Comprehensive gap analysis per spec.
+
+    `memo` shares per-activity facts across calls on overlapping portfolios (what-if scenarios);
+    it is keyed by object id, so the caller keeps the activities alive while it is in use.
+    """
     gaps: List[dict] = []
+    intended_major = prof.intended_major if prof else None
+    memo = {} if memo is None else memo
     
     # Lens gap: if lens_score < 4.0
     for lens, score in lens_s.items():
@@ -223,7 +286,7 @@ def analyze_gaps(portfolio: List[Evidence], lens_s: Dict[str, float], spike: Tup
     
     # Duration gap: if median weeks_active < 8
     if portfolio:
-        weeks_list = [_weeks_between(ev.start_date, ev.end_date) for ev in portfolio]
+        weeks_list = [_activity_facts(ev, intended_major, as_of, memo)[0] for ev in portfolio]
         if weeks_list:
             weeks_list.sort()
             median_weeks = weeks_list[len(weeks_list) // 2]
@@ -237,7 +300,7 @@ def analyze_gaps(portfolio: List[Evidence], lens_s: Dict[str, float], spike: Tup
         if total_impact > 0:
             major_aligned_impact = 0.0
             for ev in portfolio:
-                if _major_match(ev.theme_tags, prof.intended_major):
+                if _activity_facts(ev, intended_major, as_of, memo)[1]:
                     major_aligned_impact += impacts_norm.get(ev.id, 0.0)
             share = major_aligned_impact / total_impact
             if share < 0.3:
@@ -277,90 +340,32 @@ def _playbook_matches(playbook: dict, gaps: List[dict], lens_scores: Dict[str, f
     
     return True
 
-def _generate_gpt_recommendations(
-    req: PortfolioAnalyzeRequest,
-    gaps: List[dict],
-    spike_theme: Optional[str],
-    spike_share: float,
-    lens_scores: Dict[str, float],
-    scores: dict,
-    impacts_norm: Dict[str, float]
-) -> List[RecommendationTask]:
-    """Generate personalized recommendations using GPT API"""
-    track = req.country_tracks[0] if req.country_tracks else "US"
-    prof = req.student_profile
-    ctx = req.school_context
-    
-    # Build context for GPT
-    portfolio_summary = []
-    for ev in req.portfolio[:10]:  # Limit to top 10 for context
-        impact = impacts_norm.get(ev.id, 0.0)
-        portfolio_summary.append({
+def _portfolio_summary_lines(portfolio: List[Evidence], impacts_norm: Dict[str, float], limit: Optional[int] = None) -> List[str]:
+    """One compact JSON line per portfolio item, highest normalized impact first"""
+    ranked = sorted(portfolio, key=lambda ev: impacts_norm.get(ev.id, 0.0), reverse=True)
+    lines = []
+    for ev in ranked[:limit or PROMPT_PORTFOLIO_ITEMS]:
+        summary = {
             "title": ev.title,
             "lens": ev.lens,
             "type": ev.type,
             "role_level": ev.role_level,
             "theme_tags": ev.theme_tags,
             "area_of_activity": ev.area_of_activity,
-            "impact_score": round(impact, 2)
-        })
-    
-    # Analyze metrics to provide clear guidance
-    weak_lenses = [lens for lens, score in lens_scores.items() if score < LENS_MIN_SCORE]
-    strong_lenses = [lens for lens, score in lens_scores.items() if score >= 7.0]
-    lens_gaps = [g for g in gaps if g.get("type") == "lens"]
-    artifacts_gap = next((g for g in gaps if g.get("type") == "artifacts"), None)
-    duration_gap = next((g for g in gaps if g.get("type") == "duration"), None)
-    alignment_gap = next((g for g in gaps if g.get("type") == "alignment"), None)
-    
-    # Calculate alignment breakdown if available
-    alignment_score = scores.get('alignment', {}).get(ctx.name if ctx else '', 0) if ctx else 0
-    
-    # Identify portfolio items that need strengthening
-    weak_items = [ev for ev in req.portfolio if impacts_norm.get(ev.id, 0) < 5.0]
-    strong_items = [ev for ev in req.portfolio if impacts_norm.get(ev.id, 0) >= 7.0]
-    
-    # Build metric-driven prompt
-    prompt = f"""You are a portfolio coach. The system has calculated specific metrics showing exactly what needs improvement. Generate tasks that DIRECTLY address these calculated gaps.
-
-=== CALCULATED METRICS ANALYSIS ===
+            "impact_score": round(impacts_norm.get(ev.id, 0.0), 2)
+        }
+        lines.append(json.dumps({k: v for k, v in summary.items() if v not in (None, [], "")}, separators=(",", ":"), ensure_ascii=False))
+    return lines
 
-LENS SCORES (0-10 scale, target: ≥4.0):
-{chr(10).join([f"- {lens}: {score:.2f}/10 {'⚠️ BELOW TARGET' if score < LENS_MIN_SCORE else '✓ Strong'}" for lens, score in sorted(lens_scores.items(), key=lambda x: x[1])])}
-
-CRITICAL GAPS REQUIRING ACTION:
-{chr(10).join([f"1. {gap['type'].upper()} GAP: {gap.get('lens', gap.get('severity', 'N/A'))} - Severity: {gap['severity']:.2f}" for gap in sorted(gaps, key=lambda x: x.get('severity', 0), reverse=True)[:5]])}
-
-SPIKE ANALYSIS:
-- Current spike: {spike_theme if spike_theme else 'NONE DETECTED'}
-- Spike share: {spike_share:.1%} ({spike_share:.3f}) {'⚠️ NEEDS BUILDING' if not spike_theme or spike_share < SPIKE_MIN_SHARE else '✓ Strong'}
-- Target: ≥35% concentration in one theme
-
-COVERAGE INDEX: {scores.get('coverage', 0):.3f} (target: >0.7, max: 1.0)
-- {'⚠️ Too concentrated in few lenses' if scores.get('coverage', 0) < 0.6 else '✓ Good diversity'}
-
-ALIGNMENT WITH {ctx.name if ctx else 'SCHOOL'}:
-- Overall alignment: {alignment_score:.1%} {'⚠️ Needs improvement' if alignment_score < 0.6 else '✓ Good'}
-- School priorities: {json.dumps(ctx.factor_importance, indent=2) if ctx and ctx.factor_importance else 'Not specified'}
-
-=== PORTFOLIO ITEMS NEEDING ATTENTION ===
-
-Weak Items (impact < 5.0, need strengthening):
-{chr(10).join([f"- {ev.title} ({ev.lens} lens, impact: {impacts_norm.get(ev.id, 0):.2f}): Needs {'artifacts' if not ev.artifact_links else 'more impact'}" for ev in weak_items[:5]])}
-
-Strong Items (can leverage):
-{chr(10).join([f"- {ev.title} ({ev.lens} lens, impact: {impacts_norm.get(ev.id, 0):.2f})" for ev in strong_items[:3]])}
-
-=== STUDENT CONTEXT ===
-- Grade: {prof.current_grade if prof else 'N/A'}, Major: {prof.intended_major if prof else 'N/A'}
-- Weekly hours available: {req.weekly_hours_cap}h/week
-- GPA: {prof.gpa_unweighted if prof and prof.gpa_unweighted else 'N/A'}/4.0
+# Static parts of the metric-driven recommendation prompt; kept ahead of per-request data for prefix caching
+RECOMMENDATIONS_SYSTEM_PROMPT = "You are an expert college admissions portfolio coach. You MUST generate tasks that directly address calculated metrics (lens scores, gaps, alignment). Each task must reference specific metrics and show how it will improve them. Return a JSON object with a 'recommendations' key containing an array of RecommendationTask objects. Each task must have: title (string), estimated_hours (integer), definition_of_done (array of 3-5 specific steps), micro_coaching (string explaining which metric this improves), quick_links (array, can be empty)."
+RECOMMENDATIONS_INSTRUCTIONS = """You are a portfolio coach. The system has calculated specific metrics showing exactly what needs improvement; they follow these instructions. Generate tasks that DIRECTLY address these calculated gaps.
 
 === TASK GENERATION INSTRUCTIONS ===
 
-Generate 6-8 SPECIFIC tasks that DIRECTLY address the calculated metrics above. For EACH task:
+Generate 6-8 SPECIFIC tasks that DIRECTLY address the calculated metrics below. For EACH task:
 
-1. REFERENCE THE SPECIFIC METRIC: "Your {weak_lenses[0]} lens score is {lens_scores.get(weak_lenses[0] if weak_lenses else '', 0):.2f}/10. To reach 4.0+, you need..."
+1. REFERENCE THE SPECIFIC METRIC: "Your <lens> lens score is <score>/10. To reach 4.0+, you need..."
 
 2. ADDRESS THE HIGHEST SEVERITY GAPS FIRST:
    - If lens gap exists: Create task to build that specific lens (e.g., "Leadership lens is 2.5/10 → organize event")
@@ -380,7 +385,7 @@ Generate 6-8 SPECIFIC tasks that DIRECTLY address the calculated metrics above.
 6. MAKE IT ACTIONABLE: Each task should have clear, measurable steps that directly improve the calculated metric
 
 EXAMPLE GOOD TASK:
-{{
+{
   "title": "Strengthen Achievements lens: Enter 2 competitions aligned with your AI/ML theme",
   "estimated_hours": 15,
   "definition_of_done": [
@@ -391,48 +396,92 @@ EXAMPLE GOOD TASK:
   ],
   "micro_coaching": "Your Achievements lens is 0.0/10. Your ML project is strong (impact 8.5) but needs recognition. Competitions will boost this lens to 4.0+ and align with your AI spike theme.",
   "quick_links": []
-}}
+}
 
 BAD TASK (too generic):
-{{
+{
   "title": "Improve portfolio",
   "estimated_hours": 10,
   "definition_of_done": ["Work on activities", "Add more items"],
   "micro_coaching": "Make your portfolio better"
-}}
+}
 
 === REQUIRED OUTPUT ===
-Return JSON: {{"recommendations": [{{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}}, ...]}}
+Return JSON: {"recommendations": [{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}, ...]}
 
 Each task MUST:
 - Reference specific calculated metrics (lens scores, gaps, alignment)
 - Address the highest severity gaps first
 - Be personalized to their actual portfolio items
-- Have measurable outcomes that will improve the metrics"""
+- Have measurable outcomes that will improve the metrics
+
+Return your response as: {"recommendations": [{"title": "...", "estimated_hours": 10, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}, ...]}"""
+
+def _generate_gpt_recommendations(
+    req: PortfolioAnalyzeRequest,
+    gaps: List[dict],
+    spike_theme: Optional[str],
+    spike_share: float,
+    lens_scores: Dict[str, float],
+    scores: dict,
+    impacts_norm: Dict[str, float]
+) -> List[RecommendationTask]:
+    """Generate personalized recommendations using GPT API"""
+    track = req.country_tracks[0] if req.country_tracks else "US"
+    prof = req.student_profile
+    ctx = req.school_context
+    
+    # Analyze metrics to provide clear guidance
+    alignment_score = scores.get('alignment', {}).get(ctx.name if ctx else '', 0) if ctx else 0
+    
+    # Identify portfolio items that need strengthening
+    weak_items = sorted((ev for ev in req.portfolio if impacts_norm.get(ev.id, 0) < 5.0), key=lambda ev: impacts_norm.get(ev.id, 0))
+    strong_items = sorted((ev for ev in req.portfolio if impacts_norm.get(ev.id, 0) >= 7.0), key=lambda ev: impacts_norm.get(ev.id, 0), reverse=True)
+    
+    # Static instructions first, then the calculated metrics for this student
+    builder = PromptBuilder("portfolio.recommendations").system(RECOMMENDATIONS_SYSTEM_PROMPT).instructions(RECOMMENDATIONS_INSTRUCTIONS)
+    builder.section("CALCULATED METRICS ANALYSIS", f"""LENS SCORES (0-10 scale, target: ≥4.0):
+{chr(10).join([f"- {lens}: {score:.2f}/10 {'⚠️ BELOW TARGET' if score < LENS_MIN_SCORE else '✓ Strong'}" for lens, score in sorted(lens_scores.items(), key=lambda x: x[1])])}
+
+CRITICAL GAPS REQUIRING ACTION:
+{chr(10).join([f"1. {gap['type'].upper()} GAP: {gap.get('lens', gap.get('severity', 'N/A'))} - Severity: {gap['severity']:.2f}" for gap in sorted(gaps, key=lambda x: x.get('severity', 0), reverse=True)[:5]])}
+
+SPIKE ANALYSIS:
+- Current spike: {spike_theme if spike_theme else 'NONE DETECTED'}
+- Spike share: {spike_share:.1%} ({spike_share:.3f}) {'⚠️ NEEDS BUILDING' if not spike_theme or spike_share < SPIKE_MIN_SHARE else '✓ Strong'}
+- Target: ≥35% concentration in one theme
+
+COVERAGE INDEX: {scores.get('coverage', 0):.3f} (target: >0.7, max: 1.0)
+- {'⚠️ Too concentrated in few lenses' if scores.get('coverage', 0) < 0.6 else '✓ Good diversity'}
+
+ALIGNMENT WITH {ctx.name if ctx else 'SCHOOL'}:
+- Overall alignment: {alignment_score:.1%} {'⚠️ Needs improvement' if alignment_score < 0.6 else '✓ Good'}
+- School priorities: {json.dumps(ctx.factor_importance, separators=(",", ":")) if ctx and ctx.factor_importance else 'Not specified'}""")
+    builder.section("WEAK PORTFOLIO ITEMS (impact < 5.0, need strengthening)",
+                    items=[f"- {ev.title} ({ev.lens} lens, impact: {impacts_norm.get(ev.id, 0):.2f}): Needs {'artifacts' if not ev.artifact_links else 'more impact'}" for ev in weak_items[:5]],
+                    min_items=1, priority=1)
+    builder.section("STRONG PORTFOLIO ITEMS (can leverage)",
+                    items=[f"- {ev.title} ({ev.lens} lens, impact: {impacts_norm.get(ev.id, 0):.2f})" for ev in strong_items[:3]],
+                    min_items=1)
+    builder.section("STUDENT CONTEXT", f"""- Grade: {prof.current_grade if prof else 'N/A'}, Major: {prof.intended_major if prof else 'N/A'}
+- Weekly hours available: {req.weekly_hours_cap}h/week
+- GPA: {prof.gpa_unweighted if prof and prof.gpa_unweighted else 'N/A'}/4.0""")
+    messages = builder.build()
 
     # Check if OpenAI client is available
-    if not client or not _openai_api_key:
+    if not client:
         # Fallback to rule-based if API key not configured
         return _get_fallback_recommendations(track, gaps, spike_theme, ctx)
     
     try:
-        response = client.chat.completions.create(
+        result_text = chat_completion(
+            client, "portfolio.recommendations",
             model="gpt-4o-mini",  # or "gpt-4" for better quality
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert college admissions portfolio coach. You MUST generate tasks that directly address calculated metrics (lens scores, gaps, alignment). Each task must reference specific metrics and show how it will improve them. Return a JSON object with a 'recommendations' key containing an array of RecommendationTask objects. Each task must have: title (string), estimated_hours (integer), definition_of_done (array of 3-5 specific steps), micro_coaching (string explaining which metric this improves), quick_links (array, can be empty)."
-                },
-                {
-                    "role": "user",
-                    "content": prompt + "\n\nReturn your response as: {\"recommendations\": [{\"title\": \"...\", \"estimated_hours\": 10, \"definition_of_done\": [...], \"micro_coaching\": \"...\", \"quick_links\": []}, ...]}"
-                }
-            ],
+            messages=messages,
             response_format={"type": "json_object"},
             temperature=0.3  # Lower temperature for more focused, metric-driven responses
         )
         
-        result_text = response.choices[0].message.content
         result_json = json.loads(result_text)
         
         # Handle both {"recommendations": [...]} and [...] formats
@@ -535,6 +584,11 @@ def synthesize_recommendations(req: PortfolioAnalyzeRequest, gaps: List[dict], s
     spike_share = scores.get("spike", {}).get("share", 0.0) if isinstance(scores.get("spike"), dict) else 0.0
     return _generate_gpt_recommendations(req, gaps, spike_theme, spike_share, lens_scores, scores, impacts_norm)
 
+def _lenses_to_improve(lens_scores: Dict[str, float]) -> List[str]:
+    """Lenses that are not gaps but still below 7.0"""
+    return [lens for lens, score in lens_scores.items() 
+            if score >= LENS_MIN_SCORE and score < 7.0]
+
 def _generate_structured_recommendations(
     req: PortfolioAnalyzeRequest,
     gaps: List[dict],
@@ -543,66 +597,100 @@ def _generate_structured_recommendations(
     lens_scores: Dict[str, float],
     scores: dict,
     impacts_norm: Dict[str, float],
-    coverage: float
-) -> Tuple[List[CriticalImprovementSection], List[LensImprovementSection], Optional[DiversitySpikeSection], List[AlignmentPriority]]:
-    """Generate structured recommendations organized by gaps, lens improvements, diversity/spike, and alignment"""
+    coverage: float,
+    deadline: Optional[Deadline] = None,
+    wanted: Sequence[str] = STRUCTURED_SECTIONS
+) -> Tuple[StructuredSections, Dict[str, str], Optional[str]]:
+    """
+    Generate structured recommendations organized by gaps, lens improvements, diversity/spike, and alignment.
+
+    The LLM call runs against `deadline`; once less than ANALYZE_SPECULATE_SECONDS remain the
+    rule-based fallback is computed speculatively and used unless the LLM answers in time.
+    Returns the sections, the source of each `wanted` section ("llm" or "fallback") and the fallback reason.
+    """
     track = req.country_tracks[0] if req.country_tracks else "US"
-    prof = req.student_profile
     ctx = req.school_context
-    
-    # Build portfolio context
-    portfolio_summary = []
-    for ev in req.portfolio[:10]:
-        impact = impacts_norm.get(ev.id, 0.0)
-        portfolio_summary.append({
-            "title": ev.title,
-            "lens": ev.lens,
-            "type": ev.type,
-            "role_level": ev.role_level,
-            "theme_tags": ev.theme_tags,
-            "area_of_activity": ev.area_of_activity,
-            "impact_score": round(impact, 2)
-        })
-    
-    # Identify lenses that could improve (not in gaps but below 7.0)
-    lenses_to_improve = [lens for lens, score in lens_scores.items() 
-                        if score >= LENS_MIN_SCORE and score < 7.0]
-    
-    # Check if diversity/spike needs improvement
-    needs_diversity_improvement = coverage < 0.6 or not spike_theme or spike_share < SPIKE_MIN_SHARE
-    
-    # Build comprehensive prompt for structured generation
-    prompt = f"""You are a portfolio coach. Generate structured, specific tasks organized by category.
+    lenses_to_improve = _lenses_to_improve(lens_scores)
 
-=== PORTFOLIO CONTEXT ===
-{json.dumps(portfolio_summary, indent=2)}
-
-=== LENS SCORES (0-10 scale, target: ≥4.0) ===
-{chr(10).join([f"- {lens}: {score:.2f}/10" for lens, score in sorted(lens_scores.items(), key=lambda x: x[1])])}
+    def fallback() -> StructuredSections:
+        return _get_structured_fallback(gaps, lens_scores, lenses_to_improve, spike_theme, spike_share, coverage, scores, track, ctx)
 
-=== CRITICAL GAPS (need immediate attention) ===
-{chr(10).join([f"{i+1}. {gap['type'].upper()} GAP: {gap.get('lens', 'N/A')} - Severity: {gap['severity']:.2f}" for i, gap in enumerate(sorted(gaps, key=lambda x: x.get('severity', 0), reverse=True))])}
+    if not client:
+        # Fallback to rule-based structured recommendations
+        return fallback(), {name: "fallback" for name in wanted}, "llm_unavailable"
+    if llm_breaker.is_open:
+        return fallback(), {name: "fallback" for name in wanted}, "circuit_open"
+
+    deadline = deadline or Deadline(ANALYZE_DEADLINE_SECONDS)
+    with deadline_scope(deadline):
+        future = _llm_executor.submit(
+            contextvars.copy_context().run, _request_structured_recommendations,
+            req, gaps, spike_theme, spike_share, lens_scores, scores, impacts_norm, coverage
+        )
+    result, source = hedge(future, fallback, deadline, ANALYZE_SPECULATE_SECONDS)
+    return _merge_structured_sections(result, source, wanted, fallback)
 
-=== LENSES THAT COULD IMPROVE (above 4.0 but below 7.0) ===
-{chr(10).join([f"- {lens}: {lens_scores[lens]:.2f}/10" for lens in lenses_to_improve]) if lenses_to_improve else "None - all strong lenses are already at 7.0+"}
+async def _agenerate_structured_recommendations(
+    req: PortfolioAnalyzeRequest,
+    gaps: List[dict],
+    spike_theme: Optional[str],
+    spike_share: float,
+    lens_scores: Dict[str, float],
+    scores: dict,
+    impacts_norm: Dict[str, float],
+    coverage: float,
+    deadline: Optional[Deadline] = None,
+    wanted: Sequence[str] = STRUCTURED_SECTIONS
+) -> Tuple[StructuredSections, Dict[str, str], Optional[str]]:
+    """_generate_structured_recommendations on the AsyncOpenAI client; the LLM call holds no thread"""
+    track = req.country_tracks[0] if req.country_tracks else "US"
+    ctx = req.school_context
+    lenses_to_improve = _lenses_to_improve(lens_scores)
 
-=== SPIKE & DIVERSITY ANALYSIS ===
-- Current spike: {spike_theme if spike_theme else 'NONE DETECTED'}
-- Spike share: {spike_share:.1%} (target: ≥35%)
-- Coverage index: {coverage:.3f} (target: >0.7)
-- Needs improvement: {'YES' if needs_diversity_improvement else 'NO'}
+    def fallback() -> StructuredSections:
+        return _get_structured_fallback(gaps, lens_scores, lenses_to_improve, spike_theme, spike_share, coverage, scores, track, ctx)
 
-=== ALIGNMENT SCORES ===
-{chr(10).join([f"- {school}: {score:.1%}" for school, score in scores.get('alignment', {}).items()])}
+    if not async_client:
+        return fallback(), {name: "fallback" for name in wanted}, "llm_unavailable"
+    if llm_breaker.is_open:
+        return fallback(), {name: "fallback" for name in wanted}, "circuit_open"
 
-=== SCHOOL PRIORITIES ===
-{json.dumps(ctx.factor_importance, indent=2) if ctx and ctx.factor_importance else 'Not specified'}
+    deadline = deadline or Deadline(ANALYZE_DEADLINE_SECONDS)
+    with deadline_scope(deadline):
+        # The task copies the current context, deadline included
+        task = asyncio.ensure_future(_arequest_structured_recommendations(
+            req, gaps, spike_theme, spike_share, lens_scores, scores, impacts_norm, coverage
+        ))
+    result, source = await ahedge(task, fallback, deadline, ANALYZE_SPECULATE_SECONDS)
+    return _merge_structured_sections(result, source, wanted, fallback)
+
+def _merge_structured_sections(result, source: str, wanted: Sequence[str], fallback
+                               ) -> Tuple[StructuredSections, Dict[str, str], Optional[str]]:
+    """Sections, per-section provenance and fallback reason from the outcome of a hedged LLM call"""
+    if source != "primary":
+        return result, {name: "fallback" for name in wanted}, ("deadline" if source == "deadline" else "llm_error")
+
+    # Wanted sections the model left empty are filled from the rule-based output
+    rule_based = None
+    merged, provenance = [], {}
+    for i, (name, section) in enumerate(zip(STRUCTURED_SECTIONS, result)):
+        if name not in wanted:
+            merged.append(section)
+            continue
+        if not section:
+            rule_based = rule_based or fallback()
+            replacement = rule_based[i]
+            if replacement:
+                merged.append(replacement)
+                provenance[name] = "fallback"
+                continue
+        merged.append(section)
+        provenance[name] = "llm"
+    return tuple(merged), provenance, ("llm_incomplete" if "fallback" in provenance.values() else None)
 
-=== STUDENT CONTEXT ===
-- Grade: {prof.current_grade if prof else 'N/A'}
-- Major: {prof.intended_major if prof else 'N/A'}
-- Weekly hours: {req.weekly_hours_cap}h/week
-- GPA: {prof.gpa_unweighted if prof and prof.gpa_unweighted else 'N/A'}/4.0
+# Static parts of the structured-recommendation prompt; kept ahead of per-request data for prefix caching
+STRUCTURED_SYSTEM_PROMPT = "You are an expert college admissions portfolio coach. Generate structured, specific tasks organized by gaps, lens improvements, diversity/spike, and alignment priorities. Each gap must have exactly 3 tasks. Each lens improvement must have exactly 3 tasks. Return valid JSON matching the specified structure."
+STRUCTURED_INSTRUCTIONS = """You are a portfolio coach. Generate structured, specific tasks organized by category, using the student data that follows these instructions.
 
 === TASK GENERATION REQUIREMENTS ===
 
@@ -628,49 +716,49 @@ def _generate_structured_recommendations(
 
 === OUTPUT FORMAT ===
 Return JSON with this exact structure:
-{{
+{
   "critical_improvements": [
-    {{
+    {
       "gap_type": "lens",
       "gap_description": "Achievements lens is 0.0/10 (target: ≥4.0)",
       "severity": 1.0,
       "tasks": [
-        {{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}},
-        {{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}},
-        {{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}}
+        {"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []},
+        {"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []},
+        {"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}
       ]
-    }}
+    }
   ],
   "lens_improvements": [
-    {{
+    {
       "lens": "Leadership",
       "current_score": 6.72,
       "improvement_opportunity": "Strong but can reach 8.0+ with focused effort",
       "tasks": [
-        {{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}},
-        {{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}},
-        {{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}}
+        {"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []},
+        {"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []},
+        {"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}
       ]
-    }}
+    }
   ],
-  "diversity_spike": {{
+  "diversity_spike": {
     "has_spike": true,
     "spike_theme": "education",
     "spike_share": 0.375,
     "coverage_index": 0.786,
     "needs_improvement": false,
     "tasks": []
-  }},
+  },
   "alignment_priorities": [
-    {{
+    {
       "school_name": "Georgia Tech",
       "alignment_score": 0.605,
       "is_high_alignment": true,
       "priority_tasks": ["Task title 1", "Task title 2"],
       "alignment_notes": "High alignment. Focus on tasks that perfect alignment by emphasizing rigor and GPA."
-    }}
+    }
   ]
-}}
+}
 
 IMPORTANT: 
 - Generate EXACTLY 3 tasks per gap
@@ -679,121 +767,180 @@ IMPORTANT:
 - Make tasks practical and realistic
 - Priority tasks in alignment_priorities should reference actual task titles from above"""
 
-    if not client or not _openai_api_key:
-        # Fallback to rule-based structured recommendations
-        return _get_structured_fallback(gaps, lens_scores, lenses_to_improve, spike_theme, spike_share, coverage, scores, track, ctx)
+def _structured_recommendation_messages(
+    req: PortfolioAnalyzeRequest,
+    gaps: List[dict],
+    spike_theme: Optional[str],
+    spike_share: float,
+    lens_scores: Dict[str, float],
+    scores: dict,
+    impacts_norm: Dict[str, float],
+    coverage: float
+) -> List[dict]:
+    """Chat messages asking for structured recommendations, compacted to the prompt token budget"""
+    prof = req.student_profile
+    ctx = req.school_context
+    
+    # Identify lenses that could improve (not in gaps but below 7.0)
+    lenses_to_improve = _lenses_to_improve(lens_scores)
     
+    # Check if diversity/spike needs improvement
+    needs_diversity_improvement = coverage < 0.6 or not spike_theme or spike_share < SPIKE_MIN_SHARE
+    
+    ranked_gaps = sorted(gaps, key=lambda x: x.get('severity', 0), reverse=True)
+    builder = PromptBuilder("portfolio.structured").system(STRUCTURED_SYSTEM_PROMPT).instructions(STRUCTURED_INSTRUCTIONS)
+    builder.section("PORTFOLIO CONTEXT (highest impact first)", items=_portfolio_summary_lines(req.portfolio, impacts_norm), min_items=3)
+    builder.section("LENS SCORES (0-10 scale, target: ≥4.0)",
+                    "\n".join([f"- {lens}: {score:.2f}/10" for lens, score in sorted(lens_scores.items(), key=lambda x: x[1])]))
+    builder.section("CRITICAL GAPS (need immediate attention)",
+                    items=[f"{i+1}. {gap['type'].upper()} GAP: {gap.get('lens', 'N/A')} - Severity: {gap['severity']:.2f}" for i, gap in enumerate(ranked_gaps)],
+                    min_items=3, priority=1)
+    builder.section("LENSES THAT COULD IMPROVE (above 4.0 but below 7.0)",
+                    "\n".join([f"- {lens}: {lens_scores[lens]:.2f}/10" for lens in lenses_to_improve]) if lenses_to_improve else "None - all strong lenses are already at 7.0+")
+    builder.section("SPIKE & DIVERSITY ANALYSIS", f"""- Current spike: {spike_theme if spike_theme else 'NONE DETECTED'}
+- Spike share: {spike_share:.1%} (target: ≥35%)
+- Coverage index: {coverage:.3f} (target: >0.7)
+- Needs improvement: {'YES' if needs_diversity_improvement else 'NO'}""")
+    builder.section("ALIGNMENT SCORES", items=[f"- {school}: {score:.1%}" for school, score in scores.get('alignment', {}).items()],
+                    min_items=1, priority=2)
+    builder.section("SCHOOL PRIORITIES", json.dumps(ctx.factor_importance, separators=(",", ":")) if ctx and ctx.factor_importance else 'Not specified')
+    builder.section("STUDENT CONTEXT", f"""- Grade: {prof.current_grade if prof else 'N/A'}
+- Major: {prof.intended_major if prof else 'N/A'}
+- Weekly hours: {req.weekly_hours_cap}h/week
+- GPA: {prof.gpa_unweighted if prof and prof.gpa_unweighted else 'N/A'}/4.0""")
+    return builder.build()
+
+def _parse_tasks(items: List[dict], track: str) -> List[RecommendationTask]:
+    tasks = []
+    for task_data in items:
+        try:
+            tasks.append(RecommendationTask(
+                title=task_data.get("title", ""),
+                track=track,
+                estimated_hours=int(task_data.get("estimated_hours", 3)),
+                definition_of_done=task_data.get("definition_of_done", []),
+                micro_coaching=task_data.get("micro_coaching", ""),
+                quick_links=task_data.get("quick_links", [])
+            ))
+        except:
+            continue
+    return tasks
+
+def _parse_critical_improvement(ci_data: dict, track: str) -> Optional[CriticalImprovementSection]:
+    tasks = _parse_tasks(ci_data.get("tasks", []), track)
+    if not tasks:
+        return None
+    return CriticalImprovementSection(
+        gap_type=ci_data.get("gap_type", ""),
+        gap_description=ci_data.get("gap_description", ""),
+        severity=float(ci_data.get("severity", 0)),
+        tasks=tasks[:3]  # Ensure exactly 3
+    )
+
+def _parse_lens_improvement(li_data: dict, track: str) -> Optional[LensImprovementSection]:
+    tasks = _parse_tasks(li_data.get("tasks", []), track)
+    if not tasks:
+        return None
+    return LensImprovementSection(
+        lens=li_data.get("lens", ""),
+        current_score=float(li_data.get("current_score", 0)),
+        improvement_opportunity=li_data.get("improvement_opportunity", ""),
+        tasks=tasks[:3]  # Ensure exactly 3
+    )
+
+def _parse_diversity_spike(ds_data: dict, track: str) -> Optional[DiversitySpikeSection]:
+    if not ds_data:
+        return None
+    ds_tasks = _parse_tasks(ds_data.get("tasks", []), track)
+    return DiversitySpikeSection(
+        has_spike=ds_data.get("has_spike", False),
+        spike_theme=ds_data.get("spike_theme"),
+        spike_share=ds_data.get("spike_share"),
+        coverage_index=float(ds_data.get("coverage_index", 0)),
+        needs_improvement=ds_data.get("needs_improvement", False),
+        tasks=ds_tasks[:3] if ds_tasks else []
+    )
+
+def _parse_alignment_priority(ap_data: dict, track: str) -> AlignmentPriority:
+    return AlignmentPriority(
+        school_name=ap_data.get("school_name", ""),
+        alignment_score=float(ap_data.get("alignment_score", 0)),
+        is_high_alignment=ap_data.get("is_high_alignment", False),
+        priority_tasks=ap_data.get("priority_tasks", []),
+        alignment_notes=ap_data.get("alignment_notes", "")
+    )
+
+# Top-level key of the structured completion -> parser for one of its items
+SECTION_PARSERS = {
+    "critical_improvements": _parse_critical_improvement,
+    "lens_improvements": _parse_lens_improvement,
+    "diversity_spike": _parse_diversity_spike,
+    "alignment_priorities": _parse_alignment_priority
+}
+
+def _request_structured_recommendations(
+    req: PortfolioAnalyzeRequest,
+    gaps: List[dict],
+    spike_theme: Optional[str],
+    spike_share: float,
+    lens_scores: Dict[str, float],
+    scores: dict,
+    impacts_norm: Dict[str, float],
+    coverage: float
+) -> StructuredSections:
+    """Ask the LLM for structured recommendations; raises if the call or parsing fails"""
+    track = req.country_tracks[0] if req.country_tracks else "US"
+    messages = _structured_recommendation_messages(req, gaps, spike_theme, spike_share, lens_scores, scores, impacts_norm, coverage)
     try:
-        response = client.chat.completions.create(
+        result_text = chat_completion(
+            client, "portfolio.structured",
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert college admissions portfolio coach. Generate structured, specific tasks organized by gaps, lens improvements, diversity/spike, and alignment priorities. Each gap must have exactly 3 tasks. Each lens improvement must have exactly 3 tasks. Return valid JSON matching the specified structure."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            messages=messages,
             response_format={"type": "json_object"},
             temperature=0.3
         )
-        
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        # Parse critical improvements
-        critical_improvements = []
-        for ci_data in result_json.get("critical_improvements", []):
-            tasks = []
-            for task_data in ci_data.get("tasks", []):
-                try:
-                    tasks.append(RecommendationTask(
-                        title=task_data.get("title", ""),
-                        track=track,
-                        estimated_hours=int(task_data.get("estimated_hours", 3)),
-                        definition_of_done=task_data.get("definition_of_done", []),
-                        micro_coaching=task_data.get("micro_coaching", ""),
-                        quick_links=task_data.get("quick_links", [])
-                    ))
-                except:
-                    continue
-            if tasks:
-                critical_improvements.append(CriticalImprovementSection(
-                    gap_type=ci_data.get("gap_type", ""),
-                    gap_description=ci_data.get("gap_description", ""),
-                    severity=float(ci_data.get("severity", 0)),
-                    tasks=tasks[:3]  # Ensure exactly 3
-                ))
-        
-        # Parse lens improvements
-        lens_improvements = []
-        for li_data in result_json.get("lens_improvements", []):
-            tasks = []
-            for task_data in li_data.get("tasks", []):
-                try:
-                    tasks.append(RecommendationTask(
-                        title=task_data.get("title", ""),
-                        track=track,
-                        estimated_hours=int(task_data.get("estimated_hours", 3)),
-                        definition_of_done=task_data.get("definition_of_done", []),
-                        micro_coaching=task_data.get("micro_coaching", ""),
-                        quick_links=task_data.get("quick_links", [])
-                    ))
-                except:
-                    continue
-            if tasks:
-                lens_improvements.append(LensImprovementSection(
-                    lens=li_data.get("lens", ""),
-                    current_score=float(li_data.get("current_score", 0)),
-                    improvement_opportunity=li_data.get("improvement_opportunity", ""),
-                    tasks=tasks[:3]  # Ensure exactly 3
-                ))
-        
-        # Parse diversity/spike
-        ds_data = result_json.get("diversity_spike", {})
-        diversity_spike = None
-        if ds_data:
-            ds_tasks = []
-            for task_data in ds_data.get("tasks", []):
-                try:
-                    ds_tasks.append(RecommendationTask(
-                        title=task_data.get("title", ""),
-                        track=track,
-                        estimated_hours=int(task_data.get("estimated_hours", 3)),
-                        definition_of_done=task_data.get("definition_of_done", []),
-                        micro_coaching=task_data.get("micro_coaching", ""),
-                        quick_links=task_data.get("quick_links", [])
-                    ))
-                except:
-                    continue
-            diversity_spike = DiversitySpikeSection(
-                has_spike=ds_data.get("has_spike", False),
-                spike_theme=ds_data.get("spike_theme"),
-                spike_share=ds_data.get("spike_share"),
-                coverage_index=float(ds_data.get("coverage_index", 0)),
-                needs_improvement=ds_data.get("needs_improvement", False),
-                tasks=ds_tasks[:3] if ds_tasks else []
-            )
-        
-        # Parse alignment priorities
-        alignment_priorities = []
-        for ap_data in result_json.get("alignment_priorities", []):
-            alignment_priorities.append(AlignmentPriority(
-                school_name=ap_data.get("school_name", ""),
-                alignment_score=float(ap_data.get("alignment_score", 0)),
-                is_high_alignment=ap_data.get("is_high_alignment", False),
-                priority_tasks=ap_data.get("priority_tasks", []),
-                alignment_notes=ap_data.get("alignment_notes", "")
-            ))
-        
-        return critical_improvements, lens_improvements, diversity_spike, alignment_priorities
-        
+        return _parse_structured_recommendations(result_text, track)
     except Exception as e:
         import logging
         logging.warning(f"GPT structured recommendations failed: {e}. Using fallback.")
-        return _get_structured_fallback(gaps, lens_scores, lenses_to_improve, spike_theme, spike_share, coverage, scores, track, ctx)
+        raise
+
+async def _arequest_structured_recommendations(
+    req: PortfolioAnalyzeRequest,
+    gaps: List[dict],
+    spike_theme: Optional[str],
+    spike_share: float,
+    lens_scores: Dict[str, float],
+    scores: dict,
+    impacts_norm: Dict[str, float],
+    coverage: float
+) -> StructuredSections:
+    """Async counterpart of _request_structured_recommendations"""
+    track = req.country_tracks[0] if req.country_tracks else "US"
+    messages = _structured_recommendation_messages(req, gaps, spike_theme, spike_share, lens_scores, scores, impacts_norm, coverage)
+    try:
+        result_text = await achat_completion(
+            async_client, "portfolio.structured",
+            model="gpt-4o-mini",
+            messages=messages,
+            response_format={"type": "json_object"},
+            temperature=0.3
+        )
+        return _parse_structured_recommendations(result_text, track)
+    except Exception as e:
+        import logging
+        logging.warning(f"GPT structured recommendations failed: {e}. Using fallback.")
+        raise
+
+def _parse_structured_recommendations(result_text: str, track: str) -> StructuredSections:
+    result_json = json.loads(result_text)
+
+    critical_improvements = [ci for ci in (_parse_critical_improvement(d, track) for d in result_json.get("critical_improvements", [])) if ci]
+    lens_improvements = [li for li in (_parse_lens_improvement(d, track) for d in result_json.get("lens_improvements", [])) if li]
+    diversity_spike = _parse_diversity_spike(result_json.get("diversity_spike", {}), track)
+    alignment_priorities = [_parse_alignment_priority(d, track) for d in result_json.get("alignment_priorities", [])]
+
+    return critical_improvements, lens_improvements, diversity_spike, alignment_priorities
 
 def _get_structured_fallback(
     gaps: List[dict],
@@ -805,7 +952,7 @@ def _get_structured_fallback(
     scores: dict,
     track: str,
     ctx: Optional[SchoolContext]
-) -> Tuple[List[CriticalImprovementSection], List[LensImprovementSection], Optional[DiversitySpikeSection], List[AlignmentPriority]]:
+) -> StructuredSections:
     """Fallback structured recommendations if GPT fails"""
     critical_improvements = []
     lens_improvements = []
@@ -992,21 +1139,17 @@ def to_task_templates(recs: List[RecommendationTask], req: PortfolioAnalyzeReque
         ))
     return tasks
 
-def analyze_portfolio(req: PortfolioAnalyzeRequest) -> dict:
-    prof = req.student_profile
-    impacts_raw: Dict[str, float] = {}
-    for ev in req.portfolio:
-        impacts_raw[ev.id] = compute_impact(ev, prof.intended_major if prof else None)
+def _portfolio_metrics(portfolio: List[Evidence], impacts_raw: Dict[str, float]):
+    """Normalized impacts, lens scores, coverage and spike from raw impacts"""
     impacts_norm = normalize_impacts(impacts_raw) if impacts_raw else {}
-    lens_s = lens_scores(req.portfolio, impacts_norm) if impacts_norm else {k:0.0 for k in LENS_LIST}
+    lens_s = lens_scores(portfolio, impacts_norm) if impacts_norm else {k:0.0 for k in LENS_LIST}
     coverage = coverage_index(lens_s) if sum(lens_s.values())>0 else 0.0
-    spike_theme, spike_share = detect_spike(req.portfolio, impacts_norm)
-
-    align_map: Dict[str, float] = {}
-    for s in req.schools:
-        align_map[s] = alignment_for_school(req.school_context, prof, lens_s) if req.school_context and prof else 0.0
+    spike_theme, spike_share = detect_spike(portfolio, impacts_norm)
+    return impacts_norm, lens_s, coverage, spike_theme, spike_share
 
-    scores = {
+def _scores_view(impacts_norm: Dict[str, float], lens_s: Dict[str, float], coverage: float,
+                 spike_theme: Optional[str], spike_share: float, align_map: Dict[str, float]) -> dict:
+    return {
         "impact_total": round(sum(impacts_norm.values()), 2),
         "lens_scores": {k: round(v,2) for k,v in lens_s.items()},
         "coverage": round(coverage, 3),
@@ -1014,75 +1157,325 @@ def analyze_portfolio(req: PortfolioAnalyzeRequest) -> dict:
         "alignment": {k: round(v,3) for k,v in align_map.items()}
     }
 
-    gaps = analyze_gaps(req.portfolio, lens_s, (spike_theme, spike_share), req.school_context, prof, impacts_norm)
-    
-    # Generate structured recommendations (3 tasks per section)
-    critical_improvements, lens_improvements, diversity_spike, alignment_priorities = _generate_structured_recommendations(
-        req, gaps, spike_theme, spike_share, lens_s, scores, impacts_norm, coverage
-    )
-    
+def _score_portfolio(req: PortfolioAnalyzeRequest, shared: Optional[SharedSchools] = None):
+    """Deterministic part of the analysis: impacts, lens scores, coverage, spike, alignment and gaps"""
+    prof = req.student_profile
+    impacts_raw: Dict[str, float] = {}
+    for ev in req.portfolio:
+        impacts_raw[ev.id] = compute_impact(ev, prof.intended_major if prof else None, req.as_of)
+    impacts_norm, lens_s, coverage, spike_theme, spike_share = _portfolio_metrics(req.portfolio, impacts_raw)
+
+    # All schools in one pass over the schools x factors matrix
+    contexts, schools = resolve_school_contexts(req, shared)
+    align_map: Dict[str, float] = {s: 0.0 for s in req.schools}
+    if prof and any(contexts):
+        align_map.update(zip(req.schools, alignment(StudentMatrix.compile([(prof, lens_s)]), schools)[0].tolist()))
+
+    scores = _scores_view(impacts_norm, lens_s, coverage, spike_theme, spike_share, align_map)
+    gaps = analyze_gaps(req.portfolio, lens_s, (spike_theme, spike_share), req.school_context, prof, impacts_norm,
+                        as_of=req.as_of)
+    return impacts_norm, lens_s, coverage, spike_theme, spike_share, scores, gaps
+
+def resolve_as_of(req):
+    """
+    `req` with as_of pinned to today when omitted. Called once at each entry point, so one
+    request sees one date throughout and the date is part of every key derived from the request.
+    """
+    return req if req.as_of is not None else req.model_copy(update={"as_of": date.today()})
+
+def _cohort_percentiles(prof: Optional[StudentProfile], impacts_norm: Dict[str, float], lens_s: Dict[str, float]) -> Optional[dict]:
+    """
+    Rank the student's impact total and lens scores against its peers. Only students with a
+    stored profile are recorded in the cohort index; ad-hoc request portfolios are ranked but
+    never become anyone's peers.
+    """
+    major = prof.intended_major if prof else None
+    grade = prof.current_grade if prof else None
+    values = {"impact_total": sum(impacts_norm.values()), **lens_s}
+    percentiles = percentile_index.percentiles(major, grade, values, prof.student_id if prof else None)
+    if prof and profile_versions.get(prof.student_id) is not None:
+        percentile_index.record(prof.student_id, major, grade, values)
+    return percentiles
+
+def _scoring_context_token(req: PortfolioAnalyzeRequest) -> str:
+    return request_fingerprint("scoring_context", req.model_dump(mode="json", exclude={"sections"}))
+
+def _portfolio_summary(portfolio: List[Evidence], impacts_norm: Dict[str, float]) -> List[dict]:
+    """Highest-impact items as dicts, for the task regeneration prompts"""
+    summary = []
+    for ev in sorted(portfolio, key=lambda ev: impacts_norm.get(ev.id, 0.0), reverse=True)[:PROMPT_PORTFOLIO_ITEMS]:
+        summary.append({
+            "title": ev.title,
+            "lens": ev.lens,
+            "type": ev.type,
+            "role_level": ev.role_level,
+            "theme_tags": ev.theme_tags,
+            "area_of_activity": ev.area_of_activity,
+            "impact_score": round(impacts_norm.get(ev.id, 0.0), 2)
+        })
+    return summary
+
+def _remember_scoring_context(req: PortfolioAnalyzeRequest, token: str, impacts_norm: Dict[str, float],
+                              lens_s: Dict[str, float], coverage: float, spike_theme: Optional[str],
+                              spike_share: float, gaps: List[dict]) -> ScoringContext:
+    ctx = ScoringContext.create(token, req, impacts_norm, lens_s, coverage, spike_theme, spike_share,
+                                gaps, _portfolio_summary(req.portfolio, impacts_norm))
+    scoring_contexts.put(ctx)
+    return ctx
+
+def scoring_context(req: PortfolioAnalyzeRequest) -> ScoringContext:
+    """Scoring context for `req`, reused from the cache when the same request was scored before"""
+    req = resolve_as_of(req)
+    token = _scoring_context_token(req)
+    ctx = scoring_contexts.get(token)
+    if ctx is None:
+        impacts_norm, lens_s, coverage, spike_theme, spike_share, _, gaps = _score_portfolio(req)
+        ctx = _remember_scoring_context(req, token, impacts_norm, lens_s, coverage, spike_theme, spike_share, gaps)
+    return ctx
+
+def resolve_scoring_context(context_token: Optional[str], original_request: Optional[PortfolioAnalyzeRequest]) -> ScoringContext:
+    """Context for a follow-up call: by token when still cached, else rebuilt from the original request"""
+    if context_token:
+        ctx = scoring_contexts.get(context_token)
+        if ctx is not None:
+            return ctx
+        if original_request is None:
+            raise UnknownScoringContext(f"Unknown or expired context token: {context_token}")
+    if original_request is None:
+        raise ValueError("Either context_token or original_request is required")
+    return scoring_context(original_request)
+
+def score_portfolio(req: PortfolioAnalyzeRequest) -> dict:
+    """LLM-free fast path: only the deterministic scores and gaps"""
+    *_, scores, gaps = _score_portfolio(resolve_as_of(req))
+    return {"scores": scores, "gaps": gaps}
+
+def _requested_sections(req: PortfolioAnalyzeRequest) -> set:
+    return set(req.sections) if req.sections is not None else set(ANALYZE_SECTIONS)
+
+def _analysis_stage(req: PortfolioAnalyzeRequest, shared: Optional[SharedSchools]) -> dict:
+    """CPU-bound part of the analysis, everything but the LLM call"""
+    prof = req.student_profile
+    requested = _requested_sections(req)
+    impacts_norm, lens_s, coverage, spike_theme, spike_share, scores, gaps = _score_portfolio(req, shared)
+    scores["percentiles"] = _cohort_percentiles(prof, impacts_norm, lens_s)
+    ctx = _remember_scoring_context(req, _scoring_context_token(req), impacts_norm, lens_s, coverage,
+                                    spike_theme, spike_share, gaps)
+    stage = {
+        "requested": requested, "impacts_norm": impacts_norm, "lens_s": lens_s, "coverage": coverage,
+        "spike_theme": spike_theme, "spike_share": spike_share, "scores": scores, "gaps": gaps,
+        "context_token": ctx.token, "standardized_tests": None
+    }
     # Analyze standardized tests for each school
-    standardized_tests = analyze_standardized_tests(req, prof)
-
-    return {
-        "scores": scores,
-        "gaps": gaps,
-        "critical_improvements": [ci.model_dump() for ci in critical_improvements],
-        "lens_improvements": [li.model_dump() for li in lens_improvements],
-        "diversity_spike": diversity_spike.model_dump() if diversity_spike else None,
-        "alignment_priorities": [ap.model_dump() for ap in alignment_priorities],
-        "standardized_tests": [ta.model_dump() for ta in standardized_tests]
+    if "standardized_tests" in requested:
+        stage["standardized_tests"] = analyze_standardized_tests(req, prof, shared)
+    return stage
+
+def _wanted_sections(stage: dict) -> List[str]:
+    return [name for name in STRUCTURED_SECTIONS if name in stage["requested"]]
+
+def _structured_args(stage: dict) -> tuple:
+    return (stage["gaps"], stage["spike_theme"], stage["spike_share"], stage["lens_s"], stage["scores"],
+            stage["impacts_norm"], stage["coverage"])
+
+def _assemble_analysis(req: PortfolioAnalyzeRequest, stage: dict, deadline: Deadline,
+                       structured: Optional[Tuple[StructuredSections, Dict[str, str], Optional[str]]]
+                       ) -> PortfolioAnalyzeResponse:
+    """
+    The typed response, holding the section models as they were built. Only requested
+    sections are set, so analysis_dict() can leave the others out.
+    """
+    requested = stage["requested"]
+    fields: Dict[str, Any] = {"scores": stage["scores"], "gaps": stage["gaps"]}
+    provenance: Dict[str, str] = {}
+    fallback_reason = None
+
+    if structured is not None:
+        sections, provenance, fallback_reason = structured
+        for name, section in zip(STRUCTURED_SECTIONS, sections):
+            if name in requested:
+                fields[name] = section
+
+    if stage["standardized_tests"] is not None:
+        fields["standardized_tests"] = stage["standardized_tests"]
+        provenance["standardized_tests"] = "rules"
+
+    fields["provenance"] = {
+        "sections": provenance,
+        "fallback_reason": fallback_reason,
+        "budget_ms": int(deadline.budget * 1000),
+        "elapsed_ms": int(deadline.elapsed() * 1000),
+        "as_of": req.as_of
+    }
+    fields["context_token"] = stage["context_token"]
+    return PortfolioAnalyzeResponse(**fields)
+
+def analysis_dict(response: PortfolioAnalyzeResponse) -> dict:
+    """Plain-dict form of an analysis, with only the sections that were requested"""
+    return response.model_dump(include=response.model_fields_set)
+
+def analyze_portfolio_response(req: PortfolioAnalyzeRequest, shared: Optional[SharedSchools] = None) -> PortfolioAnalyzeResponse:
+    """Full analysis; `shared` lets a batch resolve each distinct set of school contexts once"""
+    deadline = Deadline(ANALYZE_DEADLINE_SECONDS)
+    req = resolve_as_of(req)
+    stage = _analysis_stage(req, shared)
+
+    # Generate structured recommendations (3 tasks per section), only when any was requested
+    structured = None
+    wanted = _wanted_sections(stage)
+    if wanted:
+        structured = _generate_structured_recommendations(req, *_structured_args(stage), deadline, wanted)
+    return _assemble_analysis(req, stage, deadline, structured)
+
+async def aanalyze_portfolio_response(req: PortfolioAnalyzeRequest, shared: Optional[SharedSchools] = None
+                                      ) -> PortfolioAnalyzeResponse:
+    """
+    analyze_portfolio_response for async callers: the scoring runs in a worker thread and
+    the LLM call on the AsyncOpenAI client, so no thread is held while it is in flight
+    """
+    deadline = Deadline(ANALYZE_DEADLINE_SECONDS)
+    req = resolve_as_of(req)
+    stage = await asyncio.to_thread(_analysis_stage, req, shared)
+
+    structured = None
+    wanted = _wanted_sections(stage)
+    if wanted:
+        structured = await _agenerate_structured_recommendations(req, *_structured_args(stage), deadline, wanted)
+    return _assemble_analysis(req, stage, deadline, structured)
+
+def analyze_portfolio(req: PortfolioAnalyzeRequest, shared: Optional[SharedSchools] = None) -> dict:
+    return analysis_dict(analyze_portfolio_response(req, shared))
+
+async def aanalyze_portfolio(req: PortfolioAnalyzeRequest, shared: Optional[SharedSchools] = None) -> dict:
+    return analysis_dict(await aanalyze_portfolio_response(req, shared))
+
+def stream_portfolio_analysis(req: PortfolioAnalyzeRequest) -> Iterator[Tuple[str, Any]]:
+    """
+    Analyze a portfolio as a sequence of (event, data) pairs.
+
+    Deterministic scores and gaps are emitted first. Each recommendation section is emitted
+    as soon as the streamed completion contains it in full. Sections the model does not
+    deliver (error, deadline, empty) are filled from the rule-based fallback, followed by
+    the standardized test analysis and a final provenance event.
+    """
+    deadline = Deadline(ANALYZE_DEADLINE_SECONDS)
+    req = resolve_as_of(req)
+    prof = req.student_profile
+    track = req.country_tracks[0] if req.country_tracks else "US"
+    requested = _requested_sections(req)
+    impacts_norm, lens_s, coverage, spike_theme, spike_share, scores, gaps = _score_portfolio(req)
+    scores["percentiles"] = _cohort_percentiles(prof, impacts_norm, lens_s)
+    yield "scores", scores
+    yield "gaps", gaps
+
+    wanted = [name for name in STRUCTURED_SECTIONS if name in requested]
+    emitted = {name: 0 for name in STRUCTURED_SECTIONS}
+    fallback_reason = None
+    if wanted and not client:
+        fallback_reason = "llm_unavailable"
+    elif wanted and llm_breaker.is_open:
+        fallback_reason = "circuit_open"
+    elif wanted:
+        messages = _structured_recommendation_messages(req, gaps, spike_theme, spike_share, lens_s, scores, impacts_norm, coverage)
+        parser = SectionStreamParser()
+        stream = stream_chat_completion(
+            client, "portfolio.structured",
+            model="gpt-4o-mini",
+            messages=messages,
+            response_format={"type": "json_object"},
+            temperature=0.3,
+            deadline=deadline
+        )
+        try:
+            for delta in stream:
+                for key, _, data in parser.feed(delta):
+                    if key not in wanted:
+                        continue
+                    try:
+                        item = SECTION_PARSERS[key](data, track) if key in SECTION_PARSERS else None
+                    except Exception:
+                        continue
+                    if item:
+                        emitted[key] += 1
+                        yield STREAM_EVENTS[key], item.model_dump()
+                if deadline.expired:
+                    fallback_reason = "deadline"
+                    break
+        except Exception as e:
+            import logging
+            logging.warning(f"GPT structured recommendation stream failed: {e}. Using fallback.")
+            fallback_reason = "deadline" if deadline.expired else "llm_error"
+        finally:
+            stream.close()
+
+    provenance: Dict[str, str] = {}
+    rule_based = None
+    for i, name in enumerate(STRUCTURED_SECTIONS):
+        if name not in wanted:
+            continue
+        if emitted[name]:
+            provenance[name] = "llm"
+            continue
+        rule_based = rule_based or _get_structured_fallback(
+            gaps, lens_s, _lenses_to_improve(lens_s), spike_theme, spike_share, coverage, scores, track, req.school_context
+        )
+        section = rule_based[i]
+        items = section if isinstance(section, list) else ([section] if section else [])
+        for item in items:
+            yield STREAM_EVENTS[name], item.model_dump()
+        provenance[name] = "fallback" if items or fallback_reason else "llm"
+    if fallback_reason is None and "fallback" in provenance.values():
+        fallback_reason = "llm_incomplete"
+
+    if "standardized_tests" in requested:
+        yield "standardized_tests", [ta.model_dump() for ta in analyze_standardized_tests(req, prof)]
+        provenance["standardized_tests"] = "rules"
+    yield "provenance", {
+        "sections": provenance,
+        "fallback_reason": fallback_reason,
+        "budget_ms": int(deadline.budget * 1000),
+        "elapsed_ms": int(deadline.elapsed() * 1000),
+        "as_of": req.as_of
     }
 
-def analyze_standardized_tests(req: PortfolioAnalyzeRequest, prof: Optional[StudentProfile]) -> List[TestAnalysis]:
+def analyze_standardized_tests(req: PortfolioAnalyzeRequest, prof: Optional[StudentProfile],
+                               shared: Optional[SharedSchools] = None) -> List[TestAnalysis]:
     """Analyze standardized test scores for each school and provide recommendations"""
-    if not prof or not req.school_context:
+    if not prof:
         return []
-    
-    ctx = req.school_context
-    policy = ctx.test_policy
-    mid50 = ctx.mid50_scores or {}
-    
-    if not policy:
+    contexts, schools = resolve_school_contexts(req, shared)
+    # Schools sharing one context (the shared school_context) are analyzed once
+    seen = set()
+    columns = []
+    for i, ctx in enumerate(contexts):
+        if ctx and ctx.test_policy and id(ctx) not in seen:
+            seen.add(id(ctx))
+            columns.append(i)
+    if not columns:
         return []
-    
-    test_analyses = []
+
+    # Test choice and competitiveness for every school at once
+    standing = score_standing(StudentMatrix.compile([(prof, {})]), schools.take(columns))
     track = req.country_tracks[0] if req.country_tracks else "US"
-    
-    # Get student's test scores
-    sat_score = prof.tests.sat.score if prof.tests.sat and prof.tests.sat.score else None
-    act_score = prof.tests.act.score if prof.tests.act and prof.tests.act.score else None
-    
-    # Determine which test to analyze (prefer SAT if both available)
-    test_type = None
-    current_score = None
-    test_mid50 = None
-    
-    if sat_score and mid50.get("sat_composite"):
-        test_type = "SAT"
-        current_score = sat_score
-        test_mid50 = mid50["sat_composite"]
-    elif act_score and mid50.get("act_composite"):
-        test_type = "ACT"
-        current_score = act_score
-        test_mid50 = mid50["act_composite"]
+    test_analyses = []
+    for j, i in enumerate(columns):
+        analysis = _school_test_analysis(
+            req, contexts[i], track, standing.test_type(0, j), int(standing.score[0, j]) or None, standing.rating(0, j)
+        )
+        if analysis is not None:
+            test_analyses.append(analysis)
+    return test_analyses
+
+def _school_test_analysis(req: PortfolioAnalyzeRequest, ctx: SchoolContext, track: str, test_type: Optional[str],
+                          current_score: Optional[int], competitiveness: Optional[str]) -> Optional[TestAnalysis]:
+    """Submission recommendation for one school, given the test the student would send and its competitiveness"""
+    policy = ctx.test_policy
+    mid50 = ctx.mid50_scores or {}
+    test_mid50 = mid50.get("sat_composite" if test_type == "SAT" else "act_composite") if test_type else None
     
     # If no test taken and not required, skip analysis
     if not current_score and policy.admission_use != "required":
-        return []
-    
-    # Calculate competitiveness if score exists
-    competitiveness = None
-    if current_score and test_mid50 and len(test_mid50) >= 3:
-        p25, p50, p75 = test_mid50[0], test_mid50[1], test_mid50[-1]
-        if current_score >= p75:
-            competitiveness = "highly_competitive"
-        elif current_score >= p50:
-            competitiveness = "competitive"
-        elif current_score >= p25:
-            competitiveness = "below_competitive"
-        else:
-            competitiveness = "not_competitive"
+        return None
     
     # Determine recommendation based on policy and score
     recommendation = "submit"
@@ -1111,7 +1504,7 @@ def analyze_standardized_tests(req: PortfolioAnalyzeRequest, prof: Optional[Stud
                         latest_date = datetime.fromisoformat(latest_date_str.replace('Z', '+00:00')).date()
                     else:
                         latest_date = datetime.strptime(latest_date_str, '%Y-%m-%d').date()
-                    runway_weeks = max(0, (latest_date - date.today()).days // 7)
+                    runway_weeks = max(0, (latest_date - (req.as_of or date.today())).days // 7)
                 except:
                     runway_weeks = 0
             else:
@@ -1172,7 +1565,7 @@ def analyze_standardized_tests(req: PortfolioAnalyzeRequest, prof: Optional[Stud
                         latest_date = datetime.fromisoformat(latest_date_str.replace('Z', '+00:00')).date()
                     else:
                         latest_date = datetime.strptime(latest_date_str, '%Y-%m-%d').date()
-                    runway_weeks = max(0, (latest_date - date.today()).days // 7)
+                    runway_weeks = max(0, (latest_date - (req.as_of or date.today())).days // 7)
                 except:
                     runway_weeks = 0
             
@@ -1207,7 +1600,7 @@ def analyze_standardized_tests(req: PortfolioAnalyzeRequest, prof: Optional[Stud
         tasks=tasks
     )
     
-    return [test_analysis]
+    return test_analysis
 
 def _create_test_retake_tasks(test_type: str, ctx: SchoolContext, weekly_hours: int, track: str, current_score: int, target_score: int) -> List[RecommendationTask]:
     """Create test retake preparation tasks"""
@@ -1329,6 +1722,7 @@ def _create_test_prep_tasks(test_type: str, ctx: SchoolContext, weekly_hours: in
 
 def plan_tests(req: TestPlanRequest) -> TestPlanResponse:
     """Test planning logic per spec section 5"""
+    req = resolve_as_of(req)
     profile = req.student_profile
     ctx = req.school_context
     policy = ctx.test_policy
@@ -1379,7 +1773,7 @@ def plan_tests(req: TestPlanRequest) -> TestPlanResponse:
                 latest_date = datetime.fromisoformat(latest_date_str.replace('Z', '+00:00')).date()
             else:
                 latest_date = datetime.strptime(latest_date_str, '%Y-%m-%d').date()
-            runway_weeks = max(0, (latest_date - date.today()).days // 7)
+            runway_weeks = max(0, (latest_date - (req.as_of or date.today())).days // 7)
         except Exception:
             runway_weeks = 0
     else:
@@ -1456,39 +1850,70 @@ def _create_test_plan(profile: StudentProfile, ctx: SchoolContext, weekly_hours:
     rationale = f"{test_type} {reason}. Target: {target_score} (current: {baseline or 'none'}, p50: {p50}). Estimated {hours_needed}h prep."
     return TestPlanResponse(decision="PLAN", rationale=rationale, tasks=tasks)
 
+class _AlternativesCall(NamedTuple):
+    """One task-regeneration LLM call and the rule-based tasks used when it fails"""
+    section_identifier: Optional[str]
+    operation: str
+    messages: List[dict]
+    fallback: Callable[[], List[RecommendationTask]]
+
 def regenerate_tasks_for_section(
-    req: PortfolioAnalyzeRequest,
+    ctx: ScoringContext,
     section_type: str,
     section_identifier: Optional[str],
     exclude_task_titles: List[str]
 ) -> RegenerateTasksResponse:
-    """Regenerate alternative tasks for a specific section"""
-    prof = req.student_profile
-    impacts_raw: Dict[str, float] = {}
-    for ev in req.portfolio:
-        impacts_raw[ev.id] = compute_impact(ev, prof.intended_major if prof else None)
-    impacts_norm = normalize_impacts(impacts_raw) if impacts_raw else {}
-    lens_s = lens_scores(req.portfolio, impacts_norm) if impacts_norm else {k:0.0 for k in LENS_LIST}
-    coverage = coverage_index(lens_s) if sum(lens_s.values())>0 else 0.0
-    spike_theme, spike_share = detect_spike(req.portfolio, impacts_norm)
-    
-    gaps = analyze_gaps(req.portfolio, lens_s, (spike_theme, spike_share), req.school_context, prof, impacts_norm)
-    
-    track = req.country_tracks[0] if req.country_tracks else "US"
-    
-    # Build portfolio context
-    portfolio_summary = []
-    for ev in req.portfolio[:10]:
-        impact = impacts_norm.get(ev.id, 0.0)
-        portfolio_summary.append({
-            "title": ev.title,
-            "lens": ev.lens,
-            "type": ev.type,
-            "role_level": ev.role_level,
-            "theme_tags": ev.theme_tags,
-            "area_of_activity": ev.area_of_activity,
-            "impact_score": round(impact, 2)
-        })
+    """Regenerate alternative tasks for a specific section from a cached scoring context"""
+    call = _alternatives_call(ctx, section_type, section_identifier, exclude_task_titles)
+    if not client:
+        tasks = call.fallback()
+    else:
+        try:
+            result_text = chat_completion(client, call.operation, model="gpt-4o-mini", messages=call.messages,
+                                          response_format={"type": "json_object"},
+                                          temperature=0.7,  # Higher temperature for more variety
+                                          cache=False)  # Each regeneration should offer new alternatives
+            tasks = _parse_alternative_tasks(result_text, call, ctx.track, exclude_task_titles)
+        except Exception as e:
+            import logging
+            logging.warning(f"GPT {call.operation} failed: {e}. Using fallback.")
+            tasks = call.fallback()
+    return RegenerateTasksResponse(section_type=section_type, section_identifier=call.section_identifier, tasks=tasks)
+
+async def aregenerate_tasks_for_section(
+    ctx: ScoringContext,
+    section_type: str,
+    section_identifier: Optional[str],
+    exclude_task_titles: List[str]
+) -> RegenerateTasksResponse:
+    """regenerate_tasks_for_section on the AsyncOpenAI client"""
+    call = _alternatives_call(ctx, section_type, section_identifier, exclude_task_titles)
+    if not async_client:
+        tasks = call.fallback()
+    else:
+        try:
+            result_text = await achat_completion(async_client, call.operation, model="gpt-4o-mini", messages=call.messages,
+                                                 response_format={"type": "json_object"},
+                                                 temperature=0.7, cache=False)
+            tasks = _parse_alternative_tasks(result_text, call, ctx.track, exclude_task_titles)
+        except Exception as e:
+            import logging
+            logging.warning(f"GPT {call.operation} failed: {e}. Using fallback.")
+            tasks = call.fallback()
+    return RegenerateTasksResponse(section_type=section_type, section_identifier=call.section_identifier, tasks=tasks)
+
+def _alternatives_call(
+    ctx: ScoringContext,
+    section_type: str,
+    section_identifier: Optional[str],
+    exclude_task_titles: List[str]
+) -> _AlternativesCall:
+    req = ctx.request
+    lens_s = dict(ctx.lens_scores)
+    coverage, spike_theme, spike_share = ctx.coverage, ctx.spike_theme, ctx.spike_share
+    gaps = [dict(gap) for gap in ctx.gaps]
+    track = ctx.track
+    portfolio_summary = [dict(item) for item in ctx.portfolio_summary]
     
     # Generate alternative tasks based on section type
     if section_type == "critical_improvements":
@@ -1509,13 +1934,11 @@ def regenerate_tasks_for_section(
         if not target_gap:
             raise ValueError(f"No gap found for identifier: {section_identifier}")
         
-        tasks = _generate_alternative_tasks_for_gap(
-            req, target_gap, lens_s, impacts_norm, portfolio_summary, track, exclude_task_titles
-        )
-        return RegenerateTasksResponse(
-            section_type=section_type,
-            section_identifier=section_identifier or target_gap.get("lens") or target_gap.get("type"),
-            tasks=tasks
+        return _AlternativesCall(
+            section_identifier or target_gap.get("lens") or target_gap.get("type"),
+            "portfolio.alternatives.gap",
+            _alternative_gap_messages(req, target_gap, lens_s, portfolio_summary, exclude_task_titles),
+            lambda: _get_fallback_alternative_tasks_for_gap(target_gap, lens_s, track, exclude_task_titles)
         )
     
     elif section_type == "lens_improvements":
@@ -1526,38 +1949,64 @@ def regenerate_tasks_for_section(
         if lens_score < LENS_MIN_SCORE:
             raise ValueError(f"Lens {section_identifier} is below minimum (has a gap, use critical_improvements instead)")
         
-        tasks = _generate_alternative_tasks_for_lens(
-            req, section_identifier, lens_score, impacts_norm, portfolio_summary, track, exclude_task_titles
-        )
-        return RegenerateTasksResponse(
-            section_type=section_type,
-            section_identifier=section_identifier,
-            tasks=tasks
+        return _AlternativesCall(
+            section_identifier,
+            "portfolio.alternatives.lens",
+            _alternative_lens_messages(section_identifier, lens_score, portfolio_summary, exclude_task_titles),
+            lambda: _get_fallback_alternative_tasks_for_lens(section_identifier, lens_score, track, exclude_task_titles)
         )
     
     elif section_type == "diversity_spike":
-        tasks = _generate_alternative_tasks_for_diversity_spike(
-            req, spike_theme, spike_share, coverage, impacts_norm, portfolio_summary, track, exclude_task_titles
-        )
-        return RegenerateTasksResponse(
-            section_type=section_type,
-            section_identifier=None,
-            tasks=tasks
+        return _AlternativesCall(
+            None,
+            "portfolio.alternatives.diversity",
+            _alternative_diversity_messages(spike_theme, spike_share, coverage, portfolio_summary, exclude_task_titles),
+            lambda: _get_fallback_alternative_tasks_for_diversity_spike(spike_theme, spike_share, coverage, track, exclude_task_titles)
         )
     
     else:
         raise ValueError(f"Unknown section_type: {section_type}")
 
-def _generate_alternative_tasks_for_gap(
+def _parse_alternative_tasks(result_text: str, call: _AlternativesCall, track: str,
+                             exclude_titles: List[str]) -> List[RecommendationTask]:
+    """Three tasks from the model's JSON, skipping titles close to excluded ones and topping up from the fallback"""
+    result_json = json.loads(result_text)
+    tasks_data = result_json.get("tasks", [])
+    
+    tasks = []
+    for task_data in tasks_data[:3]:
+        try:
+            # Check if title is too similar to excluded ones
+            title = task_data.get("title", "")
+            if any(excluded.lower() in title.lower() or title.lower() in excluded.lower() 
+                   for excluded in exclude_titles):
+                continue
+            
+            tasks.append(RecommendationTask(
+                title=title,
+                track=track,
+                estimated_hours=int(task_data.get("estimated_hours", 3)),
+                definition_of_done=task_data.get("definition_of_done", []),
+                micro_coaching=task_data.get("micro_coaching", ""),
+                quick_links=task_data.get("quick_links", [])
+            ))
+        except:
+            continue
+    
+    # Ensure we have 3 tasks
+    while len(tasks) < 3:
+        tasks.extend(call.fallback())
+    
+    return tasks[:3]
+
+def _alternative_gap_messages(
     req: PortfolioAnalyzeRequest,
     gap: dict,
     lens_scores: Dict[str, float],
-    impacts_norm: Dict[str, float],
     portfolio_summary: List[dict],
-    track: str,
     exclude_titles: List[str]
-) -> List[RecommendationTask]:
-    """Generate 3 alternative tasks for a specific gap"""
+) -> List[dict]:
+    """Prompt for 3 alternative tasks for a specific gap"""
     gap_type = gap.get("type")
     lens = gap.get("lens")
     severity = gap.get("severity", 0)
@@ -1591,68 +2040,21 @@ Severity: {severity:.2f}
 
 Return JSON: {{"tasks": [{{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}}, ...]}}"""
 
-    if not client or not _openai_api_key:
-        # Fallback
-        return _get_fallback_alternative_tasks_for_gap(gap, lens_scores, track, exclude_titles)
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert portfolio coach. Generate exactly 3 ALTERNATIVE tasks that are different from previous suggestions. Be creative and suggest different approaches."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.7  # Higher temperature for more variety
-        )
-        
-        result_json = json.loads(response.choices[0].message.content)
-        tasks_data = result_json.get("tasks", [])
-        
-        tasks = []
-        for task_data in tasks_data[:3]:
-            try:
-                # Check if title is too similar to excluded ones
-                title = task_data.get("title", "")
-                if any(excluded.lower() in title.lower() or title.lower() in excluded.lower() 
-                       for excluded in exclude_titles):
-                    continue
-                
-                tasks.append(RecommendationTask(
-                    title=title,
-                    track=track,
-                    estimated_hours=int(task_data.get("estimated_hours", 3)),
-                    definition_of_done=task_data.get("definition_of_done", []),
-                    micro_coaching=task_data.get("micro_coaching", ""),
-                    quick_links=task_data.get("quick_links", [])
-                ))
-            except:
-                continue
-        
-        # Ensure we have 3 tasks
-        while len(tasks) < 3:
-            tasks.extend(_get_fallback_alternative_tasks_for_gap(gap, lens_scores, track, exclude_titles))
-        
-        return tasks[:3]
-        
-    except Exception as e:
-        import logging
-        logging.warning(f"GPT alternative tasks failed: {e}. Using fallback.")
-        return _get_fallback_alternative_tasks_for_gap(gap, lens_scores, track, exclude_titles)
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert portfolio coach. Generate exactly 3 ALTERNATIVE tasks that are different from previous suggestions. Be creative and suggest different approaches."
+        },
+        {"role": "user", "content": prompt}
+    ]
 
-def _generate_alternative_tasks_for_lens(
-    req: PortfolioAnalyzeRequest,
+def _alternative_lens_messages(
     lens: str,
     current_score: float,
-    impacts_norm: Dict[str, float],
     portfolio_summary: List[dict],
-    track: str,
     exclude_titles: List[str]
-) -> List[RecommendationTask]:
-    """Generate 3 alternative tasks for lens improvement"""
+) -> List[dict]:
+    """Prompt for 3 alternative tasks for lens improvement"""
     prompt = f"""Generate EXACTLY 3 ALTERNATIVE tasks to improve the {lens} lens. These must be DIFFERENT from previous suggestions.
 
 === LENS INFORMATION ===
@@ -1673,66 +2075,22 @@ Current Score: {current_score:.2f}/10 (target: reach 8.0+)
 
 Return JSON: {{"tasks": [{{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}}, ...]}}"""
 
-    if not client or not _openai_api_key:
-        return _get_fallback_alternative_tasks_for_lens(lens, current_score, track, exclude_titles)
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Generate exactly 3 ALTERNATIVE tasks for lens improvement. Be creative and suggest different approaches."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.7
-        )
-        
-        result_json = json.loads(response.choices[0].message.content)
-        tasks_data = result_json.get("tasks", [])
-        
-        tasks = []
-        for task_data in tasks_data[:3]:
-            try:
-                title = task_data.get("title", "")
-                if any(excluded.lower() in title.lower() or title.lower() in excluded.lower() 
-                       for excluded in exclude_titles):
-                    continue
-                
-                tasks.append(RecommendationTask(
-                    title=title,
-                    track=track,
-                    estimated_hours=int(task_data.get("estimated_hours", 3)),
-                    definition_of_done=task_data.get("definition_of_done", []),
-                    micro_coaching=task_data.get("micro_coaching", ""),
-                    quick_links=task_data.get("quick_links", [])
-                ))
-            except:
-                continue
-        
-        while len(tasks) < 3:
-            tasks.extend(_get_fallback_alternative_tasks_for_lens(lens, current_score, track, exclude_titles))
-        
-        return tasks[:3]
-        
-    except Exception as e:
-        import logging
-        logging.warning(f"GPT alternative lens tasks failed: {e}. Using fallback.")
-        return _get_fallback_alternative_tasks_for_lens(lens, current_score, track, exclude_titles)
+    return [
+        {
+            "role": "system",
+            "content": "Generate exactly 3 ALTERNATIVE tasks for lens improvement. Be creative and suggest different approaches."
+        },
+        {"role": "user", "content": prompt}
+    ]
 
-def _generate_alternative_tasks_for_diversity_spike(
-    req: PortfolioAnalyzeRequest,
+def _alternative_diversity_messages(
     spike_theme: Optional[str],
     spike_share: float,
     coverage: float,
-    impacts_norm: Dict[str, float],
     portfolio_summary: List[dict],
-    track: str,
     exclude_titles: List[str]
-) -> List[RecommendationTask]:
-    """Generate 3 alternative tasks for diversity/spike improvement"""
+) -> List[dict]:
+    """Prompt for 3 alternative tasks for diversity/spike improvement"""
     prompt = f"""Generate EXACTLY 3 ALTERNATIVE tasks to improve diversity/spike. These must be DIFFERENT from previous suggestions.
 
 === DIVERSITY/SPIKE STATUS ===
@@ -1755,54 +2113,13 @@ Coverage Index: {coverage:.3f} (target: >0.7)
 
 Return JSON: {{"tasks": [{{"title": "...", "estimated_hours": N, "definition_of_done": [...], "micro_coaching": "...", "quick_links": []}}, ...]}}"""
 
-    if not client or not _openai_api_key:
-        return _get_fallback_alternative_tasks_for_diversity_spike(spike_theme, spike_share, coverage, track, exclude_titles)
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Generate exactly 3 ALTERNATIVE tasks for diversity/spike improvement. Be creative."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.7
-        )
-        
-        result_json = json.loads(response.choices[0].message.content)
-        tasks_data = result_json.get("tasks", [])
-        
-        tasks = []
-        for task_data in tasks_data[:3]:
-            try:
-                title = task_data.get("title", "")
-                if any(excluded.lower() in title.lower() or title.lower() in excluded.lower() 
-                       for excluded in exclude_titles):
-                    continue
-                
-                tasks.append(RecommendationTask(
-                    title=title,
-                    track=track,
-                    estimated_hours=int(task_data.get("estimated_hours", 3)),
-                    definition_of_done=task_data.get("definition_of_done", []),
-                    micro_coaching=task_data.get("micro_coaching", ""),
-                    quick_links=task_data.get("quick_links", [])
-                ))
-            except:
-                continue
-        
-        while len(tasks) < 3:
-            tasks.extend(_get_fallback_alternative_tasks_for_diversity_spike(spike_theme, spike_share, coverage, track, exclude_titles))
-        
-        return tasks[:3]
-        
-    except Exception as e:
-        import logging
-        logging.warning(f"GPT alternative diversity tasks failed: {e}. Using fallback.")
-        return _get_fallback_alternative_tasks_for_diversity_spike(spike_theme, spike_share, coverage, track, exclude_titles)
+    return [
+        {
+            "role": "system",
+            "content": "Generate exactly 3 ALTERNATIVE tasks for diversity/spike improvement. Be creative."
+        },
+        {"role": "user", "content": prompt}
+    ]
 
 def _get_fallback_alternative_tasks_for_gap(
     gap: dict,
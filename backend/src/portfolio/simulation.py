@@ -0,0 +1,132 @@
+"""
+What-If Simulation
+Scores and gaps for many hypothetical edits of one portfolio, without
+any LLM call.
+
+The base request is resolved once: raw impacts of its activities, the
+school contexts and their SchoolMatrix. Each scenario applies its edits,
+computes raw impacts only for added or patched activities, and reruns
+normalization, lens scores, spike detection and gap analysis on the
+edited portfolio. Alignment of the base and every scenario is then one
+students x schools matrix pass, with one row per scenario.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Sequence
+from .alignment import StudentMatrix, alignment
+from .models import Evidence, EvidenceEdit, SimulateRequest
+from .service import (
+    _portfolio_metrics, _scores_view, analyze_gaps, compute_impact, resolve_as_of, resolve_school_contexts
+)
+
+
+def apply_edits(portfolio: Sequence[Evidence], edits: Sequence[EvidenceEdit]) -> List[Evidence]:
+    """Edited copy of `portfolio`; untouched activities are the same objects. Raises ValueError"""
+    items: Dict[str, Evidence] = {ev.id: ev for ev in portfolio}
+    for edit in edits:
+        if edit.op == "add":
+            if edit.evidence.id in items:
+                raise ValueError(f"Activity already exists: {edit.evidence.id}")
+            items[edit.evidence.id] = edit.evidence
+        elif edit.id not in items:
+            raise ValueError(f"Unknown activity: {edit.id}")
+        elif edit.op == "remove":
+            del items[edit.id]
+        else:
+            items[edit.id] = Evidence.model_validate({**items[edit.id].model_dump(), **edit.changes})
+    return list(items.values())
+
+
+def _gap_key(gap: dict) -> tuple:
+    return gap["type"], gap.get("lens")
+
+
+def _gap_deltas(before: List[dict], after: List[dict]) -> List[dict]:
+    """Gaps that appeared, disappeared or changed severity, in base-then-scenario order"""
+    old = {_gap_key(g): g["severity"] for g in before}
+    new = {_gap_key(g): g["severity"] for g in after}
+    deltas = []
+    for key in list(old) + [k for k in new if k not in old]:
+        if old.get(key) != new.get(key):
+            gap_type, lens = key
+            delta = {"type": gap_type, "lens": lens} if lens is not None else {"type": gap_type}
+            delta.update(before=old.get(key), after=new.get(key))
+            deltas.append(delta)
+    return deltas
+
+
+def _diff(after: float, before: float, digits: int) -> float:
+    return round(after - before, digits) + 0.0  # + 0.0 turns -0.0 into 0.0
+
+
+def _deltas(base: dict, scenario: dict) -> dict:
+    """Scenario minus base from unrounded metrics, rounded like the scores view"""
+    return {
+        "impact_total": _diff(scenario["impact_total"], base["impact_total"], 2),
+        "coverage": _diff(scenario["coverage"], base["coverage"], 3),
+        "spike_share": _diff(scenario["spike_share"], base["spike_share"], 3),
+        "lens_scores": {k: _diff(v, base["lens_scores"][k], 2) for k, v in scenario["lens_scores"].items()},
+        "alignment": {k: _diff(v, base["alignment"][k], 3) for k, v in scenario["alignment"].items()}
+    }
+
+
+def simulate_portfolio(req: SimulateRequest) -> dict:
+    """Base scores and gaps plus, per scenario, its scores, gaps and the deltas to the base"""
+    base = resolve_as_of(req.base)
+    prof = base.student_profile
+    major = prof.intended_major if prof else None
+    contexts, schools = resolve_school_contexts(base)
+    # Raw impacts (and gap facts) of base activities are shared by every scenario that keeps them
+    base_raw = {id(ev): compute_impact(ev, major, base.as_of) for ev in base.portfolio}
+
+    # Index 0 is the base portfolio; a scenario whose edits fail keeps its error instead
+    variants: Dict[int, List[Evidence]] = {0: list(base.portfolio)}
+    errors: Dict[int, str] = {}
+    for i, scenario in enumerate(req.scenarios, start=1):
+        try:
+            variants[i] = apply_edits(base.portfolio, scenario.edits)
+        except ValueError as e:
+            errors[i] = str(e)
+
+    metrics = {}
+    for i, portfolio in variants.items():
+        impacts_raw = {}
+        for ev in portfolio:
+            raw = base_raw.get(id(ev))
+            impacts_raw[ev.id] = raw if raw is not None else compute_impact(ev, major, base.as_of)
+        metrics[i] = _portfolio_metrics(portfolio, impacts_raw)
+
+    # Alignment of every variant in one matrix pass, one row per variant
+    align_rows = {i: {s: 0.0 for s in base.schools} for i in variants}
+    if prof and any(contexts):
+        matrix = alignment(StudentMatrix.compile([(prof, m[1]) for m in metrics.values()]), schools)
+        for i, row in zip(metrics, matrix.tolist()):
+            align_rows[i].update(zip(base.schools, row))
+
+    results = {}
+    facts: dict = {}
+    for i, (impacts_norm, lens_s, coverage, spike_theme, spike_share) in metrics.items():
+        results[i] = {
+            "scores": _scores_view(impacts_norm, lens_s, coverage, spike_theme, spike_share, align_rows[i]),
+            "gaps": analyze_gaps(variants[i], lens_s, (spike_theme, spike_share), base.school_context, prof, impacts_norm,
+                                 facts, base.as_of),
+            "raw": {
+                "impact_total": sum(impacts_norm.values()), "coverage": coverage, "spike_share": spike_share,
+                "lens_scores": lens_s, "alignment": align_rows[i]
+            }
+        }
+
+    base_result = results[0]
+    scenarios = []
+    for i, scenario in enumerate(req.scenarios, start=1):
+        if i in errors:
+            scenarios.append({"name": scenario.name, "error": errors[i]})
+            continue
+        scenarios.append({
+            "name": scenario.name,
+            "scores": results[i]["scores"],
+            "gaps": results[i]["gaps"],
+            "deltas": _deltas(base_result["raw"], results[i]["raw"]),
+            "gap_deltas": _gap_deltas(base_result["gaps"], results[i]["gaps"])
+        })
+    return {"base": {"scores": base_result["scores"], "gaps": base_result["gaps"]}, "scenarios": scenarios}
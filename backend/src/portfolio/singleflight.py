@@ -0,0 +1,100 @@
+"""
+Single-flight Request Coalescing
+Concurrent calls that share a key run once; every caller receives the same result.
+"""
+
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict
+from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
+import threading
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Stable hash of canonicalized request models / plain values"""
+    canonical = [p.model_dump(mode="json") if isinstance(p, BaseModel) else p for p in parts]
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces identical in-flight coroutine calls on a single event loop"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._executions = 0
+        self._coalesced = 0
+
+    async def ado(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run fn once per key among concurrent callers; every caller awaits the same result.
+
+        The work runs in a task owned by the flight rather than by the first
+        caller, so one caller being cancelled (a client disconnect) does not
+        cancel the others. The task is cancelled once every caller has gone.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            with self._lock:
+                self._coalesced += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._forget(key, flight))
+            with self._lock:
+                self._executions += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            # Callers may all have gone away; don't warn about an unretrieved exception
+            flight.task.exception()
+
+    def stats(self) -> dict:
+        with self._lock:
+            executions, coalesced = self._executions, self._coalesced
+            in_flight = len(self._flights)
+        total = executions + coalesced
+        return {
+            "requests": total,
+            "executions": executions,
+            "coalesced": coalesced,
+            "coalesced_ratio": round(coalesced / total, 4) if total else 0.0,
+            "in_flight": in_flight
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def flight_group(name: str) -> SingleFlight:
+    """Return the process-wide SingleFlight registered under name"""
+    group = _groups.get(name)
+    if group is None:
+        group = _groups.setdefault(name, SingleFlight(name))
+    return group
+
+
+def coalescing_stats() -> dict:
+    return {name: group.stats() for name, group in sorted(_groups.items())}
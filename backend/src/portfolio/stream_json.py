@@ -0,0 +1,82 @@
+"""
+Incremental JSON Section Parser
+Emits top-level members of a streamed JSON object as soon as they are complete.
+
+For a completion shaped like {"a": [{...}, {...}], "b": {...}} fed in arbitrary
+text chunks, the parser yields ("a", 0, {...}) when the first array element
+closes, ("a", 1, {...}) for the second, and ("b", None, {...}) when the object
+value closes - without waiting for the rest of the document.
+"""
+
+from __future__ import annotations
+from typing import Any, Iterator, Optional, Tuple
+import json
+
+SectionItem = Tuple[str, Optional[int], Any]
+
+
+class SectionStreamParser:
+    """Character-level scanner over a JSON object streamed in chunks"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: list[str] = []  # "{" / "[" for each open container
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._item_start = -1
+        self._item_index = 0
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> Iterator[SectionItem]:
+        """Consume a chunk and yield every top-level member completed by it"""
+        if not chunk:
+            return
+        self._text += chunk
+        text = self._text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            i = self._pos
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = json.loads(text[self._string_start:i + 1])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and len(self._stack) == 1:
+                self._key = self._last_string
+                self._item_index = 0
+            elif ch in "{[":
+                self._stack.append(ch)
+                depth = len(self._stack)
+                # An object value of a top-level key, or an element of a top-level array
+                if (depth == 2 and ch == "{") or (depth == 3 and self._stack[1] == "["):
+                    self._item_start = i
+            elif ch in "}]":
+                depth = len(self._stack)
+                self._stack.pop()
+                if depth == 2 and ch == "}" and self._item_start >= 0:
+                    yield self._emit(text[self._item_start:i + 1], None)
+                elif depth == 3 and self._stack[1] == "[" and self._item_start >= 0:
+                    yield self._emit(text[self._item_start:i + 1], self._item_index)
+                    self._item_index += 1
+
+    def _emit(self, raw: str, index: Optional[int]) -> SectionItem:
+        self._item_start = -1
+        return self._key or "", index, json.loads(raw)
@@ -0,0 +1,13 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Loaded before any test module imports src.portfolio, whose singletons open their
+# stores at import: keep tests away from the on-disk LLM cache, cohort index and job queue
+_scratch = tempfile.mkdtemp(prefix="portfolio-tests-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+
+os.environ["LLM_CACHE_DISK"] = "0"
+os.environ["PERCENTILE_DISK"] = "0"
+os.environ["JOB_QUEUE_PATH"] = os.path.join(_scratch, "jobs.sqlite3")
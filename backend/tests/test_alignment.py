@@ -0,0 +1,136 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import random
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import service
+from src.portfolio.alignment import SchoolMatrix, StudentMatrix, alignment, score_standing
+from src.portfolio.constants import LENS_LIST
+from src.portfolio.models import PortfolioAnalyzeRequest, SchoolContext, StudentProfile
+from src.portfolio.school_sets import SchoolSetRegistry
+from src.portfolio.service import alignment_for_school, analyze_standardized_tests
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+IMPORTANCE = ["very_important", "important", "considered", "not_considered"]
+
+
+def random_school(rng: random.Random, i: int) -> SchoolContext:
+    mid50 = {}
+    if rng.random() < 0.8:
+        lo = rng.randrange(1000, 1450, 10)
+        mid50["sat_composite"] = [lo, lo + rng.randrange(0, 100, 10), lo + rng.randrange(100, 200, 10)]
+    if rng.random() < 0.6:
+        lo = rng.randint(20, 30)
+        mid50["act_composite"] = [lo, lo + rng.randint(1, 3), lo + rng.randint(3, 5)][:rng.choice((2, 3))]
+    return SchoolContext(
+        name=f"School {i}",
+        mid50_scores=mid50 or None,
+        factor_importance={f: rng.choice(IMPORTANCE) for f in ("gpa", "rigor", "test_scores", "essay", "ec") if rng.random() < 0.8},
+        recommenders_required=rng.choice((None, 1, 2, 3))
+    )
+
+
+def random_student(rng: random.Random) -> tuple:
+    tests = {}
+    if rng.random() < 0.6:
+        tests["sat"] = {"score": rng.randrange(1000, 1600, 10)}
+    if rng.random() < 0.5:
+        tests["act"] = {"score": rng.randint(18, 36)}
+    prof = StudentProfile(
+        student_id="s", current_grade="12", weekly_hours_cap=8,
+        gpa_unweighted=rng.choice((None, round(rng.uniform(2.0, 4.0), 2))),
+        grades_by_subject={f"S{k}": rng.choice(("A*", "A", "B", "hl", "C")) for k in range(rng.randint(0, 8))},
+        tests=tests
+    )
+    return prof, {lens: rng.uniform(0, 10) for lens in LENS_LIST}
+
+
+def test_matrix_matches_scalar_alignment():
+    rng = random.Random(3)
+    schools = [random_school(rng, i) for i in range(25)] + [None]
+    students = [random_student(rng) for _ in range(40)] + [(None, {})]
+    matrix = alignment(StudentMatrix.compile(students), SchoolMatrix.compile([f"s{i}" for i in range(len(schools))], schools))
+    assert matrix.shape == (len(students), len(schools))
+    for i, (prof, lens_s) in enumerate(students):
+        for j, ctx in enumerate(schools):
+            assert matrix[i, j] == alignment_for_school(ctx, prof, lens_s)
+
+
+def test_standing_bands():
+    prof = StudentProfile(student_id="s", current_grade="12", weekly_hours_cap=8,
+                          tests={"sat": {"score": 1460}, "act": {"score": 30}})
+    schools = [
+        SchoolContext(name="sat", mid50_scores={"sat_composite": [1370, 1460, 1530]}),
+        SchoolContext(name="act", mid50_scores={"act_composite": [31, 33, 35]}),
+        SchoolContext(name="short", mid50_scores={"sat_composite": [1400, 1500]}),
+        SchoolContext(name="none")
+    ]
+    standing = score_standing(StudentMatrix.compile([(prof, {})]), SchoolMatrix.compile([s.name for s in schools], schools))
+    assert [standing.test_type(0, j) for j in range(4)] == ["SAT", "ACT", "SAT", None]
+    assert [standing.rating(0, j) for j in range(4)] == ["competitive", "not_competitive", None, None]
+    assert standing.score[0].tolist() == [1460, 30, 1460, 0]
+
+
+def per_school_payload() -> dict:
+    base = PAYLOAD["school_context"]
+    mit = dict(base, name="Massachusetts Institute of Technology",
+               mid50_scores={"sat_composite": [1520, 1550, 1580]},
+               test_policy={"admission_use": "required"})
+    return dict(PAYLOAD, school_context=None, school_contexts={"Georgia Tech": base, "MIT": mit})
+
+
+def test_per_school_contexts():
+    req = PortfolioAnalyzeRequest.model_validate(per_school_payload())
+    alignment_map = service.score_portfolio(req)["scores"]["alignment"]
+    lens_s = service._score_portfolio(req)[1]
+    for school in req.schools:
+        expected = alignment_for_school(req.school_contexts[school], req.student_profile, lens_s)
+        assert alignment_map[school] == round(expected, 3)
+    assert alignment_map["Georgia Tech"] != alignment_map["MIT"]
+
+    analyses = analyze_standardized_tests(req, req.student_profile)
+    assert [(a.school_name, a.competitiveness) for a in analyses] == [
+        ("Georgia Institute of Technology", "below_competitive"),
+        ("Massachusetts Institute of Technology", "not_competitive")
+    ]
+
+
+def test_shared_context_is_analyzed_once():
+    req = PortfolioAnalyzeRequest.model_validate(PAYLOAD)
+    assert len(req.schools) == 2
+    assert len(analyze_standardized_tests(req, req.student_profile)) == 1
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = SchoolSetRegistry()
+    monkeypatch.setattr(service, "school_sets", registry)
+    monkeypatch.setattr("src.portfolio.api.school_sets", registry)
+    return registry
+
+
+def test_school_set_reference(registry):
+    client = TestClient(app)
+    contexts = per_school_payload()["school_contexts"]
+    res = client.put("/portfolio/school-sets/stem", json=contexts)
+    assert res.status_code == 200, res.text
+    assert res.json() == {"name": "stem", "schools": ["Georgia Tech", "MIT"]}
+    assert client.get("/portfolio/school-sets/stem").json()["MIT"]["name"] == "Massachusetts Institute of Technology"
+
+    inline = client.post("/portfolio/scores", json=per_school_payload()).json()
+    by_set = client.post("/portfolio/scores", json=dict(PAYLOAD, school_context=None, school_set="stem")).json()
+    assert by_set["scores"]["alignment"] == inline["scores"]["alignment"]
+
+    # A request-level context overrides the set's entry for that school
+    override = dict(PAYLOAD, school_context=None, school_set="stem", school_contexts={"MIT": PAYLOAD["school_context"]})
+    scores = client.post("/portfolio/scores", json=override).json()["scores"]["alignment"]
+    assert scores["MIT"] == scores["Georgia Tech"]
+
+    res = client.post("/portfolio/scores", json=dict(PAYLOAD, school_set="missing"))
+    assert res.status_code == 404
+    assert client.delete("/portfolio/school-sets/stem").status_code == 200
+    assert client.get("/portfolio/school-sets/stem").status_code == 404
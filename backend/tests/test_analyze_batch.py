@@ -0,0 +1,119 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import json
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import batch, service
+from src.portfolio.batch import analyze_batch, ndjson_lines
+from src.portfolio.percentiles import PercentileIndex
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+BODY = dict(PAYLOAD, sections=["scores", "gaps", "standardized_tests"], as_of="2025-01-10")
+
+
+def student(i: int) -> dict:
+    return dict(BODY, student_profile=dict(PAYLOAD["student_profile"], student_id=f"s{i}"),
+                portfolio=PAYLOAD["portfolio"][:1 + i % len(PAYLOAD["portfolio"])])
+
+
+@pytest.fixture(autouse=True)
+def no_llm(monkeypatch):
+    monkeypatch.setattr(service, "client", None)
+    monkeypatch.setattr(service, "async_client", None)
+    monkeypatch.setattr(service, "percentile_index", PercentileIndex(enabled=False))
+
+
+async def chunks_of(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def collect(agen) -> list:
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+
+def test_ndjson_lines_across_chunk_boundaries():
+    data = b'{"a": 1}\n\n  \r\n{"b": 2}\r\n' + b"x" * 40 + b'\n{"c": 3}'
+    for size in (1, 3, 7, len(data)):
+        assert collect(ndjson_lines(chunks_of(data, size), 20)) == [b'{"a": 1}', b'{"b": 2}', None, b'{"c": 3}']
+
+
+def test_batch_reports_each_item():
+    items = [student(i) for i in range(4)]
+    lines = [json.dumps(item) for item in items] + ["{not json", json.dumps(dict(BODY, school_set="missing"))]
+    client = TestClient(app)
+    res = client.post("/portfolio/analyze-batch", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"})
+    assert res.status_code == 200 and res.headers["content-type"].startswith("application/x-ndjson")
+    out = [json.loads(line) for line in res.text.splitlines()]
+    assert out[-1] == {"summary": {"items": 6, "succeeded": 4, "failed": 2}}
+
+    by_index = {line["index"]: line for line in out[:-1]}
+    assert sorted(by_index) == list(range(6))
+    for i, item in enumerate(items):
+        expected = client.post("/portfolio/analyze", json=item).json()
+        got = by_index[i]
+        assert got["status"] == 200 and got["student_id"] == f"s{i}"
+        for key in ("scores", "gaps", "standardized_tests", "context_token"):
+            assert got["result"][key] == expected[key]
+    assert by_index[4]["status"] == 422 and by_index[4]["detail"][0]["type"] == "json_invalid"
+    assert by_index[5]["status"] == 404 and by_index[5]["detail"] == "Unknown school set: missing"
+
+
+def test_batch_bounds_concurrency_and_shares_schools(monkeypatch):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    real = batch.aanalyze_portfolio_response
+
+    async def tracked(req, shared):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        try:
+            return await real(req, shared)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    resolutions = []
+    real_resolve = service._resolve_school_contexts
+    monkeypatch.setattr(batch, "aanalyze_portfolio_response", tracked)
+    monkeypatch.setattr(service, "_resolve_school_contexts", lambda *args: resolutions.append(1) or real_resolve(*args))
+    body = "\n".join(json.dumps(student(i)) for i in range(12)).encode()
+    out = collect(analyze_batch(chunks_of(body, 512), concurrency=3))
+    assert json.loads(out[-1])["summary"] == {"items": 12, "succeeded": 12, "failed": 0}
+    assert 1 < peak[0] <= 3
+    assert len(resolutions) == 1
+
+
+def test_closing_the_response_cancels_items_in_flight(monkeypatch):
+    started, cancelled = [], []
+
+    async def hanging(req, shared):
+        started.append(req.student_profile.student_id)
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.append(req.student_profile.student_id)
+            raise
+
+    monkeypatch.setattr(batch, "aanalyze_portfolio_response", hanging)
+    body = "\n".join([json.dumps(student(i)) for i in range(3)] + ["not json"]).encode()
+
+    async def run():
+        agen = analyze_batch(chunks_of(body, 512), concurrency=4)
+        first = json.loads(await agen.__anext__())
+        await agen.aclose()
+        # Checked before asyncio.run cancels whatever is left at shutdown
+        return first, sorted(cancelled)
+
+    first, cancelled_on_close = asyncio.run(run())
+    assert first["status"] == 422
+    assert sorted(started) == cancelled_on_close == ["s0", "s1", "s2"]
@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import llm, service
+from src.portfolio.circuit_breaker import CircuitBreaker
+from src.portfolio.llm_backends import LocalLLMBackend, LocalLLMClient, LocalLLMConfig
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+from src.portfolio.stream_json import SectionStreamParser
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_parser_emits_items_as_soon_as_they_close():
+    parser = SectionStreamParser()
+    text = '{"lens_improvements": [{"lens": "Growth", "note": "a } in a string"}, {"lens": "Service"}], "diversity_spike": {"tasks": [{"t": 1}]}}'
+    seen = []
+    for i in range(0, len(text), 5):
+        seen.extend((key, index, len(parser.text)) for key, index, _ in parser.feed(text[i:i + 5]))
+
+    assert [(k, i) for k, i, _ in seen] == [("lens_improvements", 0), ("lens_improvements", 1), ("diversity_spike", None)]
+    assert seen[0][2] <= text.index('{"lens": "Service"}') + 5
+
+
+@pytest.fixture
+def local_llm(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    monkeypatch.setattr(llm, "llm_breaker", CircuitBreaker("test"))
+    monkeypatch.setattr(service, "client", LocalLLMClient(LocalLLMBackend(LocalLLMConfig())))
+
+
+def test_stream_emits_scores_first_and_sections_from_llm(local_llm):
+    res = TestClient(app).post("/portfolio/analyze/stream", json=PAYLOAD)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(res.text)
+    names = [name for name, _ in events]
+    assert names[:2] == ["scores", "gaps"]
+    assert names[-3:] == ["standardized_tests", "provenance", "done"]
+    assert "alignment_priority" in names
+
+    provenance = events[-2][1]
+    assert provenance["sections"]["alignment_priorities"] == "llm"
+    assert provenance["fallback_reason"] in (None, "llm_incomplete")
+
+
+def test_stream_falls_back_when_llm_fails(monkeypatch, local_llm):
+    monkeypatch.setattr(service, "client", LocalLLMClient(LocalLLMBackend(LocalLLMConfig(error_rate=1.0))))
+    events = _events(TestClient(app).post("/portfolio/analyze/stream", json=PAYLOAD).text)
+
+    provenance = dict(events)["provenance"]
+    assert provenance["fallback_reason"] == "llm_error"
+    assert set(provenance["sections"].values()) <= {"fallback", "rules"}
+    assert any(name == "alignment_priority" for name, _ in events)
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import models, service
+from src.portfolio.models import PortfolioAnalyzeRequest, StudentProfile
+from src.portfolio.scoring_context import ScoringContextCache
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+class FrozenDate(date):
+    """date whose today() is settable, to move the wall clock under the service"""
+    current = date(2025, 1, 10)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(service, "date", FrozenDate)
+    monkeypatch.setattr(service, "client", None)
+    monkeypatch.setattr(service, "scoring_contexts", ScoringContextCache())
+    FrozenDate.current = date(2025, 1, 10)
+    return FrozenDate
+
+
+def test_pinned_as_of_ignores_the_clock(clock):
+    req = PortfolioAnalyzeRequest.model_validate(dict(PAYLOAD, as_of="2025-01-10"))
+    before = service.score_portfolio(req)
+    clock.current = date(2025, 6, 1)
+    assert service.score_portfolio(req) == before
+    # Without as_of, ongoing activities keep accruing weeks
+    assert service.score_portfolio(PortfolioAnalyzeRequest.model_validate(PAYLOAD)) != before
+
+
+def test_as_of_resolved_once_and_reported(clock):
+    req = PortfolioAnalyzeRequest.model_validate(dict(PAYLOAD, sections=["scores", "standardized_tests"]))
+    result = service.analyze_portfolio(req)
+    assert result["provenance"]["as_of"] == date(2025, 1, 10)
+    pinned = service.analyze_portfolio(req.model_copy(update={"as_of": date(2025, 1, 10)}))
+    assert pinned["context_token"] == result["context_token"]
+    assert pinned["scores"] == result["scores"]
+
+    later = service.analyze_portfolio(req.model_copy(update={"as_of": date(2025, 3, 1)}))
+    assert later["context_token"] != result["context_token"]
+    assert later["scores"]["impact_total"] != result["scores"]["impact_total"]
+
+
+def test_as_of_drives_test_runway(clock):
+    ctx = dict(PAYLOAD["school_context"], test_policy={"admission_use": "recommended", "latest_submission_date": "2025-12-15"})
+    plan = {"student_profile": PAYLOAD["student_profile"], "school_context": ctx, "weekly_hours_cap": 6}
+    early = service.plan_tests(models.TestPlanRequest.model_validate(dict(plan, as_of="2025-06-01")))
+    late = service.plan_tests(models.TestPlanRequest.model_validate(dict(plan, as_of="2025-12-01")))
+    assert early.decision != "SKIP"
+    assert late.decision == "SKIP" and "(2 weeks)" in late.rationale
+
+    analyze = dict(PAYLOAD, school_context=ctx)
+    prof = StudentProfile.model_validate(PAYLOAD["student_profile"])
+    early = service.analyze_standardized_tests(PortfolioAnalyzeRequest.model_validate(dict(analyze, as_of="2025-06-01")), prof)
+    late = service.analyze_standardized_tests(PortfolioAnalyzeRequest.model_validate(dict(analyze, as_of="2025-12-01")), prof)
+    assert early[0].recommendation == "reschedule"
+    assert late[0].recommendation == "submit"
+
+
+def test_api_accepts_as_of(clock):
+    client = TestClient(app)
+    a = client.post("/portfolio/scores", json=dict(PAYLOAD, as_of="2025-01-10")).json()
+    b = client.post("/portfolio/scores", json=PAYLOAD).json()
+    assert a == b
@@ -0,0 +1,118 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+import anyio.to_thread
+import httpx
+import pytest
+from main import app
+from src.portfolio import llm, service
+from src.portfolio.circuit_breaker import CircuitBreaker
+from src.portfolio.deadline import Deadline, ahedge
+from src.portfolio.llm_backends import AsyncLocalLLMClient, LocalLLMBackend, LocalLLMClient, LocalLLMConfig
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+from src.portfolio.llm_limiter import AdaptiveLimiter
+from src.portfolio.models import PortfolioAnalyzeRequest
+from src.portfolio.percentiles import PercentileIndex
+from src.portfolio.scoring_context import ScoringContextCache
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+class CountingClient:
+    """Async fake that answers with empty sections after `delay` seconds and tracks calls in flight"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='{"tasks": []}'))],
+                               usage=SimpleNamespace(total_tokens=10))
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    monkeypatch.setattr(llm, "llm_breaker", CircuitBreaker("test"))
+    monkeypatch.setattr(llm, "llm_limiter", AdaptiveLimiter(max_concurrency=64, tokens_per_minute=1e9))
+    monkeypatch.setattr(service, "percentile_index", PercentileIndex(enabled=False))
+    monkeypatch.setattr(service, "scoring_contexts", ScoringContextCache())
+
+
+def test_ahedge_prefers_primary_and_falls_back_at_deadline():
+    async def answer(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    async def run(delay):
+        task = asyncio.ensure_future(answer("llm", delay))
+        return await ahedge(task, lambda: "rules", Deadline(0.2), 0.05)
+
+    assert asyncio.run(run(0)) == ("llm", "primary")
+    assert asyncio.run(run(0.17)) == ("llm", "primary")
+    assert asyncio.run(run(1.0)) == ("rules", "deadline")
+
+
+def test_async_analysis_matches_sync(monkeypatch):
+    backend = LocalLLMBackend(LocalLLMConfig())
+    monkeypatch.setattr(service, "client", LocalLLMClient(backend))
+    monkeypatch.setattr(service, "async_client", AsyncLocalLLMClient(backend))
+    req = PortfolioAnalyzeRequest.model_validate(dict(PAYLOAD, as_of="2025-01-10"))
+
+    expected = service.analyze_portfolio(req)
+    got = asyncio.run(service.aanalyze_portfolio(req))
+    for result in (expected, got):
+        del result["provenance"]["elapsed_ms"]
+    assert got == expected
+    assert got["provenance"]["fallback_reason"] is None
+
+
+def test_slow_async_llm_falls_back_within_budget(monkeypatch):
+    monkeypatch.setattr(service, "async_client", CountingClient(delay=1.0))
+    monkeypatch.setattr(service, "ANALYZE_DEADLINE_SECONDS", 0.3)
+    monkeypatch.setattr(service, "ANALYZE_SPECULATE_SECONDS", 0.1)
+
+    started = time.monotonic()
+    result = asyncio.run(service.aanalyze_portfolio(PortfolioAnalyzeRequest(**PAYLOAD)))
+    assert time.monotonic() - started < 0.9
+    assert result["provenance"]["fallback_reason"] == "deadline"
+
+
+def test_llm_calls_do_not_hold_worker_threads(monkeypatch):
+    fake = CountingClient(delay=0.2)
+    monkeypatch.setattr(service, "async_client", fake)
+    requests = 12
+
+    async def run():
+        # Two worker threads would cap sync handlers at two LLM calls in flight
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 2
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            bodies = [dict(PAYLOAD, student_profile=dict(PAYLOAD["student_profile"], student_id=f"s{i}"))
+                      for i in range(requests)]
+            analyzed = await asyncio.gather(*(client.post("/portfolio/analyze", json=body) for body in bodies))
+            token = analyzed[0].json()["context_token"]
+            regenerated = await asyncio.gather(*(
+                client.post("/portfolio/regenerate-tasks", json={"context_token": token, "section_type": "diversity_spike",
+                                                                 "exclude_task_titles": [f"t{i}"]})
+                for i in range(requests)
+            ))
+        return analyzed, regenerated
+
+    analyzed, regenerated = asyncio.run(run())
+    assert all(res.status_code == 200 for res in analyzed + regenerated)
+    assert all(len(res.json()["tasks"]) == 3 for res in regenerated)
+    assert fake.peak == requests
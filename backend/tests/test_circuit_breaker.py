@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import time
+from types import SimpleNamespace
+import pytest
+from src.portfolio import llm
+from src.portfolio.circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+from src.portfolio.deadline import Deadline
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+from src.portfolio.llm_limiter import AdaptiveLimiter
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class OutageClient:
+    """Fake client that fails with 503 while `down` is set"""
+
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        if self.down:
+            raise ServerError("service unavailable")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+                               usage=SimpleNamespace(total_tokens=5))
+
+
+def test_opens_after_threshold_then_probes_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure(ServerError())
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_success()
+
+    stats = breaker.stats()
+    assert stats["state"] == CLOSED and stats["short_circuited"] == 2
+    assert [t["to"] for t in stats["transitions"]] == [OPEN, HALF_OPEN, CLOSED]
+
+
+def test_open_breaker_short_circuits_chat_completion(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    monkeypatch.setattr(llm, "llm_breaker", breaker)
+    monkeypatch.setattr(llm, "llm_limiter", AdaptiveLimiter())
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    client = OutageClient()
+    messages = [{"role": "user", "content": "x"}]
+
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            llm.chat_completion(client, "test", model="m", messages=messages)
+    with pytest.raises(CircuitOpen):
+        llm.chat_completion(client, "test", model="m", messages=messages)
+
+    assert client.calls == 2
+    assert llm.llm_limiter.stats()["in_flight"] == 0
+
+
+def test_timeouts_from_the_callers_deadline_do_not_trip_the_breaker(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60)
+    monkeypatch.setattr(llm, "llm_breaker", breaker)
+    monkeypatch.setattr(llm, "llm_limiter", AdaptiveLimiter())
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+
+    def timing_out(**kwargs):
+        time.sleep(kwargs["timeout"])
+        raise TimeoutError("read timed out")
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=timing_out)))
+    messages = [{"role": "user", "content": "x"}]
+    with pytest.raises(TimeoutError):
+        llm.chat_completion(client, "test", model="m", messages=messages, deadline=Deadline(0.05))
+    assert breaker.state == CLOSED
+
+
+    def provider_timeout(**kwargs):
+        raise TimeoutError("read timed out")
+
+    client.chat.completions.create = provider_timeout
+    with pytest.raises(TimeoutError):
+        llm.chat_completion(client, "test", model="m", messages=messages, deadline=Deadline(5))
+    assert breaker.state == OPEN
@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import random
+from datetime import date, timedelta
+from src.portfolio import service
+from src.portfolio.cohort import score_cohort
+from src.portfolio.constants import LENS_LIST, ROLE_WEIGHT
+from src.portfolio.models import Evidence
+
+
+def _evidence(i, **kw):
+    base = dict(id=f"e{i}", title=f"Activity {i}", lens="Growth", type="Club", role_level="Member")
+    return Evidence(**{**base, **kw})
+
+
+def _random_portfolio(rng, n):
+    portfolio = []
+    for i in range(n):
+        start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 500)) if rng.random() < 0.7 else None
+        portfolio.append(_evidence(
+            i,
+            lens=rng.choice(LENS_LIST),
+            role_level=rng.choice(list(ROLE_WEIGHT)),
+            theme_tags=[rng.choice(["Robotics", "AI", "Music", "ai"])] if rng.random() < 0.8 else [],
+            start_date=start,
+            end_date=start + timedelta(days=rng.randint(7, 300)) if start and rng.random() < 0.5 else None,
+            hours_total=rng.randint(0, 300) if rng.random() < 0.4 else None,
+            hours_per_week=round(rng.uniform(0, 12), 1) if rng.random() < 0.8 else None,
+            people_impacted=rng.randint(0, 3000) if rng.random() < 0.7 else None,
+            awards=[{"level": rng.choice(["school", "national", "none"])}] if rng.random() < 0.3 else []
+        ))
+    return portfolio
+
+
+def _scalar(portfolio):
+    raw = {ev.id: service.compute_impact(ev, None) for ev in portfolio}
+    impacts_norm = service.normalize_impacts(raw) if raw else {}
+    lens_s = service.lens_scores(portfolio, impacts_norm) if impacts_norm else {k: 0.0 for k in LENS_LIST}
+    coverage = service.coverage_index(lens_s) if sum(lens_s.values()) > 0 else 0.0
+    return impacts_norm, lens_s, coverage, service.detect_spike(portfolio, impacts_norm)
+
+
+def _assert_matches_scalar(portfolios):
+    scores = score_cohort(portfolios)
+    for s, portfolio in enumerate(portfolios):
+        actual = (scores.impacts_for(s), scores.lens_scores_for(s), float(scores.coverage[s]), scores.spike_for(s))
+        assert actual == _scalar(portfolio), f"student {s}"
+
+
+def test_matches_scalar_functions_exactly():
+    rng = random.Random(11)
+    _assert_matches_scalar([_random_portfolio(rng, rng.randint(0, 10)) for _ in range(500)])
+
+
+def test_empty_flat_and_tied_portfolios():
+    flat = [_evidence(i, theme_tags=["Music"]) for i in range(3)]
+    # Two themes with equal impact: the first one seen wins, as in the scalar max()
+    tied = [
+        _evidence(0, theme_tags=["Debate"], hours_total=10, lens="Curiosity"),
+        _evidence(1, theme_tags=["Chess"], hours_total=10, lens="Community"),
+        _evidence(2, hours_total=0)
+    ]
+    untagged = [_evidence(0, hours_total=5), _evidence(1, hours_total=50)]
+    _assert_matches_scalar([[], flat, [], tied, untagged])
+
+    scores = score_cohort([[], flat, tied])
+    assert scores.spike_for(0) == (None, 0.0)
+    assert scores.impacts_for(1) == {"e0": 5.0, "e1": 5.0, "e2": 5.0}
+    assert scores.spike_for(2) == ("debate", 0.5)
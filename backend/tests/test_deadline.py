@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+from src.portfolio import llm, service
+from src.portfolio.deadline import Deadline, DeadlineExceeded
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+from src.portfolio.models import PortfolioAnalyzeRequest
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+class SlowClient:
+    """Fake client that answers with empty sections after `delay` seconds"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.timeouts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.timeouts.append(kwargs.get("timeout"))
+        time.sleep(self.delay)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='{"critical_improvements": []}'))],
+                               usage=SimpleNamespace(total_tokens=10))
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+
+
+def test_chat_completion_passes_remaining_budget_and_stops_when_expired():
+    client = SlowClient(delay=0)
+    llm.chat_completion(client, "test", model="m", messages=[{"role": "user", "content": "x"}], deadline=Deadline(5))
+    assert 0 < client.timeouts[0] <= 5
+
+    with pytest.raises(DeadlineExceeded):
+        llm.chat_completion(client, "test", model="m", messages=[{"role": "user", "content": "y"}], deadline=Deadline(0))
+    assert len(client.timeouts) == 1
+
+
+def test_slow_llm_falls_back_within_budget(monkeypatch):
+    monkeypatch.setattr(service, "client", SlowClient(delay=1.0))
+    monkeypatch.setattr(service, "ANALYZE_DEADLINE_SECONDS", 0.3)
+    monkeypatch.setattr(service, "ANALYZE_SPECULATE_SECONDS", 0.1)
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(service, "_llm_executor", executor)
+
+    started = time.monotonic()
+    result = service.analyze_portfolio(PortfolioAnalyzeRequest(**PAYLOAD))
+    elapsed = time.monotonic() - started
+    # The abandoned primary call is still running; let it finish while the cache is still patched out
+    executor.shutdown(wait=True)
+
+    assert elapsed < 0.9
+    provenance = result["provenance"]
+    assert provenance["fallback_reason"] == "deadline"
+    assert provenance["sections"]["critical_improvements"] == "fallback"
+    assert provenance["sections"]["standardized_tests"] == "rules"
+
+
+def test_empty_llm_sections_are_filled_from_fallback(monkeypatch):
+    monkeypatch.setattr(service, "client", SlowClient(delay=0))
+    result = service.analyze_portfolio(PortfolioAnalyzeRequest(**PAYLOAD))
+
+    sections = result["provenance"]["sections"]
+    assert result["provenance"]["fallback_reason"] == "llm_incomplete"
+    assert set(sections.values()) <= {"fallback", "rules"}
+    assert result["alignment_priorities"]
@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from src.portfolio import llm, essay_analyzer
+from src.portfolio.essay_analyzer import AsyncEssayAnalyzer
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+
+ESSAY = "I built a robot because I wanted to help my grandmother.\n\nIt failed twice.\n\nNow it works."
+
+
+class SlowAsyncClient:
+    """Fake AsyncOpenAI whose responses take `delay` seconds each"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        system = kwargs["messages"][0]["content"]
+        if "Return only a number" in system:
+            content = "8.5"
+        elif "suggestions" in system:
+            content = json.dumps({"suggestions": [{"type": "tone", "priority": "high", "explanation": "Warmer."}]})
+        else:
+            content = json.dumps({"overall_score": 8, "strengths": ["Voice"], "weaknesses": ["Length"],
+                                  "content_score": 7.5, "tone_score": 9})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_async_analyzer_overlaps_alignment_with_analysis(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    monkeypatch.setattr(essay_analyzer.textstat, "flesch_reading_ease", lambda text: 65.0)
+    analyzer = AsyncEssayAnalyzer(SlowAsyncClient(delay=0.2))
+
+    started = time.perf_counter()
+    result = asyncio.run(analyzer.analyze_essay(ESSAY, essay_id="e1", prompt="Describe a challenge."))
+    elapsed = time.perf_counter() - started
+
+    # analysis + suggestions run back to back; alignment overlaps with analysis
+    assert elapsed < 0.55
+    assert result.essay_id == "e1"
+    assert result.prompt_alignment_score == 8.5
+    assert result.tone_score == 9.0
+    assert [s.type for s in result.suggestions] == ["tone"]
+
+
+def test_cancelling_an_analysis_cancels_the_alignment_call(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    monkeypatch.setattr(essay_analyzer.textstat, "flesch_reading_ease", lambda text: 65.0)
+    client = SlowAsyncClient(delay=0.2)
+    cancelled = []
+    real = client.chat.completions.create
+
+    async def tracked(**kwargs):
+        try:
+            return await real(**kwargs)
+        except asyncio.CancelledError:
+            cancelled.append(kwargs["messages"][0]["content"])
+            raise
+
+    client.chat.completions.create = tracked
+
+    async def run():
+        analysis = asyncio.ensure_future(AsyncEssayAnalyzer(client).analyze_essay(ESSAY, prompt="Describe a challenge."))
+        await asyncio.sleep(0.05)
+        analysis.cancel()
+        await asyncio.sleep(0.01)
+        # Checked before asyncio.run cancels whatever is left at shutdown
+        return len(cancelled)
+
+    assert asyncio.run(run()) == 2
+    assert any("Return only a number" in system for system in cancelled)
+
+
+class CountingClient:
+    """Fake sync OpenAI client that returns a single-shot payload"""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        content = json.dumps({
+            "overall_score": 8, "content_score": 7, "tone_score": 6, "prompt_alignment_score": 11,
+            "strengths": ["Specific"], "weaknesses": ["Abrupt ending"],
+            "suggestions": [{"type": "structure", "priority": "medium", "location": "paragraph 3",
+                             "current_text": None, "suggested_text": None, "explanation": "Expand."}]
+        })
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_single_shot_mode_uses_one_schema_constrained_call(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    monkeypatch.setattr(essay_analyzer.textstat, "flesch_reading_ease", lambda text: 65.0)
+    client = CountingClient()
+
+    result = essay_analyzer.EssayAnalyzer(client).analyze_essay(ESSAY, prompt="Describe a challenge.", mode="single_shot")
+
+    assert len(client.requests) == 1
+    assert client.requests[0]["response_format"]["type"] == "json_schema"
+    assert result.prompt_alignment_score == 10.0
+    assert result.weaknesses == ["Abrupt ending"]
+    assert result.suggestions[0].location == "paragraph 3"
@@ -0,0 +1,87 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import api, service
+from src.portfolio.etags import ResourceVersions, not_modified, strong_etag
+from src.portfolio.percentiles import PercentileIndex
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+STUDENT = PAYLOAD["student_profile"]["student_id"]
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(api, "profile_versions", ResourceVersions())
+    monkeypatch.setattr(api, "_profile_storage", {})
+    monkeypatch.setattr(api, "_portfolio_storage", {})
+    monkeypatch.setattr(api, "_score_states", {})
+    monkeypatch.setattr(service, "client", None)
+    monkeypatch.setattr(service, "async_client", None)
+    monkeypatch.setattr(service, "percentile_index", PercentileIndex(enabled=False))
+
+
+def test_not_modified_matching():
+    tag = strong_etag("profile", 3)
+    assert not_modified(tag, tag) and not_modified(f'"other", W/{tag}', tag) and not_modified("*", tag)
+    assert not not_modified(None, tag) and not not_modified(strong_etag("profile", 4), tag)
+
+
+def test_profile_gets_revalidate_until_a_mutation(monkeypatch):
+    client = TestClient(app)
+    client.post(f"/profile/{STUDENT}", json=PAYLOAD["student_profile"])
+    client.post(f"/profile/{STUDENT}/activities", json=PAYLOAD["portfolio"][0])
+
+    for path in (f"/profile/{STUDENT}", f"/profile/{STUDENT}/activities"):
+        res = client.get(path)
+        etag = res.headers["etag"]
+        assert res.status_code == 200 and not etag.startswith("W/")
+
+        with monkeypatch.context() as m:
+            m.setattr(api, "jsonable_encoder", lambda obj: pytest.fail("serialized on a 304"))
+            res = client.get(path, headers={"If-None-Match": etag})
+        assert res.status_code == 304 and res.headers["etag"] == etag and res.content == b""
+
+    before = client.get(f"/profile/{STUDENT}/activities").headers["etag"]
+    client.put(f"/profile/{STUDENT}/activities/{PAYLOAD['portfolio'][0]['id']}", json=dict(PAYLOAD["portfolio"][0], hours_total=99))
+    res = client.get(f"/profile/{STUDENT}/activities", headers={"If-None-Match": before})
+    assert res.status_code == 200 and res.headers["etag"] != before
+    assert res.json()[0]["hours_total"] == 99
+
+
+def test_analyze_etag_follows_student_version(monkeypatch):
+    client = TestClient(app)
+    body = dict(PAYLOAD, as_of="2025-01-10")
+    assert "etag" not in client.post("/portfolio/analyze", json=body).headers
+
+    client.post(f"/profile/{STUDENT}", json=PAYLOAD["student_profile"])
+    etag = client.post("/portfolio/analyze", json=body).headers["etag"]
+    assert etag.startswith("W/")
+
+    calls = []
+    real = api.aanalyze_portfolio_response
+    monkeypatch.setattr(api, "aanalyze_portfolio_response", lambda req: calls.append(req) or real(req))
+    # A matching If-None-Match on a POST is a failed precondition, not a 304
+    res = client.post("/portfolio/analyze", json=body, headers={"If-None-Match": etag})
+    assert res.status_code == 412 and res.headers["etag"] == etag and not calls
+    # Analyzing other students does not invalidate the tag
+    client.post("/portfolio/analyze", json=dict(body, student_profile=dict(PAYLOAD["student_profile"], student_id="peer")))
+    assert client.post("/portfolio/analyze", json=body, headers={"If-None-Match": etag}).status_code == 412
+
+    changed = client.post("/portfolio/analyze", json=dict(body, weekly_hours_cap=9), headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    client.post(f"/profile/{STUDENT}/activities", json=PAYLOAD["portfolio"][0])
+    res = client.post("/portfolio/analyze", json=body, headers={"If-None-Match": etag})
+    assert res.status_code == 200 and res.headers["etag"] != etag and len(calls) == 3
+
+
+def test_cross_origin_clients_can_read_the_etag():
+    client = TestClient(app)
+    client.post(f"/profile/{STUDENT}", json=PAYLOAD["student_profile"])
+    res = client.get(f"/profile/{STUDENT}", headers={"Origin": "http://localhost:3000"})
+    assert res.headers["etag"]
+    assert {"ETag", "Location"} <= {h.strip() for h in res.headers["access-control-expose-headers"].split(",")}
@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import random
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import api, service
+from src.portfolio.constants import LENS_LIST, ROLE_WEIGHT
+from src.portfolio.incremental import IncrementalPortfolioScores
+from src.portfolio.models import Evidence, PortfolioAnalyzeRequest
+
+
+def _activity(rng, i):
+    return {
+        "id": f"a{i}", "title": f"Activity {i}", "lens": rng.choice(LENS_LIST), "type": "Project",
+        "role_level": rng.choice(list(ROLE_WEIGHT)),
+        "theme_tags": [rng.choice(["Robotics", "AI", "Music"])] if rng.random() < 0.8 else [],
+        "hours_total": rng.randint(0, 300), "people_impacted": rng.randint(0, 2000)
+    }
+
+
+def _full_rescore(portfolio):
+    req = PortfolioAnalyzeRequest(country_tracks=["US"], schools=[], deadlines={}, portfolio=portfolio)
+    scores = service._score_portfolio(req)[5]
+    return {k: v for k, v in scores.items() if k != "alignment"}
+
+
+def _assert_close(incremental, full):
+    assert incremental["lens_scores"] == pytest.approx(full["lens_scores"], abs=0.011)
+    assert incremental["impact_total"] == pytest.approx(full["impact_total"], abs=0.011)
+    assert incremental["coverage"] == pytest.approx(full["coverage"], abs=0.0011)
+    assert (incremental["spike"] or {}).get("theme") == (full["spike"] or {}).get("theme")
+
+
+def test_crud_keeps_scores_in_sync_with_full_rescoring(monkeypatch):
+    monkeypatch.setattr(api, "_portfolio_storage", {})
+    monkeypatch.setattr(api, "_score_states", {})
+    client = TestClient(app)
+    rng = random.Random(5)
+    ids = []
+    for step in range(120):
+        op = rng.random()
+        if ids and op < 0.25:
+            client.delete(f"/profile/s1/activities/{ids.pop(rng.randrange(len(ids)))}")
+        elif ids and op < 0.5:
+            target = rng.choice(ids)
+            body = dict(_activity(rng, step), id=target)
+            client.put(f"/profile/s1/activities/{target}", json=body)
+        else:
+            ids.append(f"a{step}")
+            client.post("/profile/s1/activities", json=_activity(rng, step))
+
+        res = client.get("/profile/s1/scores")
+        assert res.status_code == 200
+        _assert_close(res.json(), _full_rescore([r.to_evidence() for r in api._portfolio_storage.get("s1", [])]))
+    assert res.json()["activities"] == len(ids)
+
+
+def test_bounds_change_rescales_and_empty_state():
+    state = IncrementalPortfolioScores()
+    assert state.scores()["lens_scores"] == {k: 0.0 for k in LENS_LIST}
+    low = Evidence(id="low", title="Low", lens="Growth", type="Club", role_level="Member", hours_total=1)
+    high = Evidence(id="high", title="High", lens="Curiosity", type="Club", role_level="Founder", hours_total=200)
+    state.upsert(low)
+    assert state.scores()["lens_scores"]["Growth"] == 10.0  # single item normalizes to 5.0
+    state.upsert(high)
+    assert state.scores()["lens_scores"] == {**{k: 0.0 for k in LENS_LIST}, "Curiosity": 10.0}
+    assert state.remove("high") and not state.remove("high")
+    assert state.scores()["lens_scores"]["Growth"] == 10.0
+    assert len(state) == 1
+
+
+def test_duplicate_activity_ids_are_rejected(monkeypatch):
+    monkeypatch.setattr(api, "_portfolio_storage", {})
+    monkeypatch.setattr(api, "_score_states", {})
+    client = TestClient(app)
+    rng = random.Random(7)
+    first, second = _activity(rng, 1), _activity(rng, 2)
+    assert client.post("/profile/s1/activities", json=first).status_code == 200
+    assert client.post("/profile/s1/activities", json=second).status_code == 200
+
+    assert client.post("/profile/s1/activities", json=dict(first, hours_total=5)).status_code == 409
+    assert client.put("/profile/s1/activities/a2", json=dict(second, id="a1")).status_code == 409
+    assert client.put("/profile/s1/activities/a2", json=dict(second, id="a3")).status_code == 200
+
+    assert [a.id for a in api._portfolio_storage["s1"]] == ["a1", "a3"]
+    assert client.get("/profile/s1/scores").json()["activities"] == 2
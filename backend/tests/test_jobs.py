@@ -0,0 +1,210 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import api, service
+from src.portfolio.jobs import JobQueue, RetryPolicy, SQLiteJobStore, error_status
+from src.portfolio.models import PortfolioAnalyzeRequest
+from src.portfolio.school_sets import UnknownSchoolSet
+from src.portfolio.percentiles import PercentileIndex
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+@pytest.fixture
+def queue(monkeypatch, tmp_path):
+    queue = JobQueue(SQLiteJobStore(str(tmp_path / "jobs.sqlite3")), workers=2, poll_seconds=0.05)
+    api.register_job_handlers(queue)
+    monkeypatch.setattr(api, "job_queue", queue)
+    monkeypatch.setattr(service, "client", None)
+    monkeypatch.setattr(service, "percentile_index", PercentileIndex(enabled=False))
+    yield queue
+    queue.stop()
+
+
+def test_async_analyze_runs_as_a_job(queue):
+    client = TestClient(app)
+    body = dict(PAYLOAD, as_of="2025-01-10", sections=["scores", "gaps"])
+    res = client.post("/portfolio/analyze?mode=async&priority=3", json=body)
+    assert res.status_code == 202, res.text
+    job = res.json()
+    assert res.headers["location"] == f"/jobs/{job['id']}" and job["priority"] == 3
+
+    done = client.get(f"/jobs/{job['id']}?wait=10").json()
+    assert done["status"] == "succeeded" and done["attempts"] == 1
+    assert done["result"]["scores"] == client.post("/portfolio/analyze", json=body).json()["scores"]
+    assert done["timings"]["total_ms"] >= done["timings"]["run_ms"]
+    assert queue.stats()["timings"]["portfolio.analyze"]["run_ms"]["p50"] is not None
+
+    missing = client.post("/portfolio/analyze?mode=async", json=dict(body, school_set="missing")).json()
+    failed = client.get(f"/jobs/{missing['id']}?wait=10").json()
+    assert failed["status"] == "failed" and failed["error_status"] == 404 and failed["attempts"] == 1
+    assert client.get("/jobs/nope").status_code == 404
+
+
+def test_retries_with_backoff_then_fails(tmp_path):
+    calls = []
+
+    def flaky(payload):
+        calls.append(time.monotonic())
+        if payload == '"recover"' and len(calls) < 2:
+            raise ConnectionError("upstream reset")
+        if payload == '"broken"':
+            raise RuntimeError("still down")
+        return '{"ok": true}'
+
+    queue = JobQueue(SQLiteJobStore(str(tmp_path / "jobs.sqlite3")), workers=1, poll_seconds=0.02)
+    queue.register("flaky", flaky, RetryPolicy(max_attempts=3, base_delay=0.05))
+    try:
+        recovered = queue.submit("flaky", '"recover"')
+        broken = queue.submit("flaky", '"broken"')
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and queue.get(broken["id"])["status"] != "failed":
+            time.sleep(0.02)
+        assert queue.get(recovered["id"])["status"] == "succeeded" and queue.get(recovered["id"])["result"] == {"ok": True}
+        failed = queue.get(broken["id"])
+        assert failed["attempts"] == 3 and failed["error"] == "still down" and failed["error_status"] == 500
+        assert queue.stats()["retried"] == 3
+    finally:
+        queue.stop()
+
+
+def test_worker_survives_a_failed_write(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    finish, failures = store.finish, []
+
+    def locked_once(*args):
+        if not failures:
+            failures.append(args[0])
+            raise sqlite3.OperationalError("database is locked")
+        return finish(*args)
+
+    store.finish = locked_once
+    queue = JobQueue(store, workers=1, poll_seconds=0.02, lease_seconds=0.3)
+    queue.register("echo", lambda payload: payload)
+    try:
+        first = queue.submit("echo", '"first"')
+        second = queue.submit("echo", '"second"')
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and store.counts().get("succeeded", 0) < 2:
+            time.sleep(0.02)
+        assert failures == [first["id"]]
+        assert queue.get(second["id"])["result"] == "second"
+        # The lost write is redone once the lease of the failed attempt expires
+        assert queue.get(first["id"])["result"] == "first" and queue.get(first["id"])["attempts"] == 2
+    finally:
+        queue.stop()
+
+
+def test_only_domain_errors_skip_retries():
+    try:
+        PortfolioAnalyzeRequest.model_validate_json('{"schools": 3}')
+    except ValueError as e:
+        invalid = e
+    assert error_status(invalid) == 422
+    assert error_status(UnknownSchoolSet("Unknown school set: x")) == 404
+    # Sync routes answer 422 for the service's own ValueErrors, such as an essay with no LLM configured
+    assert error_status(ValueError("LLM client not initialized")) == 422
+    for bug in (KeyError("sections"), IndexError()):
+        assert error_status(bug) is None
+
+
+def test_priority_order_and_restart_recovery(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = SQLiteJobStore(path)
+    for priority in (0, 5, 1):
+        store.enqueue("noop", json.dumps(priority), priority, 3, time.time())
+    # A job claimed by a worker that died keeps its lease until it expires
+    store.claim(time.time() - 10, lease_seconds=1)
+
+    order, lock = [], threading.Lock()
+
+    def record(payload):
+        with lock:
+            order.append(json.loads(payload))
+        return "{}"
+
+    queue = JobQueue(SQLiteJobStore(path), workers=1, poll_seconds=0.02)
+    queue.register("noop", record)
+    try:
+        queue.start()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and queue.store.counts().get("succeeded", 0) < 3:
+            time.sleep(0.02)
+        assert order == [5, 1, 0]
+    finally:
+        queue.stop()
+
+
+def test_sse_reports_completion(queue):
+    client = TestClient(app)
+    job = client.post("/portfolio/analyze?mode=async", json=dict(PAYLOAD, sections=["scores"])).json()
+    with client.stream("GET", f"/jobs/{job['id']}/events") as res:
+        events = [line[len("event: "):] for line in res.iter_lines() if line.startswith("event: ")]
+    assert events[-1] == "done"
+    assert set(events[:-1]) <= {"status"}
+
+
+def test_lease_is_renewed_and_stale_writes_are_dropped(tmp_path):
+    release = threading.Event()
+
+    def slow(payload):
+        release.wait(5)
+        return payload
+
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(store, workers=1, poll_seconds=0.02, lease_seconds=0.3)
+    queue.register("slow", slow)
+    try:
+        job = queue.submit("slow", '"done"')
+        time.sleep(1.0)
+        # Outlived its lease several times over, yet no second claim took it
+        assert store.claim(time.time(), lease_seconds=60) is None
+        assert queue.get(job["id"])["attempts"] == 1
+        release.set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and queue.get(job["id"])["status"] != "succeeded":
+            time.sleep(0.02)
+        assert queue.get(job["id"])["result"] == "done"
+    finally:
+        queue.stop()
+
+    # A worker whose lease ran out writes nothing once another attempt has claimed the job
+    stale = store.enqueue("slow", '"x"', 0, 3, time.time())
+    first = store.claim(time.time(), lease_seconds=0)
+    second = store.claim(time.time() + 1, lease_seconds=60)
+    assert first["id"] == second["id"] == stale["id"] and second["attempts"] == 2
+    assert not store.finish(stale["id"], first["attempts"], "succeeded", '"old"', None, None, 1.0, time.time())
+    assert not store.renew(stale["id"], first["attempts"], time.time() + 60)
+    assert store.finish(stale["id"], second["attempts"], "succeeded", '"new"', None, None, 1.0, time.time())
+    assert store.get(stale["id"])["result"] == '"new"'
+
+
+def test_job_reads_stay_off_the_event_loop(queue, monkeypatch):
+    on_loop = []
+    real = queue.store.get
+
+    def get(job_id):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(job_id)
+        except RuntimeError:
+            pass
+        return real(job_id)
+
+    monkeypatch.setattr(queue.store, "get", get)
+    client = TestClient(app)
+    job = client.post("/portfolio/analyze?mode=async", json=dict(PAYLOAD, sections=["scores"])).json()
+    assert client.get(f"/jobs/{job['id']}?wait=10").json()["status"] == "succeeded"
+    assert client.get(f"/jobs/{job['id']}").status_code == 200
+    with client.stream("GET", f"/jobs/{job['id']}/events") as res:
+        assert [line for line in res.iter_lines() if line.startswith("event: ")][-1] == "event: done"
+    assert on_loop == []
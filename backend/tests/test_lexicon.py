@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import random
+from src.portfolio.constants import THEME_LEXICON
+from src.portfolio.lexicon import LexiconCorpus
+from src.portfolio.service import _major_match
+
+
+def test_mentions_are_substrings_within_one_theme():
+    corpus = LexiconCorpus({"CS": ["c++", "data science"], "Civics": ["model un"]})
+    assert corpus.terms == 3
+    assert corpus.mentions("sci") and corpus.mentions("c++ data") and corpus.mentions("model un")
+    assert not corpus.mentions("science model") and not corpus.mentions("science\nmodel")
+
+
+def _baseline_major_match(theme_tags, intended_major):
+    if not intended_major or not theme_tags:
+        return 0
+    im = intended_major.lower()
+    for t in theme_tags:
+        if t.lower() in im or any(t.lower() in " ".join(v) for v in THEME_LEXICON.values()):
+            return 1
+    return 0
+
+
+def test_major_match_is_equivalent_to_the_lexicon_scan():
+    rng = random.Random(3)
+    joined = [" ".join(v) for v in THEME_LEXICON.values()]
+    pool = ["Robotics", "Orchestra", "Volunteering", "Finance", "bio", "OBOT", "", "c++", "Model UN",
+            joined[0][-4:] + " " + joined[1][:4], joined[0][-3:] + "\n" + joined[1][:3]]
+    for text in joined:
+        for _ in range(20):
+            i = rng.randrange(len(text))
+            pool.append(text[i:i + rng.randint(1, 12)])
+    majors = [None, "", "Computer Science", "Biology", "Business Administration", "Mechanical Engineering", "Music"]
+    for _ in range(2000):
+        tags = [rng.choice(pool) for _ in range(rng.randint(0, 3))]
+        major = rng.choice(majors)
+        assert _major_match(tags, major) == _baseline_major_match(tags, major), (tags, major)
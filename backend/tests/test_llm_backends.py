@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import openai
+import pytest
+from src.portfolio.essay_analyzer import SINGLE_SHOT_SCHEMA
+from src.portfolio.llm_backends import LocalLLMBackend, LocalLLMClient, LocalLLMConfig, parse_latency_spec
+from src.portfolio.llm_limiter import retry_after_seconds, is_rate_limit_error
+
+
+def test_local_backend_is_deterministic_per_prompt():
+    messages = [{"role": "system", "content": "You are an expert college admissions essay reviewer."},
+                {"role": "user", "content": "Essay... Provide a JSON response with: 1. overall_score"}]
+    a = LocalLLMClient(LocalLLMBackend(LocalLLMConfig())).chat.completions.create(model="m", messages=messages)
+    b = LocalLLMClient(LocalLLMBackend(LocalLLMConfig(seed=99))).chat.completions.create(model="m", messages=messages)
+    assert a.choices[0].message.content == b.choices[0].message.content
+    assert set(json.loads(a.choices[0].message.content)) == {"overall_score", "strengths", "weaknesses", "content_score", "tone_score"}
+    assert a.usage.total_tokens == a.usage.prompt_tokens + a.usage.completion_tokens
+
+
+def test_local_single_shot_matches_schema_keys():
+    backend = LocalLLMBackend(LocalLLMConfig())
+    response = LocalLLMClient(backend).chat.completions.create(
+        model="m",
+        messages=[{"role": "user", "content": "Analyze"}],
+        response_format={"type": "json_schema", "json_schema": {"name": "essay_analysis", "schema": SINGLE_SHOT_SCHEMA}}
+    )
+    payload = json.loads(response.choices[0].message.content)
+    assert set(payload) == set(SINGLE_SHOT_SCHEMA["required"])
+    assert backend.stats()["by_prompt_type"] == {"essay.single_shot": 1}
+
+
+def test_injected_429_carries_retry_after():
+    backend = LocalLLMBackend(LocalLLMConfig(rate_limit_rate=1.0, retry_after=2.5))
+    with pytest.raises(openai.RateLimitError) as exc:
+        LocalLLMClient(backend).chat.completions.create(model="m", messages=[{"role": "user", "content": "x"}])
+    assert is_rate_limit_error(exc.value)
+    assert retry_after_seconds(exc.value) == 2.5
+    assert backend.stats()["injected_rate_limits"] == 1
+
+
+def test_latency_spec_parsing():
+    assert parse_latency_spec("lognormal:0.8,0.4") == ("lognormal", [0.8, 0.4])
+    assert parse_latency_spec("fixed:0") == ("fixed", [0.0])
+    with pytest.raises(ValueError):
+        parse_latency_spec("pareto:1")
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from types import SimpleNamespace
+from src.portfolio import llm
+from src.portfolio.llm_cache import LRUTTLCache, SQLiteCacheStore, ResponseCache, make_cache_key
+
+
+class FakeClient:
+    def __init__(self, content):
+        self.calls = 0
+        self.content = content
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+def test_cache_key_depends_on_every_input():
+    msgs = [{"role": "user", "content": "hi"}]
+    base = make_cache_key("essay.analysis", "gpt-4o-mini", msgs, 0.3, {"type": "json_object"})
+    assert base.startswith("essay.analysis:")
+    assert base == make_cache_key("essay.analysis", "gpt-4o-mini", list(msgs), 0.3, {"type": "json_object"})
+    assert base != make_cache_key("essay.analysis", "gpt-4o", msgs, 0.3, {"type": "json_object"})
+    assert base != make_cache_key("essay.analysis", "gpt-4o-mini", msgs, 0.4, {"type": "json_object"})
+    assert base != make_cache_key("essay.analysis", "gpt-4o-mini", msgs, 0.3, None)
+
+
+def test_memory_tier_expires_and_evicts():
+    cache = LRUTTLCache(maxsize=2, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None and cache.get("a") == "1"
+    expired = LRUTTLCache(maxsize=2, ttl_seconds=-1)
+    expired.set("a", "1")
+    assert expired.get("a") is None
+
+
+def test_disk_tier_survives_restart_and_invalidates_by_prefix(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = ResponseCache(memory=LRUTTLCache(), disk=SQLiteCacheStore(path))
+    first.set("essay.analysis:abc", "{}")
+    first.set("portfolio.structured:def", "{}")
+
+    second = ResponseCache(memory=LRUTTLCache(), disk=SQLiteCacheStore(path))
+    assert second.get("essay.analysis:abc") == "{}"
+    assert second.stats()["disk_hits"] == 1
+
+    assert second.invalidate("essay.") == 1
+    assert second.get("essay.analysis:abc") is None
+    assert second.get("portfolio.structured:def") == "{}"
+
+
+def test_chat_completion_serves_repeat_calls_from_cache(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache()))
+    client = FakeClient('{"ok": true}')
+    kwargs = dict(model="gpt-4o-mini", messages=[{"role": "user", "content": "x"}],
+                  temperature=0.3, response_format={"type": "json_object"})
+    assert llm.chat_completion(client, "test", **kwargs) == '{"ok": true}'
+    assert llm.chat_completion(client, "test", **kwargs) == '{"ok": true}'
+    assert client.calls == 1
+
+    bad = FakeClient("not json")
+    llm.chat_completion(bad, "test.bad", **kwargs)
+    llm.chat_completion(bad, "test.bad", **kwargs)
+    assert bad.calls == 2
+
+
+def test_uncached_calls_always_reach_the_client(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache()))
+    client = FakeClient('{"tasks": []}')
+    kwargs = dict(model="gpt-4o-mini", messages=[{"role": "user", "content": "x"}],
+                  temperature=0.7, response_format={"type": "json_object"})
+    llm.chat_completion(client, "portfolio.alternatives.gap", cache=False, **kwargs)
+    llm.chat_completion(client, "portfolio.alternatives.gap", cache=False, **kwargs)
+    assert client.calls == 2
+    assert llm.response_cache.stats()["memory_entries"] == 0
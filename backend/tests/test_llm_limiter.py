@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from types import SimpleNamespace
+import pytest
+from src.portfolio import llm
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+from src.portfolio.llm_limiter import AdaptiveLimiter, LimiterRejected
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class FlakyClient:
+    """Fake client that answers 429 for the first `failures` calls"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RateLimitError(retry_after=0.01)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+                               usage=SimpleNamespace(total_tokens=50))
+
+
+def test_429_halves_limit_and_success_grows_it_back():
+    limiter = AdaptiveLimiter(max_concurrency=8, decrease_cooldown=0)
+    limiter.on_rate_limited(None)
+    assert limiter.limit == 4.0
+    limiter.on_rate_limited(None)
+    assert limiter.limit == 2.0
+    for _ in range(10):
+        limiter.on_success()
+    assert 2.0 < limiter.limit <= 8.0
+
+
+def test_rejects_when_queue_wait_exceeds_budget():
+    limiter = AdaptiveLimiter(max_concurrency=1, max_queue_wait=0.05)
+    limiter.acquire(10)
+    with pytest.raises(LimiterRejected):
+        limiter.acquire(10)
+    limiter.release()
+    stats = limiter.stats()
+    assert stats["rejected"] == 1 and stats["acquired"] == 1 and stats["in_flight"] == 0
+
+
+def test_chat_completion_retries_after_429(monkeypatch):
+    limiter = AdaptiveLimiter(max_concurrency=4, decrease_cooldown=0)
+    monkeypatch.setattr(llm, "llm_limiter", limiter)
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    client = FlakyClient(failures=1)
+
+    content = llm.chat_completion(client, "test", model="m", messages=[{"role": "user", "content": "x"}])
+
+    assert content == "ok" and client.calls == 2
+    stats = limiter.stats()
+    assert stats["rate_limited"] == 1 and stats["in_flight"] == 0
+    assert limiter.limit < 4.0
@@ -0,0 +1,121 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import random
+import time
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import api, service
+from src.portfolio.constants import LENS_LIST
+from src.portfolio.etags import ResourceVersions
+from src.portfolio.percentiles import METRICS, PercentileIndex, SQLitePercentileStore
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def scores_for(value: float) -> dict:
+    return {m: value for m in METRICS}
+
+
+def brute_percentile(values: list, value: float) -> float:
+    below = sum(v < value for v in values)
+    ties = sum(v == value for v in values)
+    return round(100.0 * (below + 0.5 * ties) / len(values), 1)
+
+
+def test_percentiles_match_brute_force_and_replace_rescored_students():
+    rng = random.Random(3)
+    index = PercentileIndex(min_cohort=1)
+    latest = {}
+    for _ in range(500):
+        sid = f"s{rng.randrange(200)}"
+        latest[sid] = round(rng.uniform(0, 10), 1)
+        index.record(sid, "Physics", "12", scores_for(latest[sid]))
+    for probe in (0.0, 2.5, latest["s7"], 10.0):
+        result = index.percentiles("physics ", "12", scores_for(probe))
+        assert result["cohort"] == {"intended_major": "physics", "grade": "12", "size": len(latest)}
+        assert result["impact_total"] == brute_percentile(list(latest.values()), probe)
+        assert set(result["lens_scores"]) == set(LENS_LIST)
+
+
+def test_falls_back_to_wider_cohort():
+    index = PercentileIndex(min_cohort=3)
+    for i in range(3):
+        index.record(f"cs{i}", "Computer Science", "12", scores_for(i))
+    index.record("bio", "Biology", "12", scores_for(9))
+    assert index.percentiles("Computer Science", "12", scores_for(1))["cohort"]["intended_major"] == "computer science"
+    wider = index.percentiles("Biology", "12", scores_for(9))
+    assert wider["cohort"] == {"intended_major": None, "grade": "12", "size": 4}
+    assert wider["impact_total"] == 87.5
+    assert index.percentiles("Biology", "11", scores_for(9))["cohort"]["grade"] is None
+    assert PercentileIndex(min_cohort=5).percentiles("Biology", "12", scores_for(9)) is None
+
+
+def test_store_merges_across_processes(tmp_path):
+    path = str(tmp_path / "percentiles.sqlite3")
+    a = PercentileIndex(SQLitePercentileStore(path), min_cohort=1, sync_seconds=3600)
+    b = PercentileIndex(SQLitePercentileStore(path), min_cohort=1, sync_seconds=3600)
+    a.record("s1", None, "12", scores_for(1))
+    b.record("s2", None, "12", scores_for(2))
+    b.sync()
+    a.record("s2", None, "12", scores_for(3))   # written after b's row, so it wins
+    a.sync()
+    b.sync()
+    assert b.percentiles(None, "12", scores_for(3))["cohort"]["size"] == 2
+    assert b.percentiles(None, "12", scores_for(3))["impact_total"] == 75.0
+    restarted = PercentileIndex(SQLitePercentileStore(path), min_cohort=1)
+    assert restarted.percentiles(None, "12", scores_for(1))["impact_total"] == 25.0
+    assert restarted.stats()["students"] == 2
+
+
+def test_analyze_reports_percentiles(monkeypatch):
+    index = PercentileIndex(min_cohort=1)
+    monkeypatch.setattr(service, "percentile_index", index)
+    monkeypatch.setattr(service, "profile_versions", ResourceVersions())
+    monkeypatch.setattr(api, "profile_versions", service.profile_versions)
+    monkeypatch.setattr(api, "_profile_storage", {})
+    monkeypatch.setattr(service, "client", None)
+    monkeypatch.setattr(service, "async_client", None)
+    client = TestClient(app)
+    body = dict(PAYLOAD, sections=["scores"])
+    # Ad-hoc portfolios are ranked but not recorded until the student has a stored profile
+    assert client.post("/portfolio/analyze", json=body).json()["scores"]["percentiles"] is None
+    assert index.stats()["students"] == 0
+    for student_id in (PAYLOAD["student_profile"]["student_id"], "peer"):
+        client.post(f"/profile/{student_id}", json=dict(PAYLOAD["student_profile"], student_id=student_id))
+    assert client.post("/portfolio/analyze", json=body).json()["scores"]["percentiles"] is None
+    # Only the student itself is in the index; it is never ranked against its own scores
+    assert client.post("/portfolio/analyze", json=body).json()["scores"]["percentiles"] is None
+
+    peer = dict(body, student_profile=dict(PAYLOAD["student_profile"], student_id="peer"), portfolio=PAYLOAD["portfolio"][:1])
+    assert client.post("/portfolio/analyze", json=peer).json()["scores"]["percentiles"]["impact_total"] == 0.0
+    for _ in range(2):
+        percentiles = client.post("/portfolio/analyze", json=body).json()["scores"]["percentiles"]
+        assert percentiles["cohort"]["size"] == 1
+        assert percentiles["impact_total"] == 100.0
+    assert index.stats()["students"] == 2
+    assert "percentiles" not in client.post("/portfolio/scores", json=PAYLOAD).json()["scores"]
+
+
+def test_lookups_leave_out_the_students_own_scores():
+    index = PercentileIndex(min_cohort=2)
+    for i in range(3):
+        index.record(f"s{i}", "Physics", "12", scores_for(i))
+    own = index.percentiles("Physics", "12", scores_for(2), student_id="s2")
+    assert own["cohort"]["size"] == 2 and own["impact_total"] == 100.0
+    assert index.percentiles("Physics", "12", scores_for(2))["impact_total"] == 83.3
+    # Moved to another cohort cell: the old entry is not in the new cell, nothing to leave out
+    assert index.percentiles("Physics", "11", scores_for(2), student_id="s2") == index.percentiles(None, None, scores_for(2), student_id="s2")
+
+
+def test_sync_runs_in_the_background(tmp_path):
+    path = str(tmp_path / "percentiles.sqlite3")
+    index = PercentileIndex(SQLitePercentileStore(path), min_cohort=1, sync_seconds=0)
+    index.record("s1", None, "12", scores_for(1))
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and (index.stats()["pending"] or index._syncing):
+        time.sleep(0.01)
+    assert index.stats()["pending"] == 0
+    assert PercentileIndex(SQLitePercentileStore(path), min_cohort=1).stats()["students"] == 1
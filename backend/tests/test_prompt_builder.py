@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+from src.portfolio import service
+from src.portfolio.models import PortfolioAnalyzeRequest
+from src.portfolio.prompt_builder import PromptBuilder, count_tokens
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def test_compaction_trims_low_priority_items_then_truncates():
+    builder = PromptBuilder("test", budget=120).instructions("Static instructions.")
+    builder.section("ITEMS", items=[f"- item {i} " + "x" * 40 for i in range(10)], min_items=2)
+    builder.section("KEEP", items=["- important"], priority=5)
+    builder.section("ESSAY", "word " * 200, truncatable=True, priority=1)
+    messages = builder.build()
+
+    text = messages[-1]["content"]
+    assert text.startswith("Static instructions.")
+    assert "- item 1 " in text and "- item 2 " not in text
+    assert "- important" in text and "truncated" in text
+    assert count_tokens(text) <= 120
+
+
+def _messages(payload):
+    req = PortfolioAnalyzeRequest(**payload)
+    impacts_norm, lens_s, coverage, spike_theme, spike_share, scores, gaps = service._score_portfolio(req)
+    return service._structured_recommendation_messages(req, gaps, spike_theme, spike_share, lens_s, scores, impacts_norm, coverage), impacts_norm
+
+
+def test_structured_prompt_has_static_prefix_and_top_impact_items():
+    messages, impacts_norm = _messages(PAYLOAD)
+    other = dict(PAYLOAD, weekly_hours_cap=12, portfolio=list(reversed(PAYLOAD["portfolio"])))
+    other_messages, _ = _messages(other)
+
+    assert messages[0] == other_messages[0]
+    assert messages[1]["content"].startswith(service.STRUCTURED_INSTRUCTIONS)
+    assert other_messages[1]["content"].startswith(service.STRUCTURED_INSTRUCTIONS)
+
+    context = messages[1]["content"].split("=== PORTFOLIO CONTEXT (highest impact first) ===\n")[1].split("\n\n")[0]
+    shown = [json.loads(line)["impact_score"] for line in context.splitlines()]
+    assert shown == sorted(shown, reverse=True)
+    assert shown[0] == round(max(impacts_norm.values()), 2)
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+from datetime import date
+from src.portfolio.cohort import score_cohort
+from src.portfolio.models import Evidence
+from src.portfolio.records import ActivityRecord
+from src.portfolio.service import compute_impact
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def test_round_trip_and_interning():
+    portfolio = [Evidence.model_validate(ev) for ev in PAYLOAD["portfolio"]]
+    linked = Evidence.model_validate(dict(PAYLOAD["portfolio"][0], artifact_links=["https://example.org/demo"],
+                                          awards=[{"level": "national", "name": "Demo day"}]))
+    for ev in portfolio + [linked]:
+        record = ActivityRecord.from_evidence(ev)
+        assert not hasattr(record, "__dict__")
+        assert record.to_evidence() == ev
+
+    copies = [ActivityRecord.from_evidence(Evidence.model_validate(json.loads(json.dumps(PAYLOAD["portfolio"][0]))))
+              for _ in range(2)]
+    assert copies[0].lens is copies[1].lens and copies[0].role_level is copies[1].role_level
+    assert all(a is b for a, b in zip(copies[0].theme_tags, copies[1].theme_tags))
+
+
+def test_records_score_like_evidence():
+    portfolio = [Evidence.model_validate(ev) for ev in PAYLOAD["portfolio"]]
+    records = [ActivityRecord.from_evidence(ev) for ev in portfolio]
+    as_of = date(2025, 3, 1)
+    for ev, record in zip(portfolio, records):
+        assert compute_impact(record, "Computer Science", as_of) == compute_impact(ev, "Computer Science", as_of)
+    by_record, by_evidence = score_cohort([records], as_of), score_cohort([portfolio], as_of)
+    assert by_record.impacts_for(0) == by_evidence.impacts_for(0)
+    assert by_record.spike_for(0) == by_evidence.spike_for(0)
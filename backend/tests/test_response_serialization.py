@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import llm, service
+from src.portfolio.circuit_breaker import CircuitBreaker
+from src.portfolio.llm_backends import AsyncLocalLLMClient, LocalLLMBackend, LocalLLMClient, LocalLLMConfig
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+from src.portfolio.models import PortfolioAnalyzeRequest, PortfolioAnalyzeResponse
+from src.portfolio.percentiles import PercentileIndex
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+@pytest.fixture(autouse=True)
+def local_llm(monkeypatch):
+    backend = LocalLLMBackend(LocalLLMConfig())
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    monkeypatch.setattr(llm, "llm_breaker", CircuitBreaker("test"))
+    monkeypatch.setattr(service, "client", LocalLLMClient(backend))
+    monkeypatch.setattr(service, "async_client", AsyncLocalLLMClient(backend))
+    monkeypatch.setattr(service, "percentile_index", PercentileIndex(enabled=False))
+
+
+def without_elapsed(data: dict) -> dict:
+    data["provenance"].pop("elapsed_ms")
+    return data
+
+
+def test_analyze_body_matches_validated_dict_path():
+    body = dict(PAYLOAD, as_of="2025-01-10")
+    res = TestClient(app).post("/portfolio/analyze", json=body)
+    assert res.status_code == 200 and res.headers["content-type"] == "application/json"
+
+    # What the route returned before: the dict, jsonable_encoder, then response_model validation
+    legacy = service.analyze_portfolio(PortfolioAnalyzeRequest.model_validate(body))
+    expected = PortfolioAnalyzeResponse.model_validate(jsonable_encoder(legacy)).model_dump(mode="json")
+    assert without_elapsed(res.json()) == without_elapsed(expected)
+
+
+def test_openapi_keeps_response_models():
+    paths = TestClient(app).get("/openapi.json").json()["paths"]
+    for path, model in (("/portfolio/analyze", "PortfolioAnalyzeResponse"), ("/portfolio/scores", "PortfolioScoresResponse"),
+                        ("/portfolio/regenerate-tasks", "RegenerateTasksResponse"), ("/tests/plan", "TestPlanResponse")):
+        schema = paths[path]["post"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert schema == {"$ref": f"#/components/schemas/{model}"}
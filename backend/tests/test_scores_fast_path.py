@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import llm, service
+from src.portfolio.circuit_breaker import CircuitBreaker
+from src.portfolio.llm_backends import LocalLLMBackend, LocalLLMClient, LocalLLMConfig
+from src.portfolio.llm_cache import ResponseCache, LRUTTLCache
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+def _no_llm(**kwargs):
+    raise AssertionError("LLM must not be called")
+
+
+@pytest.fixture
+def forbid_llm(monkeypatch):
+    forbidden = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_no_llm)))
+    monkeypatch.setattr(service, "client", forbidden)
+    monkeypatch.setattr(service, "async_client", forbidden)
+
+
+def test_scores_endpoint_skips_llm(forbid_llm):
+    res = TestClient(app).post("/portfolio/scores", json=PAYLOAD)
+    assert res.status_code == 200, res.text
+    data = res.json()
+    assert set(data) == {"scores", "gaps"}
+    assert "lens_scores" in data["scores"]
+
+
+def test_analyze_without_structured_sections_skips_llm(forbid_llm):
+    res = TestClient(app).post("/portfolio/analyze", json={**PAYLOAD, "sections": ["scores", "standardized_tests"]})
+    assert res.status_code == 200, res.text
+    data = res.json()
+    scores = {k: v for k, v in data["scores"].items() if k != "percentiles"}
+    assert scores == TestClient(app).post("/portfolio/scores", json=PAYLOAD).json()["scores"]
+    assert data["critical_improvements"] == [] and data["diversity_spike"] is None
+    assert data["provenance"]["sections"] == {"standardized_tests": "rules"}
+
+
+def test_analyze_returns_only_requested_sections(monkeypatch):
+    monkeypatch.setattr(llm, "response_cache", ResponseCache(memory=LRUTTLCache(), enabled=False))
+    monkeypatch.setattr(llm, "llm_breaker", CircuitBreaker("test"))
+    monkeypatch.setattr(service, "client", LocalLLMClient(LocalLLMBackend(LocalLLMConfig())))
+    data = service.analyze_portfolio(service.PortfolioAnalyzeRequest(**PAYLOAD, sections=["alignment_priorities"]))
+
+    assert data["alignment_priorities"]
+    assert "lens_improvements" not in data and "standardized_tests" not in data
+    assert set(data["provenance"]["sections"]) == {"alignment_priorities"}
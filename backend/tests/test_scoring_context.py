@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import service
+from src.portfolio.models import PortfolioAnalyzeRequest
+from src.portfolio.scoring_context import ScoringContextCache
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+
+
+@pytest.fixture
+def contexts(monkeypatch):
+    cache = ScoringContextCache(max_entries=4, max_items=20)
+    monkeypatch.setattr(service, "scoring_contexts", cache)
+    monkeypatch.setattr(service, "client", None)
+    monkeypatch.setattr(service, "async_client", None)
+    return cache
+
+
+def test_regenerate_with_token_skips_rescoring(contexts, monkeypatch):
+    client = TestClient(app)
+    token = client.post("/portfolio/analyze", json=PAYLOAD).json()["context_token"]
+    assert token and len(contexts) == 1
+
+    def fail(req):
+        raise AssertionError("portfolio was rescored")
+    monkeypatch.setattr(service, "_score_portfolio", fail)
+    res = client.post("/portfolio/regenerate-tasks", json={"context_token": token, "section_type": "diversity_spike"})
+    assert res.status_code == 200, res.text
+    assert len(res.json()["tasks"]) == 3
+
+    # The same original request maps to the same cached context
+    res = client.post("/portfolio/regenerate-tasks", json={"original_request": PAYLOAD, "section_type": "diversity_spike"})
+    assert res.status_code == 200, res.text
+
+
+def test_unknown_token_and_missing_request(contexts):
+    client = TestClient(app)
+    res = client.post("/portfolio/regenerate-tasks", json={"context_token": "nope", "section_type": "diversity_spike"})
+    assert res.status_code == 404
+    assert client.post("/portfolio/regenerate-tasks", json={"section_type": "diversity_spike"}).status_code == 422
+    res = client.post("/portfolio/regenerate-tasks",
+                      json={"context_token": "nope", "original_request": PAYLOAD, "section_type": "diversity_spike"})
+    assert res.status_code == 200
+
+
+def test_lru_evicts_by_entries_and_items(contexts):
+    ctxs = [service.scoring_context(PortfolioAnalyzeRequest(**dict(PAYLOAD, weekly_hours_cap=cap))) for cap in (5, 6, 7)]
+    n = len(PAYLOAD["portfolio"])
+    assert contexts.stats()["items"] <= 20 and len(contexts) == 20 // n
+    assert contexts.get(ctxs[0].token) is None and contexts.get(ctxs[-1].token) is ctxs[-1]
+    with pytest.raises(TypeError):
+        ctxs[-1].lens_scores["Growth"] = 0.0
@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from src.portfolio import service, simulation
+from src.portfolio.models import PortfolioAnalyzeRequest, SimulateRequest
+
+PAYLOAD = json.loads((Path(__file__).resolve().parents[2] / "examples" / "request_comprehensive.json").read_text())
+VOLUNTEERING = {
+    "id": "v1", "title": "Food bank shifts", "lens": "Achievements", "type": "Volunteering",
+    "role_level": "Member", "hours_total": 100, "theme_tags": ["service"]
+}
+SCENARIOS = [
+    {"name": "lead", "edits": [{"op": "patch", "id": "e6", "changes": {"role_level": "Lead", "hours_total": 300}}]},
+    {"name": "drop", "edits": [{"op": "remove", "id": "e3"}]},
+    {"name": "volunteer", "edits": [{"op": "add", "evidence": VOLUNTEERING}]},
+    {"name": "mixed", "edits": [{"op": "add", "evidence": VOLUNTEERING}, {"op": "patch", "id": "v1", "changes": {"hours_total": 200}},
+                                {"op": "remove", "id": "e1"}]}
+]
+
+
+@pytest.fixture(autouse=True)
+def no_llm(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("simulation called the LLM")
+    monkeypatch.setattr(service, "client", None)
+    monkeypatch.setattr(service, "chat_completion", fail)
+
+
+def edited_payload(edits: list) -> dict:
+    portfolio = {ev["id"]: ev for ev in PAYLOAD["portfolio"]}
+    for edit in edits:
+        if edit["op"] == "add":
+            portfolio[edit["evidence"]["id"]] = edit["evidence"]
+        elif edit["op"] == "remove":
+            del portfolio[edit["id"]]
+        else:
+            portfolio[edit["id"]] = dict(portfolio[edit["id"]], **edit["changes"])
+    return dict(PAYLOAD, portfolio=list(portfolio.values()))
+
+
+def test_scenarios_match_full_rescoring():
+    result = simulation.simulate_portfolio(SimulateRequest.model_validate({"base": PAYLOAD, "scenarios": SCENARIOS}))
+    assert result["base"] == service.score_portfolio(PortfolioAnalyzeRequest.model_validate(PAYLOAD))
+    for scenario, outcome in zip(SCENARIOS, result["scenarios"]):
+        expected = service.score_portfolio(PortfolioAnalyzeRequest.model_validate(edited_payload(scenario["edits"])))
+        assert outcome["name"] == scenario["name"]
+        assert outcome["scores"] == expected["scores"]
+        assert outcome["gaps"] == expected["gaps"]
+
+    volunteer = result["scenarios"][2]
+    assert volunteer["deltas"]["lens_scores"]["Achievements"] > 0
+    assert volunteer["deltas"]["impact_total"] == pytest.approx(
+        volunteer["scores"]["impact_total"] - result["base"]["scores"]["impact_total"], abs=0.011
+    )
+    assert {"type": "lens", "lens": "Achievements", "before": 1.0,
+            "after": next(g["severity"] for g in volunteer["gaps"] if g.get("lens") == "Achievements")} in volunteer["gap_deltas"]
+
+
+def test_only_edited_activities_are_rescored(monkeypatch):
+    calls = []
+    real = simulation.compute_impact
+    monkeypatch.setattr(simulation, "compute_impact", lambda ev, *args: calls.append(ev.id) or real(ev, *args))
+    simulation.simulate_portfolio(SimulateRequest.model_validate({"base": PAYLOAD, "scenarios": SCENARIOS * 50}))
+    base_ids = [ev["id"] for ev in PAYLOAD["portfolio"]]
+    assert calls[:len(base_ids)] == base_ids
+    assert sorted(set(calls[len(base_ids):])) == ["e6", "v1"]
+    assert len(calls) == len(base_ids) + 50 * 3
+
+
+def test_invalid_scenario_is_reported_alone():
+    client = TestClient(app)
+    scenarios = [{"name": "missing", "edits": [{"op": "remove", "id": "nope"}]},
+                 {"name": "duplicate", "edits": [{"op": "add", "evidence": dict(VOLUNTEERING, id="e1")}]},
+                 {"name": "invalid", "edits": [{"op": "patch", "id": "e1", "changes": {"role_level": "Boss"}}]},
+                 SCENARIOS[0]]
+    res = client.post("/portfolio/simulate", json={"base": PAYLOAD, "scenarios": scenarios})
+    assert res.status_code == 200, res.text
+    outcomes = res.json()["scenarios"]
+    assert outcomes[0]["error"] == "Unknown activity: nope"
+    assert outcomes[1]["error"] == "Activity already exists: e1"
+    assert "role_level" in outcomes[2]["error"] and outcomes[2]["scores"] is None
+    assert outcomes[3]["error"] is None and outcomes[3]["scores"]
+
+
+def test_edit_validation():
+    client = TestClient(app)
+    for edit in ({"op": "patch", "id": "e1", "changes": {"id": "e9"}}, {"op": "add"}, {"op": "remove"}):
+        res = client.post("/portfolio/simulate", json={"base": PAYLOAD, "scenarios": [{"edits": [edit]}]})
+        assert res.status_code == 422, edit
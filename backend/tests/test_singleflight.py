@@ -0,0 +1,88 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+from src.portfolio.models import PortfolioAnalyzeRequest
+from src.portfolio.singleflight import SingleFlight, request_fingerprint
+
+
+def test_fingerprint_is_canonical():
+    a = PortfolioAnalyzeRequest(country_tracks=["US"], schools=["GT"], deadlines={"GT": "2026-01-04", "MIT": "2026-01-01"})
+    b = PortfolioAnalyzeRequest(schools=["GT"], deadlines={"MIT": "2026-01-01", "GT": "2026-01-04"}, country_tracks=["US"])
+    assert request_fingerprint(a) == request_fingerprint(b)
+    assert request_fingerprint(a) != request_fingerprint(a, "essay-1")
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def slow(x):
+        calls.append(x)
+        await asyncio.sleep(0.2)
+        return {"value": x}
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", slow, 1) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"value": 1}] * 5
+    assert calls == [1]
+    stats = flight.stats()
+    assert stats["executions"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+
+
+def test_async_followers_receive_leader_error():
+    flight = SingleFlight("test")
+
+    async def boom():
+        await asyncio.sleep(0.05)
+        raise ValueError("bad request")
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", boom) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.stats()["executions"] == 1 and flight.stats()["coalesced"] == 2
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    flight = SingleFlight("test")
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        finished.append(True)
+        return "ok"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", slow))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        assert await follower == "ok"
+        return leader.cancelled()
+
+    assert asyncio.run(main())
+    assert finished == [True] and flight.stats()["in_flight"] == 0
+
+
+def test_work_is_cancelled_when_every_caller_leaves():
+    flight = SingleFlight("test")
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        finished.append(True)
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.ado("k", slow)) for _ in range(2)]
+        await asyncio.sleep(0.02)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.15)
+
+    asyncio.run(main())
+    assert finished == [] and flight.stats()["in_flight"] == 0
@@ -13,6 +13,10 @@ from pathlib import Path
 from typing import Optional
 import sys
 
+# Share the backend's environment-selectable LLM client (LLM_BACKEND=openai|local)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from src.portfolio.llm_backends import create_llm_client
+
 
 class PDFParser:
     """Optimized PDF parser with better error handling and resource management."""
@@ -24,14 +28,19 @@ class PDFParser:
         Args:
             api_key: OpenAI API key (defaults to environment variable OPENAI_API_KEY)
             model: OpenAI model to use (default: gpt-4o-mini)
+        
+        Set LLM_BACKEND=local to use the offline stand-in instead of OpenAI.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
+        if api_key:
+            self.client = OpenAI(api_key=api_key)
+        else:
+            self.client = create_llm_client()
+        if self.client is None:
             raise ValueError(
-                "OpenAI API key not provided. Set OPENAI_API_KEY environment variable "
-                "or pass api_key parameter."
+                "OpenAI API key not provided. Set OPENAI_API_KEY environment variable, "
+                "pass api_key parameter, or set LLM_BACKEND=local."
             )
-        self.client = OpenAI(api_key=self.api_key)
         self.model = model
     
     def extract_text_from_pdf(self, filename: str) -> str: